@@ -23,6 +23,9 @@ import sys
 from collections import defaultdict
 from pathlib import PurePath
 
+from index import connect, simulation_files, simulation_results, \
+    summary_averages
+
 
 def parse_dir_name (directory):
     experiment = query = None
@@ -91,12 +94,20 @@ def parse_arguments (args = None):
     parser = argparse.ArgumentParser (description = descr)
     parser.add_argument ("--simulations", "-f",
                          help = "alternative simulations file")
-    parser.add_argument ("root",
+    parser.add_argument ("--db", "-d",
+                         help = "read from an index built by index.py "
+                         "instead of walking root")
+    parser.add_argument ("root", nargs = "?",
                          help = "directory with processed and simulated logs")
-    return parser.parse_args (args)
+    args = parser.parse_args (args)
 
+    if (args.root is None) == (args.db is None):
+        parser.error ("pass either root or --db")
 
-def main (args):
+    return args
+
+
+def walk_results (args):
     avg_R = defaultdict (dict)
 
     for directory, _, files in os.walk (args.root):
@@ -113,7 +124,29 @@ def main (args):
 
     sim_R, empirical = process_simulations (args.simulations or
                                             simulations_file)
+    return avg_R, sim_R, empirical
+
+
+def indexed_results (database, simulations = None):
+    """The same results as walk_results, read from the index."""
+    connection = connect (database)
+    files = simulation_files (connection)
+
+    if simulations:
+        simulations = os.path.abspath (simulations)
+    elif len (files) == 1:
+        simulations = files[0]
+
+    if simulations not in files:
+        print ("error: pass one of the indexed simulations files with -f:\n{}"
+               .format ("\n".join (files) or "none"), file = sys.stderr)
+        sys.exit (1)
 
+    sim_R, empirical = simulation_results (connection, simulations)
+    return summary_averages (connection), sim_R, empirical
+
+
+def compare (avg_R, sim_R, empirical):
     if empirical:
         errors = [
             {
@@ -152,6 +185,16 @@ def main (args):
     if not empirical:
         fields.insert (2, "ModelCores")
 
+    return errors, fields
+
+
+def main (args):
+    if args.db:
+        avg_R, sim_R, empirical = indexed_results (args.db, args.simulations)
+    else:
+        avg_R, sim_R, empirical = walk_results (args)
+
+    errors, fields = compare (avg_R, sim_R, empirical)
     writer = csv.DictWriter (sys.stdout, fieldnames = fields)
     writer.writeheader ()
     writer.writerows (errors)
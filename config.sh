@@ -23,9 +23,16 @@ EXPERIMENT_REGEX='[0-9]+_[0-9]+_[0-9]+[MG]_[.0-9]+'
 
 ## DAGSIM parameters
 ## These apply only to process_logs.sh
-# DagSim executable
+# DagSim executable, or the path of 'processing/simulator.py',
+# which simulates the same models where DagSim is not available
 DAGSIM=dagsim.sh
 
+# Whether to keep the task times of an application in a single
+# 'samples.bin' store rather than a S<id>.txt file per stage.
+# Only 'processing/simulator.py' reads stores: DagSim needs them
+# unpacked with 'processing/samples.py unpack'
+PACKED_SAMPLES=no
+
 # Number of users accessing the system
 DAGSIM_USERS=1
 
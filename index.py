@@ -0,0 +1,506 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Load the processed experiments below a directory into a SQLite index.
+
+Every configuration, query and application goes in a table, along with
+the jobs, stages and tasks of the applications, the rows of summary.csv
+and the DagSim results in simulations.csv.  Loading is incremental:
+applications and files that did not change since the previous call are
+left as they are, while those no longer there are removed.
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import sys
+
+from argparse import ArgumentParser
+from operator import itemgetter
+from pathlib import Path
+
+from simulate import parse_configuration
+
+sys.path.append (str (Path (__file__).resolve ().with_name ("processing")))
+from tables import INTEGER_FIELDS, findTable, readFields, readRows
+
+
+DATABASE = "index.sqlite"
+
+TABLES = ("app", "executors", "jobs", "stages", "tasks")
+
+# Columns of the parser tables indexed per application
+COLUMNS = {
+    "jobs": ["Job ID", "Submission Time", "Completion Time", "Stage IDs"],
+    "stages": ["Stage ID", "Stage Name", "Parent IDs", "Number of Tasks",
+               "Submission Time", "Completion Time"],
+    "tasks": ["Stage ID", "Task ID", "Task Type", "Executor ID", "Host",
+              "Locality", "Launch Time", "Finish Time", "Getting Result Time",
+              "Executor Run Time", "Executor Deserialize Time", "JVM GC Time",
+              "Result Size", "Memory Bytes Spilled", "Disk Bytes Spilled",
+              "Shuffle Bytes Written", "Shuffle Write Time",
+              "Shuffle Records Written", "Reason"]
+}
+
+SIMULATION_COLUMNS = ["Experiment", "Query", "Run", "ModelCores", "SimCores",
+                      "Datasize", "SimAvg", "SimDev", "SimLower", "SimUpper",
+                      "SimAccuracy"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configurations (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL UNIQUE,
+    executors INTEGER,
+    cores INTEGER,
+    memory TEXT,
+    datasize INTEGER,
+    total_cores INTEGER
+);
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    configuration INTEGER NOT NULL
+        REFERENCES configurations (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    directory TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS apps (
+    id INTEGER PRIMARY KEY,
+    query INTEGER NOT NULL REFERENCES queries (id) ON DELETE CASCADE,
+    app_id TEXT NOT NULL,
+    directory TEXT NOT NULL UNIQUE,
+    fingerprint TEXT NOT NULL,
+    failed INTEGER NOT NULL,
+    submission_time INTEGER,
+    completion_time INTEGER,
+    total_cores INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    file TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    query INTEGER NOT NULL REFERENCES queries (id) ON DELETE CASCADE,
+    run TEXT NOT NULL,
+    completion_time NUMERIC,
+    delta_before_computing NUMERIC,
+    users INTEGER,
+    datasize INTEGER,
+    cores INTEGER
+);
+CREATE TABLE IF NOT EXISTS simulations (
+    file TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    experiment TEXT,
+    query TEXT NOT NULL,
+    run TEXT,
+    model_cores INTEGER,
+    sim_cores INTEGER,
+    datasize INTEGER,
+    sim_avg REAL,
+    sim_dev REAL,
+    sim_lower REAL,
+    sim_upper REAL,
+    sim_accuracy REAL
+);
+{tables}
+CREATE INDEX IF NOT EXISTS queries_configuration ON queries (configuration);
+CREATE INDEX IF NOT EXISTS apps_query ON apps (query);
+CREATE INDEX IF NOT EXISTS jobs_app ON jobs (app, job_id);
+CREATE INDEX IF NOT EXISTS stages_app ON stages (app, stage_id);
+CREATE INDEX IF NOT EXISTS tasks_app ON tasks (app, stage_id);
+CREATE INDEX IF NOT EXISTS summaries_query ON summaries (query, run);
+CREATE INDEX IF NOT EXISTS summaries_file ON summaries (file);
+CREATE INDEX IF NOT EXISTS simulations_file ON simulations (file);
+"""
+
+
+def column_name (header):
+    return header.lower ().replace (" ", "_")
+
+
+def table_schema (table, headers):
+    columns = ["app INTEGER NOT NULL REFERENCES apps (id) ON DELETE CASCADE"]
+    columns.extend ("{} {}".format (column_name (h), "INTEGER"
+                                    if h in INTEGER_FIELDS else "TEXT")
+                    for h in headers)
+    return "CREATE TABLE IF NOT EXISTS {} (\n    {}\n);".format (
+        table, ",\n    ".join (columns))
+
+
+def parse_arguments (argv = None):
+    parser = ArgumentParser (description = __doc__.splitlines ()[0])
+    parser.add_argument ("--database", "-d",
+                         help = "SQLite file, by default {} in root"
+                         .format (DATABASE))
+    parser.add_argument ("--execute", "-e", metavar = "SQL",
+                         help = "print as CSV the result of a query "
+                         "instead of loading")
+    parser.add_argument ("root", help = "directory with processed logs")
+    return parser.parse_args (argv)
+
+
+def connect (database):
+    connection = sqlite3.connect (database)
+    connection.execute ("PRAGMA foreign_keys = ON")
+    tables = "\n".join (table_schema (table, headers)
+                        for table, headers in COLUMNS.items ())
+    connection.executescript (SCHEMA.format (tables = tables))
+    return connection
+
+
+def fingerprint (paths):
+    """Sizes and modification times of the existing paths."""
+    stamps = []
+
+    for path in paths:
+        if path and os.path.exists (path):
+            info = os.stat (path)
+            stamps.append ("{}:{}:{}".format (os.path.basename (path),
+                                              info.st_size, info.st_mtime_ns))
+
+    return ";".join (stamps)
+
+
+def to_integer (value):
+    try:
+        return int (value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_number (value):
+    number = to_integer (value)
+    return to_float (value) if number is None else number
+
+
+def to_float (value):
+    try:
+        return float (value)
+    except (TypeError, ValueError):
+        return None
+
+
+def insert_statement (table, headers, fields):
+    """Statement inserting the raw values of the fields in the table: SQLite
+    stores those of INTEGER columns as integers, and missing ones as NULL."""
+    values = ["NULLIF (NULLIF (?, ''), 'NOVAL')" if h in fields else "NULL"
+              for h in headers]
+    return "INSERT INTO {} VALUES (?, {})".format (table, ", ".join (values))
+
+
+def table_rows (app, filename, headers, fields):
+    present = [h for h in headers if h in fields]
+    getter = itemgetter (*present)
+
+    for row in readRows (filename):
+        values = getter (row)
+        yield (app,) + (values if len (present) > 1 else (values,))
+
+
+class Index:
+    def __init__ (self, connection, experiment_re, app_re):
+        self.connection = connection
+        self.experiment_re = experiment_re
+        self.app_re = app_re
+        self.configurations = {}
+        self.queries = {}
+
+
+    def configuration (self, experiment):
+        if experiment not in self.configurations:
+            executors, cores, memory, datasize = experiment.split ("_")[:4]
+            self.connection.execute (
+                "INSERT OR IGNORE INTO configurations (experiment, executors, "
+                "cores, memory, datasize, total_cores) VALUES (?, ?, ?, ?, ?, ?)",
+                (experiment, to_integer (executors), to_integer (cores), memory,
+                 to_integer (datasize),
+                 int (executors) * int (cores)))
+            self.configurations[experiment] = self.connection.execute (
+                "SELECT id FROM configurations WHERE experiment = ?",
+                (experiment,)).fetchone ()[0]
+
+        return self.configurations[experiment]
+
+
+    def query (self, directory):
+        """The query the directory belongs to, as in process_logs.sh the
+        one right after the experiment in the path, None if outside."""
+        pieces = Path (directory).parts
+        index = next ((idx for idx, piece in enumerate (pieces)
+                       if self.experiment_re.search (piece)), None)
+
+        if index is None or index + 1 >= len (pieces):
+            return None
+
+        path = str (Path (*pieces[:index + 2]))
+
+        if path not in self.queries:
+            configuration = self.configuration (pieces[index])
+            self.connection.execute (
+                "INSERT OR IGNORE INTO queries (configuration, name, directory) "
+                "VALUES (?, ?, ?)", (configuration, pieces[index + 1], path))
+            self.queries[path] = self.connection.execute (
+                "SELECT id FROM queries WHERE directory = ?",
+                (path,)).fetchone ()[0]
+
+        return self.queries[path]
+
+
+    def load_app (self, directory, app_id, query):
+        tables = {table: findTable (os.path.join (directory,
+                                                  "{}_1.csv".format (table)))
+                  for table in TABLES}
+        failed = os.path.join (directory, "FAILED")
+        stamp = fingerprint (list (tables.values ()) + [failed])
+        previous = self.connection.execute (
+            "SELECT id, fingerprint FROM apps WHERE directory = ?",
+            (directory,)).fetchone ()
+
+        if previous and previous[1] == stamp:
+            return False
+        elif previous:
+            self.connection.execute ("DELETE FROM apps WHERE id = ?",
+                                     (previous[0],))
+
+        submission = completion = cores = None
+
+        if tables["app"]:
+            row = next (readRows (tables["app"]), {})
+            submission = to_integer (row.get ("Submission Time") or
+                                     row.get ("Timestamp"))
+            completion = to_integer (row.get ("Completion Time"))
+
+        if tables["executors"]:
+            cores = sum (to_integer (row.get ("Total Cores")) or 0
+                         for row in readRows (tables["executors"]))
+
+        cursor = self.connection.execute (
+            "INSERT INTO apps (query, app_id, directory, fingerprint, failed, "
+            "submission_time, completion_time, total_cores) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (query, app_id, directory, stamp, int (os.path.exists (failed)),
+             submission, completion, cores))
+        app = cursor.lastrowid
+
+        for table, headers in COLUMNS.items ():
+            fields = set (readFields (tables[table])) if tables[table] else set ()
+
+            if set (headers) & fields:
+                self.connection.executemany (
+                    insert_statement (table, headers, fields),
+                    table_rows (app, tables[table], headers, fields))
+
+        return True
+
+
+    def file_changed (self, path):
+        """Whether the file is new or changed, dropping its old rows."""
+        stamp = fingerprint ([path])
+        previous = self.connection.execute (
+            "SELECT fingerprint FROM files WHERE path = ?", (path,)).fetchone ()
+
+        if previous and previous[0] == stamp:
+            return False
+
+        self.connection.execute ("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.execute ("INSERT INTO files VALUES (?, ?)",
+                                 (path, stamp))
+        return True
+
+
+    def load_summary (self, path, query):
+        if not self.file_changed (path):
+            return False
+
+        with open (path, newline = '') as csvfile:
+            # Skip first line with application class
+            next (csvfile, None)
+            rows = [(path, query, row.get ("run"),
+                     to_number (row.get ("applicationCompletionTime")),
+                     to_number (row.get ("applicationDeltaBeforeComputing")),
+                     to_integer (row.get ("users")),
+                     to_integer (row.get ("dataSize")),
+                     to_integer (row.get ("nCores")))
+                    for row in csv.DictReader (csvfile)]
+
+        self.connection.executemany (
+            "INSERT INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return True
+
+
+    def load_simulations (self, path):
+        if not self.file_changed (path):
+            return False
+
+        with open (path, newline = '') as csvfile:
+            rows = []
+
+            for row in csv.DictReader (csvfile):
+                values = [row.get (c) for c in SIMULATION_COLUMNS]
+                values[3:6] = [to_integer (v) for v in values[3:6]]
+                values[6:] = [to_float (v) for v in values[6:]]
+                rows.append ([path] + values)
+
+        self.connection.executemany (
+            "INSERT INTO simulations VALUES ({})"
+            .format (", ".join ("?" * (len (SIMULATION_COLUMNS) + 1))), rows)
+        return True
+
+
+    def prune (self, root, seen):
+        """Remove what used to be below root and is not there anymore."""
+        prefix = os.path.join (root, "")
+
+        for table, column in (("apps", "directory"), ("files", "path"),
+                              ("queries", "directory")):
+            stale = [(path,) for path, in self.connection.execute (
+                "SELECT {} FROM {}".format (column, table))
+                     if path.startswith (prefix) and path not in seen]
+            self.connection.executemany (
+                "DELETE FROM {} WHERE {} = ?".format (table, column), stale)
+
+        self.connection.execute (
+            "DELETE FROM configurations WHERE id NOT IN "
+            "(SELECT configuration FROM queries)")
+
+
+    def load (self, root):
+        """Walk root once, loading what changed."""
+        root = os.path.abspath (root)
+        seen = set ()
+        loaded = 0
+
+        for directory, dirnames, filenames in os.walk (root):
+            dirnames.sort ()
+
+            if "failed" in directory:
+                continue
+
+            name = os.path.basename (directory)
+            query = self.query (directory)
+
+            if name.endswith ("_csv") and self.app_re.search (name) \
+               and query is not None:
+                seen.add (directory)
+
+                with self.connection:
+                    loaded += self.load_app (directory, name[:-len ("_csv")],
+                                             query)
+
+            for filename in sorted (filenames):
+                path = os.path.join (directory, filename)
+
+                if filename == "summary.csv" and query is not None:
+                    seen.add (path)
+
+                    with self.connection:
+                        loaded += self.load_summary (path, query)
+                elif filename == "simulations.csv":
+                    seen.add (path)
+
+                    with self.connection:
+                        loaded += self.load_simulations (path)
+
+        with self.connection:
+            self.prune (root, seen | set (self.queries))
+
+        return loaded
+
+
+def summary_averages (connection):
+    """Mean of the completion time less the delta before computing, over
+    the runs of each query, by experiment."""
+    averages = {}
+
+    for experiment, query, average in connection.execute (
+            "SELECT c.experiment, q.name, "
+            "AVG (s.completion_time - s.delta_before_computing) "
+            "FROM summaries AS s JOIN queries AS q ON s.query = q.id "
+            "JOIN configurations AS c ON q.configuration = c.id "
+            "GROUP BY q.id ORDER BY c.experiment, q.name"):
+        averages.setdefault (experiment, {})[query] = average
+
+    return averages
+
+
+def simulation_files (connection):
+    return [path for path, in connection.execute (
+        "SELECT DISTINCT file FROM simulations ORDER BY file")]
+
+
+def simulation_results (connection, path):
+    """The simulated averages in a file, as
+    compare_real_to_dagsim.process_simulations returns them."""
+    empirical = connection.execute (
+        "SELECT COUNT (*) FROM simulations WHERE file = ? "
+        "AND experiment IS NOT NULL", (path,)).fetchone ()[0] > 0
+    results = {}
+
+    if empirical:
+        for experiment, query, average in connection.execute (
+                "SELECT experiment, query, sim_avg FROM simulations "
+                "WHERE file = ? AND query = run", (path,)):
+            results.setdefault (experiment, {})[query] = average
+    else:
+        for query, model, cores, datasize, average in connection.execute (
+                "SELECT query, model_cores, sim_cores, datasize, sim_avg "
+                "FROM simulations WHERE file = ?", (path,)):
+            results.setdefault ((cores, datasize), {}) \
+                   .setdefault (query, {})[model] = average
+
+    return results, empirical
+
+
+def execute (connection, statement):
+    cursor = connection.execute (statement)
+    writer = csv.writer (sys.stdout)
+
+    if cursor.description:
+        writer.writerow (column[0] for column in cursor.description)
+
+    writer.writerows (cursor)
+
+
+def main (args):
+    database = args.database or os.path.join (args.root, DATABASE)
+
+    try:
+        connection = connect (database)
+    except sqlite3.Error as e:
+        print ("error: cannot open '{}': {}".format (database, e),
+               file = sys.stderr)
+        sys.exit (1)
+
+    with connection:
+        if args.execute:
+            try:
+                execute (connection, args.execute)
+            except sqlite3.Error as e:
+                print ("error: {}".format (e), file = sys.stderr)
+                sys.exit (1)
+        else:
+            conf = parse_configuration ()
+            index = Index (connection, re.compile (conf["EXPERIMENT_REGEX"]),
+                           re.compile (conf["APP_REGEX"]))
+            loaded = index.load (args.root)
+            print ("Loaded {} changed applications and files into {}"
+                   .format (loaded, database), file = sys.stderr)
+
+
+if __name__ == "__main__":
+    args = parse_arguments ()
+    main (args)
@@ -21,14 +21,25 @@ import sys
 from argparse import ArgumentParser
 from collections import defaultdict
 
+from compare_real_to_dagsim import compare, indexed_results
+
 
 def parse_arguments (argv = None):
     parser = ArgumentParser (description = "summarize results by case")
+    msg = "compare simulations and real measures in an index built by index.py"
+    parser.add_argument ("--db", "-d", help = msg)
+    msg = "alternative simulations file in the index"
+    parser.add_argument ("--simulations", "-f", help = msg)
     msg = "a file containing the comparison of simulations and real measures"
-    parser.add_argument ("comparisons", help = msg)
+    parser.add_argument ("comparisons", nargs = "?", help = msg)
     msg = "a file containing cases (Make syntax)"
     parser.add_argument ("cases", help = msg)
-    return parser.parse_args (argv)
+    args = parser.parse_args (argv)
+
+    if (args.comparisons is None) == (args.db is None):
+        parser.error ("pass either comparisons or --db")
+
+    return args
 
 
 def parse_case (lineno, line):
@@ -77,25 +88,39 @@ def arrange_cases (filename):
     return pairings
 
 
-def parse_comparisons (filename):
+def arrange_comparisons (rows):
     data = defaultdict (dict)
+    experiment = re.compile (
+        "(?P<executors>\d+)_(?P<cpus>\d+)_\d+[mMgG]_(?P<datasize>\d+)")
 
-    with open (filename) as infile:
-        reader = csv.DictReader (infile)
-        experiment = re.compile (
-            "(?P<executors>\d+)_(?P<cpus>\d+)_\d+[mMgG]_(?P<datasize>\d+)")
-
-        for row in reader:
-            model = int (row["ModelCores"])
-            query = row["Query"]
-            match = experiment.fullmatch (row["Experiment"])
-            cores = int (match["executors"]) * int (match["cpus"])
-            datasize = int (match["datasize"])
-            data[(query, datasize)][(cores, model)] = 100 * float (row["Error[1]"])
+    for row in rows:
+        model = int (row["ModelCores"])
+        query = row["Query"]
+        match = experiment.fullmatch (row["Experiment"])
+        cores = int (match["executors"]) * int (match["cpus"])
+        datasize = int (match["datasize"])
+        data[(query, datasize)][(cores, model)] = 100 * float (row["Error[1]"])
 
     return data
 
 
+def parse_comparisons (filename):
+    with open (filename) as infile:
+        return arrange_comparisons (csv.DictReader (infile))
+
+
+def query_comparisons (database, simulations = None):
+    avg_R, sim_R, empirical = indexed_results (database, simulations)
+
+    if empirical:
+        print ("error: the simulations do not vary the model cores",
+               file = sys.stderr)
+        sys.exit (1)
+
+    errors, _ = compare (avg_R, sim_R, empirical)
+    return arrange_comparisons (errors)
+
+
 def avg (numbers):
     result = 0.
     count = 0
@@ -140,6 +165,11 @@ def write_table (results):
 if __name__ == "__main__":
     args = parse_arguments ()
     pairings = arrange_cases (args.cases)
-    data = parse_comparisons (args.comparisons)
+
+    if args.db:
+        data = query_comparisons (args.db, args.simulations)
+    else:
+        data = parse_comparisons (args.comparisons)
+
     results = arrange_results (data, pairings)
     write_table (results)
@@ -40,17 +40,25 @@ alias error='error_aux $LINENO '
 
 usage ()
 {
-    echo $(basename "$0") '[-p|-s]' directory >&2
+    echo $(basename "$0") '[-p|-s] [-f] [-j jobs]' directory >&2
     echo '    process the data in directory' >&2
     echo '    -p to only profile the logs, -s to only simulate' >&2
+    echo '    -f to profile again the logs that did not change' >&2
+    echo '    -j to profile the logs with a pool of parallel jobs' >&2
     exit 2
 }
 
-while getopts :psh opt; do
+while getopts :psfj:h opt; do
     case "$opt" in
         p)
             PROCESS=yes
             ;;
+        f)
+            FORCE=yes
+            ;;
+        j)
+            JOBS="$OPTARG"
+            ;;
         s)
             SIMULATE=yes
             ;;
@@ -76,6 +84,17 @@ if [ $# -ne 1 ]; then
     usage
 fi
 
+if [ "x$PACKED_SAMPLES" = xyes ]; then
+    PACKED=--packed
+fi
+
+# Unchanged logs are not parsed again, unless forced
+if [ "x$FORCE" = xyes ]; then
+    CACHE="--cache --force"
+else
+    CACHE=--cache
+fi
+
 if [ ! -d "$1" ]; then
     error the inserted directory does not exist
 fi
@@ -101,52 +120,57 @@ parse_configuration ()
              grep -v -E "$EXPERIMENT_REGEX")"
 }
 
-build_lua_file ()
+# Print the logs below a directory as tab separated fields: the path the
+# log would have if extracted, the file to read, and the zip member if any.
+# Rolling logs are printed as a whole, the path dropping the prefix
+list_logs ()
 {
-    reldir="$1"
-    app_id="$2"
-    cores="$3"
-    absdir="$(cd -P -- "$reldir" && pwd)"
-
-    "$DIR/processing/automate.py" "$absdir/jobs_1.csv" "$absdir/tasks_1.csv" \
-                                  "$absdir/stages_1.csv" "$absdir"
-    "$DIR/processing/lua_file_builder.py" "$reldir" "$app_id" "$cores"
-}
+    find "$1" -type d -name 'eventlog_v2_*' | grep -E "$APP_REGEX" \
+        | while IFS= read -r dirname; do
 
-find_gaps ()
-{
-    reldir="$1"
-    ordinal="$2"
-    kind="$3"
+        name="$(basename "$dirname")"
+        path="$(dirname "$dirname")/${name#eventlog_v2_}"
+        printf '%s\t%s\t\n' "$path" "$dirname"
+    done
 
-    infile="$reldir/${kind}_$ordinal.csv"
-    outfile="$reldir/${kind}_gaps_$ordinal.csv"
+    find "$1" -type f | grep -v /eventlog_v2_ | grep -E "$APP_REGEX" \
+        | while IFS= read -r filename; do
 
-    "$DIR/processing/gaps.py" "$infile" > "$outfile"
+        case "$filename" in
+            *.zip)
+                dir="$(dirname "$filename")"
+                unzip -Z1 "$filename" | grep -v '/$' \
+                    | while IFS= read -r member; do
+
+                    # Logs extracted by previous runs are listed anyway
+                    if [ ! -e "$dir/$member" ]; then
+                        printf '%s\t%s\t%s\n' "$dir/$member" "$filename" "$member"
+                    fi
+                done
+                ;;
+            *)
+                printf '%s\t%s\t\n' "$filename" "$filename"
+                ;;
+        esac
+    done
 }
 
-process_data ()
+process_apps ()
 {
     root="$1"
-
-    find "$root" -name '*.zip' | grep -E "$APP_REGEX" \
-        | while IFS= read -r filename; do
-
-        dir="$(cd -P -- "$(dirname "$filename")" && pwd)"
-        unzip -u -o "$filename" -d "$dir"
-    done
-
-    results_file="$root/ubertable.csv"
+    results_file="$2"
     : > "$results_file"
     write_csv_line "$results_file" Run, Query, Executors, TotalCores, Memory, Datasize
 
-    find "$root" -type f | grep -E "$APP_REGEX" | grep -v failed \
-        | while IFS= read -r filename; do
+    tab="$(printf '\t')"
+    list_logs "$root" | grep -v failed \
+        | while IFS="$tab" read -r filename source member; do
 
         if echo "$filename" | grep -q /logs/; then
             app_id=$(echo $filename | grep -o -E "$APP_REGEX")
+            name="$(basename "$filename" | sed -E 's/\.(gz|lz4|snappy|zstd?)$//')"
 
-            if [ "x$app_id" = "x$(basename "$filename")" ]; then
+            if [ "x$app_id" = "x$name" ]; then
                 parse_configuration "$filename"
                 write_csv_line "$results_file" $app_id, "$QUERY", $EXECUTORS, \
                                $TOTAL_CORES, $MEMORY, $DATASIZE
@@ -155,14 +179,25 @@ process_data ()
                 newdir="$dir/${app_id}_csv"
                 mkdir -p "$newdir"
 
-                "$DIR/processing/parser.py" "$dir/$app_id" 1 "$newdir" && \
-                    find_gaps "$newdir" 1 stages && \
-                    find_gaps "$newdir" 1 jobs && \
-                    build_lua_file "$newdir" "$app_id" "$TOTAL_CORES" || \
-                        touch "$newdir/FAILED"
+                "$DIR/processing/pipeline.py" -f csv $CACHE $PACKED \
+                                              ${member:+-m "$member"} "$source" \
+                                              $app_id $TOTAL_CORES "$newdir" || \
+                    touch "$newdir/FAILED"
             fi
         fi
     done
+}
+
+process_data ()
+{
+    root="$1"
+    results_file="$root/ubertable.csv"
+
+    if [ "x$JOBS" != x ]; then
+        "$DIR/processing/batch.py" ${FORCE:+-f} -j "$JOBS" "$root"
+    else
+        process_apps "$root" "$results_file"
+    fi
 
     tail -n +2 "$results_file" | cut -d , -f 2 \
         | sed -e 's/^[[:space:]]*//g' -e 's/[[:space:]]*$//g' \
@@ -177,6 +212,9 @@ process_data ()
             querydir="$(cd -P -- "$relquerydir" && pwd)"
 
             # Now $dir contains the runs of a given query and configuration
+            find "$dir" -type f -name samples.bin | grep /logs/ | grep -v failed \
+                | "$DIR/processing/samples.py" merge "$querydir/samples.bin"
+
             find "$dir" -type f -name '*.txt' | grep /logs/ \
                 | grep -vE -e failed -e '.dagsim.txt$' \
                 | while IFS= read -r filename; do
@@ -16,21 +16,30 @@
 ## limitations under the License.
 
 
-import csv
 import sys
 import os
 
-from functools import reduce
+from argparse import ArgumentParser
+from bisect import bisect_right
+
+from cache import cachedRun, codeVersion
+from lua_file_builder import luaArray
+from samples import STORE_NAME, writeStore
+from stagedag import StageDAG, parseIds
+from tables import findTable, readRows
 
 
 class Parser:
-    def __init__(self, jobsFile, stagesFile, stagesRelfile, targetDirectory):
+    def __init__(self, jobsFile, stagesFile, stagesRelfile, targetDirectory,
+                 packed = False, rows = None):
+        """rows maps the names of tables already in memory to their rows."""
         self.targetDirectory = targetDirectory
+        self.packed = packed
+        self.rows = rows or {}
         self.jobsMap = {}
         self.jobsFile = jobsFile
         self.stagesRelFile = stagesRelfile
         self.stagesFile = stagesFile
-        self.availableIDs = None
         self.stagesRows = None
 
 
@@ -42,48 +51,73 @@ class Parser:
         self.parseJobs()
         self.buildJobHierarchy()
 
-        with open(self.stagesFile, "r") as infile:
-            self.stagesRows = self.orderStages(csv.DictReader(infile))
+        self.stagesRows = self.orderStages(self.readTable(self.stagesFile))
 
         self.buildTimeFiles()
-        self.buildOutputString()
+        return self.buildOutputString()
+
+
+    def outputs(self):
+        if self.packed:
+            names = {STORE_NAME}
+        else:
+            names = {"S{}.txt".format(row["Stage ID"]) for row in self.stagesRows}
+
+        names.add("dependencies.lua")
+        return [os.path.join(self.targetDirectory, n) for n in sorted(names)]
+
+
+    def runCached(self, force = False):
+        """Run unless the model is up to date with the tables."""
+        inputs = [findTable(f) or f for f in
+                  (self.jobsFile, self.stagesFile, self.stagesRelFile)]
+        key = {"version": codeVersion(__name__, "lua_file_builder", "samples",
+                                       "tables"),
+               "packed": self.packed}
+        return cachedRun(self.targetDirectory, "automate", self.run, inputs,
+                         self.outputs, key, force)
 
 
     def fileValidation(self, filename):
-        """Check the existence of the given file path."""
-        if not os.path.exists(filename):
+        """Check the existence of the given file path, in any table format."""
+        if filename not in self.rows and findTable(filename) is None:
             print("error: file '{}' does not exist".format (filename), file = sys.stderr)
             sys.exit(1)
 
 
+    def readTable(self, filename):
+        """Read the rows of a table, unless they are already in memory."""
+        if filename in self.rows:
+            return self.rows[filename]
+        else:
+            return readRows(filename)
+
+
     def parseJobs(self):
         """Read job records from a CSV file and build a dict based upon them."""
         jobs = {}
 
-        with open(self.jobsFile, "r") as infile:
-            jobsReader = csv.DictReader(infile)
-
-            for row in jobsReader:
-                stageIds = row["Stage IDs"]
-                jobId = row["Job ID"]
-                completionTime = row["Completion Time"]
-                submissionTime = row["Submission Time"]
+        for row in self.readTable(self.jobsFile):
+            stageIds = row["Stage IDs"]
+            jobId = row["Job ID"]
+            completionTime = row["Completion Time"]
+            submissionTime = row["Submission Time"]
 
-                if stageIds != "NOVAL":
-                    stagesList = self.parseStagesList(stageIds)
+            if stageIds != "NOVAL":
+                stagesList = self.parseStagesList(stageIds)
 
-                    self.jobsMap[jobId] = {
-                        "stages": stagesList,
-                        "submissionTime": int(submissionTime),
-                        "completionTime": 0,
-                        "followers" : [],
-                        "parents" : [],
-                        "firstStages":[],
-                        "lastStages" : []
-                    }
+                self.jobsMap[jobId] = {
+                    "stages": stagesList,
+                    "submissionTime": int(submissionTime),
+                    "completionTime": 0,
+                    "followers" : [],
+                    "parents" : [],
+                    "firstStages":[],
+                    "lastStages" : []
+                }
 
-                if completionTime != "NOVAL":
-                    self.jobsMap[jobId]["completionTime"] = int(completionTime)
+            if completionTime != "NOVAL":
+                self.jobsMap[jobId]["completionTime"] = int(completionTime)
 
 
     def orderStages(self, stages):
@@ -93,11 +127,54 @@ class Parser:
 
     def parseStagesList(self, stagesList):
         """Split correctly a list of stages."""
-        rawStages = stagesList[1:-1].split(", ")
-        return [s for s in rawStages if s != ""]
+        return parseIds(stagesList)
 
 
     def buildJobHierarchy(self):
+        """Build a hierarchy among jobs, where a job is a parent of another
+        one if it finishes before its start, unless it is also a parent of
+        another parent of the same job.
+
+        Sorted by decreasing completion time, the candidate parents of a job
+        are a suffix of all the jobs and the closest come first.  A candidate
+        is an ancestor of the parents before it if it completes before any of
+        their submissions, and so are all the following ones.  This holds
+        when no job completes before its submission, otherwise the hierarchy
+        is built comparing every pair of jobs.
+        """
+        jobs = self.jobsMap
+
+        if any(job["completionTime"] < job["submissionTime"]
+               for job in jobs.values()):
+            self.buildSimpleJobHierarchy()
+            self.buildComplexJobHierarchy()
+        else:
+            keys = list(jobs)
+            order = sorted(range(len(keys)), key = lambda idx:
+                           (-jobs[keys[idx]]["completionTime"], idx))
+            order = [keys[idx] for idx in order]
+            completions = [-jobs[key]["completionTime"] for key in order]
+
+            for job in jobs.values():
+                start = bisect_right(completions, -job["submissionTime"])
+                parents = []
+                latest = float("-inf")
+
+                for idx in range(start, len(order)):
+                    parent = jobs[order[idx]]
+
+                    if parent["completionTime"] < latest:
+                        break
+
+                    parents.append(order[idx])
+                    latest = max(latest, parent["submissionTime"])
+
+                job["parents"] = parents
+
+        self.decorateWithFollowers(jobs)
+
+
+    def buildSimpleJobHierarchy(self):
         """Build a simple hierarchy among job based on the fact that
         a job is considered a parent of another one if it finishes before its start.
         """
@@ -106,9 +183,6 @@ class Parser:
                 if value["completionTime"] < value_1["submissionTime"] and key != key_1:
                     self.jobsMap[key_1]["parents"].append(key)
 
-        self.buildComplexJobHierarchy()
-        self.decorateWithFollowers(self.jobsMap)
-
 
     def buildComplexJobHierarchy(self):
         """Build a complex job hierarchy from a simple one."""
@@ -151,92 +225,58 @@ class Parser:
         """From a map in which each node contains just a 'parents' field,
         decorate such nodes with a proper 'followers' field."""
         for key, value in jobsMap.items():
-            for key_1, value_1 in jobsMap.items():
-                if key != key_1 and key in value_1["parents"]:
-                    value["followers"].append(key_1)
+            for parent in value["parents"]:
+                if parent != key:
+                    jobsMap[parent]["followers"].append(key)
 
 
     def buildTimeFiles(self):
-        """Build .txt files containing the execution time of each task in a stage."""
-        batch = []
-        lastRow = None
+        """Build .txt files containing the execution time of each task in a stage,
+        or a single store with all of them if packed."""
+        samples = {}
 
         for row in self.stagesRows:
-            if lastRow != None and lastRow["Stage ID"] != row["Stage ID"]:
-                base = "S{}.txt".format (lastRow["Stage ID"])
-                filename = os.path.join (self.targetDirectory, base)
+            name = "S{}".format (row["Stage ID"])
+            samples.setdefault(name, []).append(row["Executor Run Time"])
 
-                with open(filename, "w") as outfile:
-                    for value in batch:
-                        print(value, file = outfile)
-
-                batch = []
-
-            batch.append(row["Executor Run Time"])
-            lastRow = row
-
-        if lastRow:
-            base = "S{}.txt".format (lastRow["Stage ID"])
-            filename = os.path.join (self.targetDirectory, base)
-        else:
+        if not samples:
             print ("error: file '{}' is empty".format (self.stagesFile),
                    file = sys.stderr)
             sys.exit (3)
 
-        with open(filename, "w") as outfile:
-            for value in batch:
-                print(value, file = outfile)
+        if self.packed:
+            writeStore(os.path.join (self.targetDirectory, STORE_NAME), samples)
 
+            # Text files left over would shadow the store
+            for name in samples:
+                filename = os.path.join (self.targetDirectory, name + ".txt")
 
-    def stagesRel(self):
-        """Build parent-child dependencies among stages in the context of a single job."""
-        with open(self.stagesRelFile, "r") as infile:
-            rows = self.orderStages(csv.DictReader(infile))
-            self.availableIDs = [r["Stage ID"] for r in rows]
-            stagesMap = {r["Stage ID"]: {
-                "parents": None,
-                "children": [],
-                "tasks": r["Number of Tasks"],
-                "name": "S{}".format (r["Stage ID"])
-            } for r in rows}
-
-            for row in rows:
-                parentIds = row["Parent IDs"]
-                stageId = row["Stage ID"]
-                allParents = self.parseStagesList(parentIds)
-                parents = sorted (p for p in allParents if p in self.availableIDs)
+                if os.path.exists(filename):
+                    os.remove(filename)
+        else:
+            for name, batch in samples.items():
+                filename = os.path.join (self.targetDirectory, name + ".txt")
 
-                stagesMap[stageId]["parents"] = parents
+                with open(filename, "w") as outfile:
+                    for value in batch:
+                        print(value, file = outfile)
 
-                for parent in parents:
-                    stagesMap[parent]["children"].append(stageId)
 
-        return stagesMap
+    def stagesRel(self):
+        """Build parent-child dependencies among stages in the context of a single job."""
+        return StageDAG(self.readTable(self.stagesRelFile))
 
 
     def perJobStagesRel(self):
         """Build parent-child dependencies among stages considering the
         parent-child dependencies among jobs."""
-        stagesMap = self.stagesRel()
-        tmpFirst = []
-        tmpLast = []
-        newMap = []
+        dag = self.stagesRel()
 
         """For each job retrieve the first stages and the last stages"""
         for key, job in self.jobsMap.items():
-            cleanStages = (s for s in job["stages"] if s in self.availableIDs)
-
-            for stage in cleanStages:
-                if len(stagesMap[stage]["children"]) == 0:
-                    tmpLast.append(stage)
-
-                if len(stagesMap[stage]["parents"]) == 0:
-                    tmpFirst.append(stage)
-
-            job["last"] = tmpLast
-            job["first"] = tmpFirst
-            tmpLast = []
-            tmpFirst = []
+            cleanStages = [dag.index[s] for s in job["stages"] if s in dag]
+            job["last"] = dag.sinks(cleanStages)
+            job["first"] = dag.sources(cleanStages)
 
         """For each job look at the last stages of that job, and for each
         of them consider the jobs that follows the current one, and for each
@@ -247,50 +287,68 @@ class Parser:
             for stage in job["last"]:
                 for nextJob in job["followers"]:
                     for stage_1 in self.jobsMap[nextJob]["first"]:
-                        stagesMap[stage_1]["parents"].append(stage)
-                        stagesMap[stage]["children"].append(stage_1)
+                        dag.addEdge(stage, stage_1)
 
-        return stagesMap
+        return dag
 
 
     def buildOutputString(self):
-        """Build a string, to be passed to the DAGSimulator, that represents
-        the hierarchies among stages created with the other methods."""
-        stagesDict = self.perJobStagesRel()
-        targetString = ''
-
-        for key, value in stagesDict.items():
-            namedParents = [stagesDict[x]["name"] for x in value["parents"]]
-            namedChildren = [stagesDict[x]["name"] for x in value["children"]]
-            namedParents = reduce(lambda accumul, current: accumul + '"' + current + '",', namedParents, '')
-            namedChildren = reduce(lambda accumul, current: accumul + '"' + current + '",', namedChildren, '')
-
-            if namedParents != '':
-                namedParents = namedParents[:-1]
-
-            if namedChildren != '':
-                namedChildren = namedChildren[:-1]
-
-            targetString += '{{name="{name}", tasks="{tasks}"'.format (name = value["name"], tasks = value["tasks"])
-            timeFile = os.path.join (self.targetDirectory, "{}.txt".format (value["name"]))
-            targetString += ', distr={{type="replay", params={{samples=solver.fileToArray("{filename}")}}}}'.format (filename = timeFile)
-            targetString += ', pre={{{parents}}}, post={{{children}}}}},\n'.format (parents = namedParents, children = namedChildren)
-
-        targetString = '{\n' + targetString[:-2] + '\n}'
+        """Write dependencies.lua, to be passed to the DAGSimulator, with the
+        hierarchies among stages created with the other methods.  Return the
+        entries of its stages."""
+        entries = self.stageEntries(self.perJobStagesRel())
         targetFile = os.path.join (self.targetDirectory, "dependencies.lua")
 
         with open (targetFile, "w") as outfile:
-            print (targetString, file = outfile)
+            outfile.writelines (luaArray (entries))
+
+        return entries
+
+
+    def stageEntries(self, dag):
+        """Build the Lua entry of each stage of the DAG."""
+        names = ['"S{}"'.format (stageId) for stageId in dag.ids]
+        # Same as joining the directory with each file name
+        prefix = os.path.join (self.targetDirectory, "")
+        entry = ('{{name={name}, tasks="{tasks}", distr={{type="replay", '
+                 'params={{samples=solver.fileToArray("{prefix}{file}.txt")}}}}, '
+                 'pre={{{parents}}}, post={{{children}}}}}').format
+        entries = []
+
+        for idx, name in enumerate(names):
+            entries.append(entry(
+                name = name, tasks = dag.tasks[idx], prefix = prefix,
+                file = name[1:-1],
+                parents = ",".join([names[x] for x in dag.parents[idx]]),
+                children = ",".join([names[x] for x in dag.children[idx]])))
+
+        return entries
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "build the stage model of an application")
+    parser.add_argument("jobsFile", metavar = "JOBS_FILE_CSV")
+    parser.add_argument("stagesFile", metavar = "STAGE_FILE_CSV")
+    parser.add_argument("stagesRelFile", metavar = "STAGE_REL_FILE_CSV")
+    parser.add_argument("targetDirectory", metavar = "DIRECTORY_FOR_OUTPUT_STRING")
+    parser.add_argument("-C", "--cache", action = "store_true",
+                        help = "skip the model if it is up to date with the tables")
+    parser.add_argument("--force", action = "store_true",
+                        help = "build anyway, but record the model with --cache")
+    parser.add_argument("-p", "--packed", action = "store_true",
+                        help = "write the task times in '{}' rather than "
+                        "a S<id>.txt file per stage".format(STORE_NAME))
+    return parser.parse_args(argv)
 
 
 def main():
-    args = sys.argv
+    args = parseArgs()
+    parser = Parser(args.jobsFile, args.stagesFile, args.stagesRelFile,
+                    args.targetDirectory, args.packed)
 
-    if len(args) != 5:
-        print("Required args: [JOBS_FILE_CSV] [STAGE_FILE_CSV] [STAGE_REL_FILE_CSV] [DIRECTORY_FOR_OUTPUT_STRING]")
-        sys.exit(2)
+    if args.cache:
+        parser.runCached(args.force)
     else:
-        parser = Parser(str(args[1]), str(args[2]), str(args[3]), str(args[4]))
         parser.run ()
 
 
@@ -0,0 +1,199 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+
+import csv
+import os
+import re
+import shlex
+import sys
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from eventlog import CODECS, isRolling, rollingName, zipMembers
+from pipeline import Pipeline
+
+
+def parseArgs (argv = None):
+    descr = "process in parallel all the application logs in a directory"
+    parser = ArgumentParser (description = descr)
+    parser.add_argument ("-j", "--jobs", type = int, default = os.cpu_count (),
+                         help = "number of worker processes")
+    parser.add_argument ("-f", "--force", action = "store_true",
+                         help = "process again the logs that did not change")
+    parser.add_argument ("root", help = "directory with experimental data")
+    return parser.parse_args (argv)
+
+
+def parseConfiguration ():
+    """Read config.sh the same way the shell scripts source it."""
+    conf = {}
+    script = os.path.realpath (__file__)
+    configFile = os.path.join (os.path.dirname (script), os.pardir, "config.sh")
+
+    with open (configFile) as infile:
+        for line in infile:
+            tokens = shlex.split (line)
+
+            if tokens and "#" not in tokens[0]:
+                name, _, value = tokens[0].partition ("=")
+                conf[name] = value
+
+    return conf
+
+
+def walkFiles (root):
+    """Yield every file below root, in a deterministic order.  Rolling
+    logs are yielded as a whole rather than part by part."""
+    for directory, dirnames, filenames in os.walk (root):
+        rolling = [name for name in dirnames
+                   if isRolling (os.path.join (directory, name))]
+        dirnames[:] = sorted (set (dirnames) - set (rolling))
+
+        for filename in sorted (filenames + rolling):
+            yield os.path.join (directory, filename)
+
+
+def parseExperiment (filename, experimentRx):
+    """Recover the experiment configuration and query from a path."""
+    pieces = filename.split (os.sep)
+    index = next (idx for idx, piece in enumerate (pieces)
+                  if experimentRx.search (piece))
+    experiment = pieces[index]
+    executors, cores, memory, datasize = experiment.split ("_")[:4]
+
+    return {
+        "experiment": experiment,
+        "query": pieces[index + 1],
+        "executors": executors,
+        "totalCores": str (int (executors) * int (cores)),
+        "memory": memory,
+        "datasize": datasize
+    }
+
+
+def listLogs (root, appRx):
+    """Yield the logs below root as triplets: the path the log would have
+    if extracted, the file to read, and the zip member if any."""
+    for filename in walkFiles (root):
+        if not appRx.search (filename):
+            continue
+        elif isRolling (filename):
+            path = os.path.join (os.path.dirname (filename),
+                                 rollingName (filename))
+            yield path, filename, None
+        elif filename.endswith (".zip"):
+            directory = os.path.dirname (filename)
+
+            for member in zipMembers (filename):
+                path = os.path.join (directory, member)
+
+                # Logs extracted by previous runs are listed anyway
+                if not os.path.exists (path):
+                    yield path, filename, member
+        else:
+            yield filename, filename, None
+
+
+def logName (path):
+    """Drop the compression extension, if any, from the name of a log."""
+    name, extension = os.path.splitext (os.path.basename (path))
+    return name if extension in CODECS else name + extension
+
+
+def discoverApps (root, appRx, experimentRx):
+    """Find the application logs the same way 'process_logs.sh' does."""
+    apps = []
+
+    for path, source, member in listLogs (root, appRx):
+        if "failed" in path or "failed" in source or "/logs/" not in path:
+            continue
+
+        ids = [match.group (0) for match in appRx.finditer (path)]
+
+        if ids == [logName (path)]:
+            app = parseExperiment (path, experimentRx)
+            app["appId"] = ids[0]
+            app["filename"] = path
+            app["source"] = source
+            app["member"] = member
+            apps.append (app)
+
+    return apps
+
+
+def processApp (app, force = False):
+    """Run the whole per-application chain, return whether it succeeded.
+
+    Logs and tables that did not change since the last run are not
+    processed again, unless forced.
+    """
+    directory = os.path.dirname (app["filename"])
+    newdir = os.path.join (directory, "{}_csv".format (app["appId"]))
+    os.makedirs (newdir, exist_ok = True)
+
+    try:
+        Pipeline (app["source"], app["appId"], app["totalCores"], newdir,
+                  formats = ("csv",), member = app["member"],
+                  packed = os.environ.get ("PACKED_SAMPLES") == "yes") \
+            .runCached (force)
+        return True
+    except (Exception, SystemExit) as e:
+        print ("error: processing '{name}' failed: {e!r}"
+               .format (name = app["filename"], e = e), file = sys.stderr)
+        open (os.path.join (newdir, "FAILED"), "a").close ()
+        return False
+
+
+def writeTable (root, apps):
+    with open (os.path.join (root, "ubertable.csv"), "w") as outfile:
+        writer = csv.writer (outfile, lineterminator = "\n")
+        writer.writerow (["Run", "Query", "Executors", "TotalCores",
+                          "Memory", "Datasize"])
+        writer.writerows ([app["appId"], app["query"], app["executors"],
+                           app["totalCores"], app["memory"], app["datasize"]]
+                          for app in apps)
+
+
+def main ():
+    args = parseArgs ()
+    conf = parseConfiguration ()
+
+    # lua_file_builder reads the DagSim parameters from the environment
+    for name, value in conf.items ():
+        os.environ.setdefault (name, value)
+
+    appRx = re.compile (conf["APP_REGEX"])
+    experimentRx = re.compile (conf["EXPERIMENT_REGEX"])
+
+    apps = discoverApps (args.root, appRx, experimentRx)
+    writeTable (args.root, apps)
+
+    with ProcessPoolExecutor (max_workers = args.jobs) as pool:
+        results = list (pool.map (partial (processApp, force = args.force),
+                                  apps))
+
+    failures = results.count (False)
+
+    if failures:
+        print ("warning: {} of {} applications failed"
+               .format (failures, len (results)), file = sys.stderr)
+
+
+if __name__ == "__main__":
+    main ()
@@ -0,0 +1,160 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Skip processing steps whose inputs did not change.
+
+Every output directory keeps a manifest with an entry per step.  An entry
+records the size, modification time and content hash of the inputs, the
+version of the code and the options the step ran with, and the size and
+modification time of the outputs.  Inputs with the same size and
+modification time are assumed unchanged, otherwise their content is
+hashed again, so that copying or touching a log does not trigger a new
+parse.  Entries that do not match are evicted before running the step.
+"""
+
+
+import hashlib
+import json
+import os
+import sys
+
+
+MANIFEST = ".cache.json"
+FORMAT = 1
+BUFFER_SIZE = 1 << 20
+
+
+def digest(filename):
+    checksum = hashlib.blake2b()
+
+    with open(filename, "rb") as infile:
+        for block in iter(lambda: infile.read(BUFFER_SIZE), b""):
+            checksum.update(block)
+
+    return checksum.hexdigest()
+
+
+def codeVersion(*modules):
+    """Hash the source of the modules that produce the outputs, given
+    by name as in sys.modules."""
+    checksum = hashlib.blake2b()
+
+    for module in modules:
+        with open(sys.modules[module].__file__, "rb") as infile:
+            checksum.update(infile.read())
+
+    return checksum.hexdigest()
+
+
+def stat(filename):
+    info = os.stat(filename)
+    return {"size": info.st_size, "mtime": info.st_mtime_ns}
+
+
+class Cache:
+    def __init__(self, directory):
+        self.filename = os.path.join(directory, MANIFEST)
+
+        try:
+            with open(self.filename) as infile:
+                manifest = json.load(infile)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if manifest.get("format") == FORMAT:
+            self.entries = manifest["entries"]
+        else:
+            self.entries = {}
+
+
+    def save(self):
+        temporary = self.filename + ".tmp"
+
+        with open(temporary, "w") as outfile:
+            json.dump({"format": FORMAT, "entries": self.entries}, outfile,
+                      indent = 1, sort_keys = True)
+
+        os.replace(temporary, self.filename)
+
+
+    def inputChanged(self, filename, recorded):
+        try:
+            current = stat(filename)
+        except OSError:
+            return True
+
+        if current == recorded["stat"]:
+            return False
+        elif current["size"] != recorded["stat"]["size"] or \
+             digest(filename) != recorded["digest"]:
+            return True
+
+        # Same content, remember the new timestamp to avoid hashing again
+        recorded["stat"] = current
+        return False
+
+
+    def outputChanged(self, filename, recorded):
+        try:
+            return stat(filename) != recorded
+        except OSError:
+            return True
+
+
+    def hit(self, step, inputs, key):
+        entry = self.entries.get(step)
+
+        if entry is None:
+            return False
+        elif entry["key"] != key or sorted(entry["inputs"]) != sorted(inputs) \
+             or any(self.inputChanged(name, entry["inputs"][name])
+                    for name in inputs) \
+             or any(self.outputChanged(name, recorded)
+                    for name, recorded in entry["outputs"].items()):
+            del self.entries[step]
+            self.save()
+            return False
+        else:
+            # Refreshed timestamps are worth keeping
+            self.save()
+            return True
+
+
+    def store(self, step, inputs, key, outputs):
+        self.entries[step] = {
+            "key": key,
+            "inputs": {name: {"stat": stat(name), "digest": digest(name)}
+                       for name in inputs},
+            "outputs": {name: stat(name) for name in outputs}
+        }
+        self.save()
+
+
+def cachedRun(directory, step, run, inputs, outputs, key, force = False):
+    """Call run unless the outputs of step in directory are up to date.
+
+    outputs is called after run to list the files it produced, while key
+    collects the code version and the options that affect them.  Return
+    whether run was called.
+    """
+    cache = Cache(directory)
+    inputs = [os.path.realpath(name) for name in inputs]
+
+    if not force and cache.hit(step, inputs, key):
+        return False
+
+    run()
+    cache.store(step, inputs, key,
+                [os.path.realpath(name) for name in outputs()])
+    return True
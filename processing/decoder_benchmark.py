@@ -0,0 +1,117 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Time the parsing of the lines of a log in lines per second, comparing
+the decoding of every line with json to the prefilter on the event name
+followed by each of the available decoders."""
+
+
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+from argparse import ArgumentParser
+
+from parser import DECODERS, SparkParser
+from synthetic import writeLog
+
+
+def decodeAll(parser, lines):
+    """Decode every line, as the parser did before the prefilter."""
+    for line in lines:
+        try:
+            parser.handleEvent(json.loads(line))
+        except Exception as e:
+            print ("warning: {}".format (e), file = sys.stderr)
+
+
+def prefilter(parser, lines):
+    parser.parseLines(lines)
+
+
+def timeParse(parser, lines, function, loads, repeat):
+    """Return the best time of parsing the lines and the records."""
+    def run():
+        parser.clearRecords()
+        function(parser, lines)
+
+    parser.loads = loads
+    best = min(timeit.repeat(run, number = 1, repeat = repeat))
+    return best, parser.tableRecords()
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("-l", "--log", metavar = "LOG_FILE",
+                        help = "plain text log to parse instead of a synthetic one")
+    parser.add_argument("-s", "--stages", type = int, default = 40,
+                        help = "stages of the synthetic log")
+    parser.add_argument("-t", "--tasks", type = int, default = 1000,
+                        help = "tasks per stage of the synthetic log")
+    parser.add_argument("-n", "--noise", type = int, default = 3,
+                        help = "rounds of discarded events per task")
+    parser.add_argument("-r", "--repeat", type = int, default = 3,
+                        help = "timing repetitions, the best one is kept")
+    parser.add_argument("--seed", type = int, default = 0)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = args.log
+
+        if filename is None:
+            filename = os.path.join(directory, "eventlog")
+
+            with open(filename, "w") as outfile:
+                writeLog(outfile, args.stages, args.tasks,
+                         random.Random(args.seed), args.noise)
+
+        with open(filename, "rb") as infile:
+            lines = infile.readlines()
+
+        parser = SparkParser(filename, "1", directory)
+
+    variants = [("decode all + json", decodeAll, "json")]
+    variants.extend(("prefilter + {}".format(name), prefilter, name)
+                    for name in sorted(DECODERS, key = lambda n: n != "json"))
+
+    print("{} lines".format(len(lines)))
+    print("variant\tlines/s\tspeedup")
+    baseline = expected = None
+
+    for label, function, decoder in variants:
+        elapsed, records = timeParse(parser, lines, function,
+                                     DECODERS[decoder], args.repeat)
+
+        if expected is None:
+            baseline, expected = elapsed, records
+        elif records != expected:
+            print("error: '{}' extracts different records".format(label),
+                  file = sys.stderr)
+            sys.exit(1)
+
+        print("{}\t{:.0f}\t{:.2f}x".format(label, len(lines) / elapsed,
+                                           baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Estimate the execution time of an application on any number of cores
+from the stage DAG and the task times profiled by 'automate.py'.
+
+Every stage starts when all its parents end and runs its tasks in
+waves over the cores.  For each core count this gives:
+  - the waves of every stage;
+  - the critical path, where stages take as many mean task times as
+    their waves;
+  - a lower bound, the largest between the total work spread over the
+    cores and the chain of longest tasks along the DAG;
+  - Graham's bound for list scheduling, W / C + (1 - 1 / C) L, with W
+    the total work and L the chain of longest tasks.
+"""
+
+
+import os
+import re
+import sys
+
+from argparse import ArgumentParser
+
+import numpy
+
+from automate import Parser
+from samples import loadSamples
+
+
+NODES_RX = re.compile(r"^Nodes = ([0-9]+);", re.MULTILINE)
+
+
+def loadModel(directory):
+    """Return the stage DAG of an application and its task times,
+    as a list of arrays in the order of the stages."""
+    parser = Parser(os.path.join(directory, "jobs_1.csv"),
+                    os.path.join(directory, "tasks_1.csv"),
+                    os.path.join(directory, "stages_1.csv"), directory)
+    parser.fileValidation(parser.jobsFile)
+    parser.fileValidation(parser.stagesRelFile)
+    parser.parseJobs()
+    parser.buildJobHierarchy()
+    dag = parser.perJobStagesRel()
+    samples = []
+
+    for stageId in dag.ids:
+        filename = os.path.join(directory, "S{}.txt".format(stageId))
+
+        try:
+            samples.append(numpy.array(loadSamples(filename), dtype = float))
+        except FileNotFoundError:
+            print("error: file '{}' does not exist".format(filename),
+                  file = sys.stderr)
+            sys.exit(1)
+
+    return dag, samples
+
+
+def longestPath(dag, order, durations):
+    """Return the longest path through the DAG, where durations has
+    a row per stage and a column per configuration."""
+    finish = numpy.zeros_like(durations)
+
+    for idx in order:
+        parents = dag.parents[idx]
+        start = finish[parents].max(axis = 0) if parents else 0
+        finish[idx] = start + durations[idx]
+
+    return finish.max(axis = 0, initial = 0)
+
+
+def estimate(dag, samples, cores):
+    """Compute waves, critical path and bounds for every core count."""
+    cores = numpy.asarray(cores, dtype = float)
+    order = dag.topologicalOrder()
+
+    if len(order) != len(dag):
+        raise ValueError("the stage dependencies contain a cycle")
+
+    tasks = numpy.array([int(n) for n in dag.tasks], dtype = float)
+    means = numpy.array([s.mean() if s.size else 0. for s in samples])
+    longest = numpy.array([s.max() if s.size else 0. for s in samples])
+
+    waves = numpy.ceil(tasks[:, None] / cores[None, :])
+    work = numpy.dot(tasks, means)
+    chain = longestPath(dag, order, longest[:, None])[0]
+
+    return {
+        "cores": cores,
+        "waves": waves,
+        "criticalPath": longestPath(dag, order, waves * means[:, None]),
+        "lower": numpy.maximum(work / cores, chain),
+        "upper": work / cores + (1 - 1 / cores) * chain
+    }
+
+
+def templateNodes(directory):
+    """Read the number of cores from the Lua model, if any."""
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".lua.template"):
+            with open(os.path.join(directory, name)) as infile:
+                match = NODES_RX.search(infile.read())
+
+            if match:
+                return [int(match.group(1))]
+
+    return None
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "estimate the execution time of "
+                            "an application for several core counts")
+    parser.add_argument("directory", metavar = "CSV_DIRECTORY",
+                        help = "output directory of 'automate.py'")
+    parser.add_argument("-c", "--cores", type = int, action = "append",
+                        help = "core count, can be repeated: by default the "
+                        "Nodes of the Lua model")
+    parser.add_argument("-r", "--range", type = int, nargs = 3,
+                        metavar = ("START", "STOP", "STEP"),
+                        help = "core counts from START to STOP included")
+    parser.add_argument("-w", "--waves", action = "store_true",
+                        help = "print also the waves of each stage")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    if not os.path.isdir(args.directory):
+        print("error: the inserted directory does not exist", file = sys.stderr)
+        sys.exit(1)
+
+    cores = list(args.cores or [])
+
+    if args.range:
+        start, stop, step = args.range
+        cores.extend(range(start, stop + 1, step))
+
+    cores = cores or templateNodes(args.directory)
+
+    if not cores or min(cores) < 1:
+        print("error: provide positive core counts", file = sys.stderr)
+        sys.exit(2)
+
+    dag, samples = loadModel(args.directory)
+    result = estimate(dag, samples, cores)
+
+    headers = ["Cores", "CriticalPath", "LowerBound", "UpperBound"]
+
+    if args.waves:
+        headers += ["Waves_S{}".format(stageId) for stageId in dag.ids]
+
+    print(",".join(headers))
+
+    for idx, count in enumerate(cores):
+        row = [count, result["criticalPath"][idx],
+               result["lower"][idx], result["upper"][idx]]
+
+        if args.waves:
+            row += result["waves"][:, idx].astype(int).tolist()
+
+        print(",".join(map(str, row)))
+
+
+if __name__ == "__main__":
+    main()
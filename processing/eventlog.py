@@ -0,0 +1,269 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Open Spark event logs as binary streams, decompressing on the fly.
+
+Besides plain text, this supports members of zip archives and the
+codecs Spark can use for its event logs.  Only one compressed block
+at a time is kept in memory.  Rolling event logs, as written by Spark 3,
+are directories whose parts are opened one by one.
+"""
+
+
+import io
+import os
+import re
+import struct
+import zipfile
+import zlib
+
+
+INPROGRESS = ".inprogress"
+
+# Spark 3 rolling event logs: eventlog_v2_<app>/events_<index>_<app>,
+# where a compact part replaces all the previous ones
+ROLLING_PREFIX = "eventlog_v2_"
+COMPACT = ".compact"
+PART_RX = re.compile(r"^events_([0-9]+)_")
+
+# Spark's LZ4BlockOutputStream (lz4-java) framing
+LZ4_MAGIC = b"LZ4Block"
+LZ4_HEADER = struct.Struct("<BiiI")
+LZ4_RAW = 0x10
+
+# Spark's SnappyOutputStream (snappy-java) framing
+SNAPPY_MAGIC = b"\x82SNAPPY\x00"
+SNAPPY_HEADER_LENGTH = len(SNAPPY_MAGIC) + 8
+SNAPPY_LENGTH = struct.Struct(">i")
+
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+BUFFER_SIZE = 1 << 20
+
+
+class BlockStream(io.RawIOBase):
+    """Raw stream over a generator of decompressed blocks."""
+
+    def __init__(self, blocks, source):
+        self.blocks = blocks
+        self.source = source
+        self.pending = memoryview(b"")
+
+
+    def readable(self):
+        return True
+
+
+    def readinto(self, buffer):
+        while not self.pending:
+            try:
+                self.pending = memoryview(next(self.blocks))
+            except StopIteration:
+                return 0
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+    def close(self):
+        if not self.closed:
+            self.source.close()
+
+        super().close()
+
+
+def readExactly(infile, size):
+    data = infile.read(size)
+
+    if len(data) != size:
+        raise EOFError("truncated compressed event log")
+
+    return data
+
+
+def gzipBlocks(infile):
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    data = infile.read(BUFFER_SIZE)
+
+    while data:
+        yield decompressor.decompress(data)
+
+        if decompressor.eof:
+            # Concatenated members each need their own decompressor
+            data = decompressor.unused_data or infile.read(BUFFER_SIZE)
+            decompressor = zlib.decompressobj(GZIP_WBITS)
+        else:
+            data = infile.read(BUFFER_SIZE)
+
+
+def lz4Blocks(infile, decompress):
+    while True:
+        magic = infile.read(len(LZ4_MAGIC))
+
+        if not magic:
+            return
+        elif magic != LZ4_MAGIC:
+            raise ValueError("not an LZ4 block stream")
+
+        token, compressed, decompressed, _ = \
+            LZ4_HEADER.unpack(readExactly(infile, LZ4_HEADER.size))
+        data = readExactly(infile, compressed)
+
+        # An empty block ends a stream, but another one may follow
+        if decompressed == 0:
+            continue
+        elif token & 0xF0 == LZ4_RAW:
+            yield data
+        else:
+            yield decompress(data, uncompressed_size = decompressed)
+
+
+def snappyBlocks(infile, uncompress):
+    while True:
+        head = infile.read(SNAPPY_LENGTH.size)
+
+        if not head:
+            return
+        elif head == SNAPPY_MAGIC[:SNAPPY_LENGTH.size]:
+            # The header is repeated when streams are concatenated
+            readExactly(infile, SNAPPY_HEADER_LENGTH - SNAPPY_LENGTH.size)
+            continue
+
+        length, = SNAPPY_LENGTH.unpack(head)
+        yield uncompress(readExactly(infile, length))
+
+
+def openGzip(infile):
+    return BlockStream(gzipBlocks(infile), infile)
+
+
+def openLz4(infile):
+    import lz4.block
+    return BlockStream(lz4Blocks(infile, lz4.block.decompress), infile)
+
+
+def openSnappy(infile):
+    import snappy
+    return BlockStream(snappyBlocks(infile, snappy.uncompress), infile)
+
+
+def openZstd(infile):
+    import zstandard
+
+    decompressor = zstandard.ZstdDecompressor()
+    return decompressor.stream_reader(infile, read_across_frames = True,
+                                      closefd = True)
+
+
+CODECS = {
+    ".gz": openGzip,
+    ".lz4": openLz4,
+    ".snappy": openSnappy,
+    ".zst": openZstd,
+    ".zstd": openZstd
+}
+
+
+def codec(name):
+    """Return the compression extension of a log name, if any."""
+    for suffix in (INPROGRESS, COMPACT):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+
+    extension = os.path.splitext(name)[1]
+    return extension if extension in CODECS else None
+
+
+def isRolling(filename):
+    return os.path.isdir(filename) and \
+        os.path.basename(filename).startswith(ROLLING_PREFIX)
+
+
+def rollingName(directory):
+    """Return the name of a rolling log without the directory prefix."""
+    return os.path.basename(os.path.normpath(directory))[len(ROLLING_PREFIX):]
+
+
+def rollingParts(directory):
+    """List the parts of a rolling log to read, in order.
+
+    Parts before the last compact one are covered by it and skipped.
+    """
+    parts = []
+
+    for name in os.listdir(directory):
+        match = PART_RX.match(name)
+
+        if match:
+            parts.append((int(match.group(1)), name))
+
+    parts.sort()
+    compacted = [idx for idx, (_, name) in enumerate(parts)
+                 if name.endswith(COMPACT)]
+    first = compacted[-1] if compacted else 0
+    return [os.path.join(directory, name) for _, name in parts[first:]]
+
+
+def isPlain(filename, member = None):
+    """Tell whether the log can be accessed at random offsets."""
+    return member is None and not isRolling(filename) \
+        and not zipfile.is_zipfile(filename) and codec(filename) is None
+
+
+def zipMembers(filename):
+    with zipfile.ZipFile(filename) as archive:
+        return [info.filename for info in archive.infolist()
+                if not info.is_dir()]
+
+
+def openEventLog(filename, member = None):
+    """Open an event log, or a member of a zip archive, for binary reading.
+
+    Without an explicit member, the archive must contain exactly one file.
+    """
+    if member is not None or zipfile.is_zipfile(filename):
+        with zipfile.ZipFile(filename) as archive:
+            if member is None:
+                members = [info.filename for info in archive.infolist()
+                           if not info.is_dir()]
+
+                if len(members) != 1:
+                    raise ValueError("'{}' contains {} files, choose a member"
+                                     .format(filename, len(members)))
+
+                member = members[0]
+
+            # The member keeps the archive file open after closing it here
+            infile = archive.open(member)
+
+        name = member
+    else:
+        infile = open(filename, "rb")
+        name = filename
+
+    extension = codec(name)
+
+    if extension is None:
+        return infile
+
+    try:
+        stream = CODECS[extension](infile)
+    except ImportError as e:
+        infile.close()
+        raise ImportError("reading '{ext}' event logs requires the '{module}' "
+                          "module".format(ext = extension, module = e.name))
+
+    return io.BufferedReader(stream, BUFFER_SIZE)
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Time the extraction of fields from the events of a log, comparing
+the compiled plans of the parser with a walk of the header specs."""
+
+
+import json
+import sys
+import tempfile
+import timeit
+
+from argparse import ArgumentParser
+
+from eventlog import openEventLog
+from parser import (PATH_SEPARATOR, TOP_LEVEL, ExtractionPlan, SparkParser,
+                    eventType, fieldColumn)
+
+
+def walk(data, headers):
+    """Interpret the header specs for every event."""
+    record = {}
+
+    for path, entries in headers.items():
+        group = data
+
+        try:
+            if path != TOP_LEVEL:
+                for key in path.split(PATH_SEPARATOR):
+                    group = group[key]
+        except KeyError:
+            continue
+
+        for entry in entries:
+            field, column = fieldColumn(entry)
+
+            try:
+                record[column] = group[field]
+            except KeyError:
+                pass
+
+    return record
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("filename", metavar = "LOG_FILE")
+    parser.add_argument("-n", "--events", type = int, default = 10000,
+                        help = "events of each kind to sample")
+    parser.add_argument("-r", "--repeat", type = int, default = 5,
+                        help = "timing repetitions, the best one is kept")
+    parser.add_argument("-e", "--fields", metavar = "JSON_FILE",
+                        help = "more fields to extract, as in parser.py")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    fields = None
+
+    if args.fields:
+        with open(args.fields) as infile:
+            fields = json.load(infile)
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        parser = SparkParser(args.filename, "1", outputDir, fields = fields)
+
+    specs = {
+        b"SparkListenerTaskEnd": parser.tasksHeaders,
+        b"SparkListenerStageCompleted": parser.stageHeaders,
+        b"SparkListenerJobStart": parser.jobHeaders,
+        b"SparkListenerExecutorAdded": parser.executorsHeaders
+    }
+    samples = {event: [] for event in specs}
+
+    with openEventLog(args.filename) as infile:
+        for line in infile:
+            event = eventType(line)
+
+            if event in samples and len(samples[event]) < args.events:
+                samples[event].append(json.loads(line))
+
+    print("event\tcount\twalk [us]\tplan [us]\tspeedup")
+
+    for event, events in samples.items():
+        if not events:
+            continue
+
+        headers = specs[event]
+        extract = ExtractionPlan(headers).extract
+
+        if any(walk(data, headers) != extract(data) for data in events):
+            print("error: the plan for {} disagrees with the walk"
+                  .format(event.decode()), file = sys.stderr)
+            sys.exit(1)
+
+        times = []
+
+        for function in (lambda: [walk(data, headers) for data in events],
+                         lambda: [extract(data) for data in events]):
+            best = min(timeit.repeat(function, number = 1,
+                                     repeat = args.repeat))
+            times.append(1e6 * best / len(events))
+
+        print("{}\t{}\t{:.2f}\t{:.2f}\t{:.1f}x".format(
+            event.decode(), len(events), times[0], times[1],
+            times[0] / times[1]))
+
+
+if __name__ == "__main__":
+    main()
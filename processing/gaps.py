@@ -15,63 +15,197 @@
 ## limitations under the License.
 
 
+"""Find the idle time between the stages or jobs of an application.
+
+Gaps go from the latest completion among the intervals submitted so far
+to the next submission, so that intervals overlapping others do not hide
+or make up any.  With NumPy, a sweep over the start and end of all the
+intervals also gives their concurrency at every instant, the union of
+busy time and the average parallelism.
+"""
+
+
 import csv
 import sys
 
-from itertools import tee
-from operator import itemgetter
+from argparse import ArgumentParser
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tables import readColumns, readFields, readRows
 
 
-# From the recipe in https://docs.python.org/3.7/library/itertools.html#recipes
-def pairwise (iterable):
-    a, b = tee (iterable)
-    next (b, None)
-    return zip (a, b)
+ANALYSES = ("gaps", "idle", "concurrency", "summary")
 
 
 def parseInput (filename):
-    with open (filename, "r") as infile:
-        reader = csv.DictReader (infile)
-        fields = reader.fieldnames
-        label = next (f for f in fields if "ID" in f)
-        data = [
-            {"ID": row[label],
-             "Submission Time": row["Submission Time"],
-             "Completion Time": row["Completion Time"]}
-            for row in reader
-        ]
+    return extractData (readRows (filename), readFields (filename))
+
+
+def extractData (rows, fields):
+    """Keep the times of rows read from a table with the given columns."""
+    label = next (f for f in fields if "ID" in f)
+    data = [
+        {"ID": row[label],
+         "Submission Time": row["Submission Time"],
+         "Completion Time": row["Completion Time"]}
+        for row in rows
+    ]
 
     return data
 
 
 def processData (data):
-    sortedData = sorted (data, key = itemgetter ("Submission Time"))
-    possibleGaps = (
-        {"Previous ID": first["ID"],
-         "Next ID": second["ID"],
-         "Span": int (second["Submission Time"]) - int (first["Completion Time"])}
-        for first, second in pairwise (sortedData)
-    )
-    gaps = [row for row in possibleGaps if row["Span"] > 0]
+    sortedData = sorted (data, key = lambda row: int (row["Submission Time"]))
+    gaps = []
+    latest = None
+
+    for row in sortedData:
+        submission = int (row["Submission Time"])
+        completion = int (row["Completion Time"])
+
+        if latest is not None and submission > latest:
+            gaps.append ({"Previous ID": latestId,
+                          "Next ID": row["ID"],
+                          "Span": submission - latest})
+
+        if latest is None or completion > latest:
+            latest = completion
+            latestId = row["ID"]
+
     headers = ["Previous ID", "Next ID", "Span"]
     return headers, gaps
 
 
-def produceCSV (headers, gaps):
-    writer = csv.DictWriter (sys.stdout, headers)
+def sweep (submissions, completions):
+    """Sweep the intervals [submission, completion) in time order.
+
+    Return the instants where the concurrency changes with the number of
+    intervals running from each of them to the next one, along with the
+    idle intervals between the first submission and the last completion.
+    Intervals ending before they start are ignored.
+    """
+    if numpy is None:
+        raise ImportError ("the sweep requires the 'numpy' module")
+
+    starts = numpy.asarray (submissions, dtype = numpy.int64)
+    ends = numpy.asarray (completions, dtype = numpy.int64)
+    valid = ends >= starts
+    starts = starts[valid]
+    ends = ends[valid]
+
+    times = numpy.concatenate ((starts, ends))
+    deltas = numpy.concatenate ((numpy.ones_like (starts),
+                                 -numpy.ones_like (ends)))
+    # Ends come first, so that touching intervals do not overlap
+    order = numpy.lexsort ((deltas, times))
+    times = times[order]
+    levels = numpy.cumsum (deltas[order])
+
+    # The level after the last event at each instant holds until the next
+    last = numpy.ones (len (times), dtype = bool)
+    last[:-1] = times[1:] != times[:-1]
+    times = times[last]
+    levels = levels[last]
+
+    changed = numpy.ones (len (times), dtype = bool)
+    changed[1:] = levels[1:] != levels[:-1]
+    times = times[changed]
+    levels = levels[changed]
+
+    durations = numpy.diff (times)
+    idle = numpy.flatnonzero (levels[:-1] == 0)
+
+    return {
+        "times": times,
+        "levels": levels,
+        "durations": durations,
+        "idleStarts": times[idle],
+        "idleEnds": times[idle + 1]
+    }
+
+
+def summarize (result):
+    """Reduce a sweep to the span of the intervals, the union of busy
+    time, the idle time and the maximum and average parallelism, the
+    latter over the whole span and over the busy time only."""
+    times = result["times"]
+    durations = result["durations"]
+    levels = result["levels"][:-1]
+
+    span = int (times[-1] - times[0]) if len (times) else 0
+    busy = int (durations[levels > 0].sum ())
+    work = int (numpy.dot (levels, durations))
+
+    return {
+        "Start": int (times[0]) if len (times) else "",
+        "End": int (times[-1]) if len (times) else "",
+        "Span": span,
+        "Busy Time": busy,
+        "Idle Time": span - busy,
+        "Max Parallelism": int (levels.max (initial = 0)),
+        "Mean Parallelism": work / span if span else 0.,
+        "Busy Parallelism": work / busy if busy else 0.
+    }
+
+
+def analyze (filename, analysis):
+    """Return the headers and rows of an analysis of a table."""
+    if analysis == "gaps":
+        return processData (parseInput (filename))
+
+    columns = readColumns (filename, ["Submission Time", "Completion Time"])
+    # Intervals still running or never started are left out
+    intervals = [(s, c) for s, c in zip (columns["Submission Time"],
+                                        columns["Completion Time"])
+                 if s is not None and c is not None]
+    result = sweep ([s for s, _ in intervals], [c for _, c in intervals])
+
+    if analysis == "idle":
+        headers = ["Start", "End", "Span"]
+        rows = zip (result["idleStarts"].tolist (), result["idleEnds"].tolist (),
+                    (result["idleEnds"] - result["idleStarts"]).tolist ())
+    elif analysis == "concurrency":
+        headers = ["Time", "Concurrency"]
+        rows = zip (result["times"].tolist (), result["levels"].tolist ())
+    else:
+        summary = summarize (result)
+        return list (summary), [summary]
+
+    return headers, [dict (zip (headers, row)) for row in rows]
+
+
+def produceCSV (headers, gaps, outfile = sys.stdout):
+    writer = csv.DictWriter (outfile, headers)
     writer.writeheader ()
     writer.writerows (gaps)
 
 
+def parseArgs (argv = None):
+    parser = ArgumentParser (description = "find the idle time between the "
+                             "stages or jobs in a table")
+    parser.add_argument ("filename", metavar = "CSV_FILE")
+    parser.add_argument ("-a", "--analysis", choices = ANALYSES,
+                         default = "gaps",
+                         help = "gaps between intervals (default), idle "
+                         "intervals, concurrency at every instant or a "
+                         "summary of busy time and parallelism")
+    return parser.parse_args (argv)
+
+
 def main ():
-    if len (sys.argv) == 2:
-        filename = str (sys.argv[1])
-        data = parseInput (filename)
-        headers, gaps = processData (data)
-        produceCSV (headers, gaps)
-    else:
-        print ("Required args: [CSV_FILE]", file = sys.stderr)
-        sys.exit (2)
+    args = parseArgs ()
+
+    try:
+        headers, rows = analyze (args.filename, args.analysis)
+    except ImportError as e:
+        print ("error: {}".format (e), file = sys.stderr)
+        sys.exit (1)
+
+    produceCSV (headers, rows)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Time the construction of the job hierarchy on synthetic applications,
+checking it against the pairwise comparison of jobs on the small ones."""
+
+
+import copy
+import random
+import sys
+import time
+
+from argparse import ArgumentParser
+
+from automate import Parser
+
+
+def synthesize(count, rng):
+    """Jobs in sequence, with bursts of concurrent ones and coarse
+    timestamps, so that ties are common."""
+    jobsMap = {}
+    now = 0
+
+    while len(jobsMap) < count:
+        burst = rng.choice([1, 1, 1, 2, 3, 8])
+        start = now
+
+        for _ in range(min(burst, count - len(jobsMap))):
+            submission = start + rng.randrange(3)
+            completion = submission + rng.randrange(6)
+            now = max(now, completion + rng.randrange(2))
+            jobsMap[str(len(jobsMap))] = {
+                "submissionTime": submission,
+                "completionTime": completion,
+                "followers": [],
+                "parents": []
+            }
+
+    return jobsMap
+
+
+def legacyHierarchy(parser):
+    parser.buildSimpleJobHierarchy()
+    parser.buildComplexJobHierarchy()
+
+    for key, value in parser.jobsMap.items():
+        for key_1, value_1 in parser.jobsMap.items():
+            if key != key_1 and key in value_1["parents"]:
+                value["followers"].append(key_1)
+
+
+def timeHierarchy(jobsMap, build):
+    parser = Parser(None, None, None, None)
+    parser.jobsMap = copy.deepcopy(jobsMap)
+    start = time.perf_counter()
+    build(parser)
+    return time.perf_counter() - start, parser.jobsMap
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("-s", "--seed", type = int, default = 0)
+    parser.add_argument("-c", "--check", type = int, default = 200,
+                        help = "random applications compared to the "
+                        "pairwise construction")
+    parser.add_argument("-l", "--legacy", type = int, default = 1000,
+                        help = "largest application timed with the "
+                        "pairwise construction")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    rng = random.Random(args.seed)
+
+    for _ in range(args.check):
+        jobsMap = synthesize(rng.randrange(1, 60), rng)
+
+        # Sometimes break the assumption behind the sorted construction
+        if rng.random() < 0.1:
+            job = rng.choice(list(jobsMap.values()))
+            job["completionTime"] = 0
+
+        _, expected = timeHierarchy(jobsMap, legacyHierarchy)
+        _, actual = timeHierarchy(jobsMap, Parser.buildJobHierarchy)
+
+        if actual != expected:
+            print("error: the hierarchies differ", file = sys.stderr)
+            sys.exit(1)
+
+    print("jobs\tpairwise [s]\tsorted [s]")
+
+    for count in (100, 1000, 10000, 100000):
+        jobsMap = synthesize(count, rng)
+
+        if count <= args.legacy:
+            legacy, _ = timeHierarchy(jobsMap, legacyHierarchy)
+            legacy = "{:.3f}".format(legacy)
+        else:
+            legacy = "-"
+
+        elapsed, _ = timeHierarchy(jobsMap, Parser.buildJobHierarchy)
+        print("{}\t{}\t{:.3f}".format(count, legacy, elapsed))
+
+
+if __name__ == "__main__":
+    main()
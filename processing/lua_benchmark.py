@@ -0,0 +1,141 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Time the Lua model of synthetic stage DAGs, written in one pass,
+checking it against the string concatenation and replacements it took
+the place of."""
+
+
+import io
+import os
+import random
+import sys
+import time
+
+from argparse import ArgumentParser
+from functools import reduce
+
+from automate import Parser
+from lua_file_builder import luaArray, writeTemplate
+from stagedag import StageDAG
+
+
+SETTINGS = {
+    "CONTAINERS": "48",
+    "USERS": "1",
+    "TYPE": "exp",
+    "PARAMS": "{rate = 0.001}"
+}
+
+
+def synthesize(count, rng):
+    """Stages in sequence, each depending on up to three of the ten
+    before it, with a few roots along the way."""
+    stages = []
+
+    for idx in range(count):
+        window = range(max(0, idx - 10), idx)
+        parents = rng.sample(window, min(len(window), rng.randrange(4)))
+        stages.append((str(idx), str(rng.randrange(1, 500)),
+                       [str(p) for p in parents]))
+
+    return StageDAG.fromStages(stages)
+
+
+def legacyLuaFile(parser, dag, template):
+    names = ["S{}".format (stageId) for stageId in dag.ids]
+    targetString = ''
+
+    for idx, name in enumerate(names):
+        namedParents = [names[x] for x in dag.parents[idx]]
+        namedChildren = [names[x] for x in dag.children[idx]]
+        namedParents = reduce(lambda accumul, current: accumul + '"' + current + '",', namedParents, '')
+        namedChildren = reduce(lambda accumul, current: accumul + '"' + current + '",', namedChildren, '')
+
+        if namedParents != '':
+            namedParents = namedParents[:-1]
+
+        if namedChildren != '':
+            namedChildren = namedChildren[:-1]
+
+        targetString += '{{name="{name}", tasks="{tasks}"'.format (name = name, tasks = dag.tasks[idx])
+        timeFile = os.path.join (parser.targetDirectory, "{}.txt".format (name))
+        targetString += ', distr={{type="replay", params={{samples=solver.fileToArray("{filename}")}}}}'.format (filename = timeFile)
+        targetString += ', pre={{{parents}}}, post={{{children}}}}},\n'.format (parents = namedParents, children = namedChildren)
+
+    stages = '{\n' + targetString[:-2] + '\n}\n'
+    content = template.replace('@@STAGES@@', stages)
+
+    for name, value in SETTINGS.items():
+        content = content.replace('@@{}@@'.format(name), value)
+
+    return content
+
+
+def streamedLuaFile(parser, dag, template):
+    outfile = io.StringIO()
+    values = dict(SETTINGS, STAGES = luaArray(parser.stageEntries(dag)))
+    writeTemplate(outfile, template, values)
+    return outfile.getvalue()
+
+
+def timeLuaFile(parser, dag, template, build):
+    start = time.perf_counter()
+    content = build(parser, dag, template)
+    return time.perf_counter() - start, content
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("-s", "--seed", type = int, default = 0)
+    parser.add_argument("-c", "--check", type = int, default = 100,
+                        help = "random DAGs compared to the concatenation")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    rng = random.Random(args.seed)
+    parser = Parser(None, None, None, "/data/app_csv")
+    scriptdir = os.path.dirname(os.path.realpath(__file__))
+
+    with open(os.path.join(scriptdir, "template.lua")) as infile:
+        template = infile.read()
+
+    for _ in range(args.check):
+        dag = synthesize(rng.randrange(0, 200), rng)
+
+        if streamedLuaFile(parser, dag, template) != \
+           legacyLuaFile(parser, dag, template):
+            print("error: the Lua files differ", file = sys.stderr)
+            sys.exit(1)
+
+    print("stages\tconcatenated [s]\tstreamed [s]")
+
+    for count in (100, 1000, 10000, 100000):
+        dag = synthesize(count, rng)
+        legacy, expected = timeLuaFile(parser, dag, template, legacyLuaFile)
+        elapsed, actual = timeLuaFile(parser, dag, template, streamedLuaFile)
+
+        if actual != expected:
+            print("error: the Lua files differ", file = sys.stderr)
+            sys.exit(1)
+
+        print("{}\t{:.3f}\t{:.3f}".format(count, legacy, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,32 +17,73 @@
 
 
 import os
+import re
 import sys
 
 
-def buildLuaFile(targetDirectory, name, containers):
+PLACEHOLDER_RX = re.compile(r"@@(\w+)@@")
+
+
+def luaArray(entries):
+    """Yield the pieces of a Lua array of the given entries, one per line."""
+    yield "{\n"
+
+    for idx, entry in enumerate(entries):
+        if idx:
+            yield ",\n"
+
+        yield entry
+
+    yield "\n}\n"
+
+
+def writeTemplate(outfile, template, values):
+    """Write template to outfile in one pass, filling in the placeholders
+    with values, either strings or iterables of pieces.  Placeholders
+    without a value are left for later."""
+    position = 0
+
+    for match in PLACEHOLDER_RX.finditer(template):
+        outfile.write(template[position:match.start()])
+        value = values.get(match.group(1), match.group(0))
+
+        if isinstance(value, str):
+            outfile.write(value)
+        else:
+            outfile.writelines(value)
+
+        position = match.end()
+
+    outfile.write(template[position:])
+
+
+def buildLuaFile(targetDirectory, name, containers, stages = None):
+    """Fill in the template with the entries of the stages, by default
+    copying the array in dependencies.lua in targetDirectory."""
     scriptdir = os.path.dirname(os.path.realpath(__file__))
 
     with open(os.path.join(scriptdir, 'template.lua'), 'r') as infile:
-        content = infile.read()
+        template = infile.read()
 
-    with open (os.path.join (targetDirectory,
-                             "dependencies.lua"), "r") as infile:
-        stages = infile.read ()
+    if stages is None:
+        with open (os.path.join (targetDirectory,
+                                 "dependencies.lua"), "r") as infile:
+            stages = infile.read ()
+    else:
+        stages = luaArray(stages)
 
-    content = content \
-        .replace('@@STAGES@@', stages) \
-        .replace('@@CONTAINERS@@', containers) \
-        .replace('@@USERS@@', os.environ['DAGSIM_USERS']) \
-        .replace('@@TYPE@@',
-                 os.environ['DAGSIM_UTHINKTIMEDISTR_TYPE']) \
-        .replace('@@PARAMS@@',
-                 os.environ['DAGSIM_UTHINKTIMEDISTR_PARAMS'])
+    values = {
+        "STAGES": stages,
+        "CONTAINERS": containers,
+        "USERS": os.environ['DAGSIM_USERS'],
+        "TYPE": os.environ['DAGSIM_UTHINKTIMEDISTR_TYPE'],
+        "PARAMS": os.environ['DAGSIM_UTHINKTIMEDISTR_PARAMS']
+    }
 
     outfilename = os.path.join(targetDirectory,
                                '{}.lua.template'.format(name))
     with open(outfilename, 'w') as outfile:
-        outfile.write(content)
+        writeTemplate(outfile, template, values)
 
 
 def main():
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Measure with tracemalloc the peak memory of parsing synthetic logs of
+growing size with --stream, failing if it grows with the log in any of
+the formats that can be written."""
+
+
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+from argparse import ArgumentParser
+
+from parser import SparkParser
+from synthetic import writeLog
+from tables import columnarFormat
+
+
+def peakMemory(filename, fmt, outputDir):
+    parser = SparkParser(filename, "1", outputDir, formats = (fmt,),
+                         stream = True)
+    tracemalloc.start()
+
+    try:
+        parser.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("-s", "--stages", type = int, default = 40,
+                        help = "stages of every log")
+    parser.add_argument("-t", "--tasks", type = int, nargs = "+",
+                        default = [500, 1000, 2000],
+                        help = "tasks per stage of the logs, in growing order")
+    parser.add_argument("-n", "--noise", type = int, default = 1,
+                        help = "rounds of discarded events per task")
+    parser.add_argument("-g", "--growth", type = float, default = 0.25,
+                        help = "peak growth allowed from the smallest log "
+                        "to the largest")
+    parser.add_argument("--seed", type = int, default = 0)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    formats = ["csv", "npz"]
+
+    if columnarFormat() == "parquet":
+        formats.append("parquet")
+
+    peaks = {fmt: [] for fmt in formats}
+    print("tasks\tlog [MB]\t" + "\t".join("{} [MB]".format(fmt)
+                                           for fmt in formats))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "eventlog")
+
+        for tasks in args.tasks:
+            with open(filename, "w") as outfile:
+                writeLog(outfile, args.stages, tasks,
+                         random.Random(args.seed), args.noise)
+
+            for fmt in formats:
+                outputDir = os.path.join(directory, fmt)
+                os.makedirs(outputDir, exist_ok = True)
+                peaks[fmt].append(peakMemory(filename, fmt, outputDir))
+
+            print("{}\t{:.1f}\t".format(args.stages * tasks,
+                                        os.path.getsize(filename) / 2 ** 20)
+                  + "\t".join("{:.1f}".format(peaks[fmt][-1] / 2 ** 20)
+                              for fmt in formats))
+
+    growing = [fmt for fmt in formats
+               if peaks[fmt][-1] > (1 + args.growth) * peaks[fmt][0]]
+
+    if growing:
+        print("error: the peak memory grows with the log in {}"
+              .format(", ".join(growing)), file = sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,14 +16,152 @@
 ## limitations under the License.
 
 
-import csv
+import copy
 import json
+import mmap
 import os
 import sys
+import time
+
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import cachedRun, codeVersion
+from eventlog import INPROGRESS, isPlain, isRolling, openEventLog, rollingParts
+from tables import EXTENSIONS, columnarFormat, openWriter
+
+
+def loadDecoders():
+    """Collect the available JSON decoders, fastest first."""
+    decoders = {}
+
+    try:
+        import orjson
+        decoders["orjson"] = orjson.loads
+    except ImportError:
+        pass
+
+    try:
+        import simdjson
+        decoders["simdjson"] = simdjson.loads
+    except ImportError:
+        pass
+
+    decoders["json"] = json.loads
+    return decoders
+
+
+DECODERS = loadDecoders()
+
+# Only these events contribute to the CSV files, every other line
+# is discarded before being decoded
+PARSED_EVENTS = frozenset([
+    b"SparkListenerTaskEnd",
+    b"SparkListenerStageCompleted",
+    b"SparkListenerJobStart",
+    b"SparkListenerJobEnd",
+    b"SparkListenerApplicationStart",
+    b"SparkListenerApplicationEnd",
+    b"SparkListenerExecutorAdded"
+])
+
+EVENT_KEY = b'"Event"'
+
+TABLES = ("tasks", "jobs", "stages", "app", "executors")
+
+# More chunks than workers balance the load of uneven portions of the log,
+# and a cap on their size bounds the records waiting to be merged
+CHUNKS_PER_JOB = 4
+CHUNK_BYTES = 64 << 20
+
+# Tasks kept in memory before being written out when streaming
+STREAM_BATCH = 10000
+
+# Header specs address nested objects by path
+PATH_SEPARATOR = "/"
+TOP_LEVEL = "_"
+
+
+def eventType(line):
+    """Read the event name from a raw log line without decoding it.
+
+    Spark writes the "Event" key first, so it is enough to look for
+    the first string value after it.  Return None if there is none.
+    """
+    start = line.find(EVENT_KEY)
+
+    if start < 0:
+        return None
+
+    start = line.find(b'"', start + len(EVENT_KEY))
+    end = line.find(b'"', start + 1)
+
+    if start < 0 or end < 0:
+        return None
+
+    return line[start + 1:end]
+
+
+def fieldColumn(entry):
+    """Fields are given by name, or as [field, column] to rename them."""
+    return (entry, entry) if isinstance(entry, str) else tuple(entry)
+
+
+class ExtractionPlan:
+    """Extract the fields of a header spec from decoded events.
+
+    Header specs map the path of a nested object, with its keys separated
+    by '/' and '_' for the top level of the event, to the fields to read
+    from it.  The spec is compiled into a function that looks up every
+    object once and reads all of its fields together, going field by
+    field only when some are missing.
+    """
+    def __init__(self, headers):
+        self.headers = headers
+        self.extract = self.compile(headers)
+
+
+    def __reduce__(self):
+        # Compiled functions cannot be pickled for the worker processes
+        return (ExtractionPlan, (self.headers,))
+
+
+    @staticmethod
+    def compile(headers):
+        namespace = {"EMPTY": {}}
+        code = ["def extract(data):", "    record = {}"]
+
+        for idx, (path, entries) in enumerate(headers.items()):
+            pairs = [fieldColumn(entry) for entry in entries]
+            fields = "FIELDS_{}".format(idx)
+            namespace[fields] = pairs
+            code.append("    group = data")
+
+            if path != TOP_LEVEL:
+                code.extend("    group = group.get({!r}, EMPTY)".format(key)
+                            for key in path.split(PATH_SEPARATOR))
+
+            targets = "".join("record[{!r}], ".format(c) for _, c in pairs)
+            values = "".join("group[{!r}], ".format(f) for f, _ in pairs)
+            code.extend([
+                "    try:",
+                "        {} = {}".format(targets, values),
+                "    except KeyError:",
+                "        for field, column in {}:".format(fields),
+                "            if field in group:",
+                "                record[column] = group[field]"
+            ])
+
+        code.append("    return record")
+        exec("\n".join(code), namespace)
+        return namespace["extract"]
 
 
 class SparkParser:
-    def __init__(self, filename, appId, outputDir):
+    def __init__(self, filename, appId, outputDir, decoder = None, jobs = 1,
+                 member = None, formats = ("csv",), stream = False,
+                 fields = None):
         if os.path.exists(outputDir):
             self.outputDir = outputDir
         else:
@@ -31,20 +169,27 @@ class SparkParser:
                    .format(outputDir), file = sys.stderr)
             sys.exit(1)
 
-        if os.path.exists(filename):
-            self.filename = filename
-        else:
+        self.filename = filename
+
+        if not os.path.exists(self.currentLog()):
             print ("error: the inserted file '{}' does not exist"
                    .format(filename), file = sys.stderr)
             sys.exit(1)
 
+        try:
+            self.loads = DECODERS[decoder or next(iter(DECODERS))]
+        except KeyError:
+            print ("error: the JSON decoder '{}' is not available"
+                   .format(decoder), file = sys.stderr)
+            sys.exit(1)
+
         #Class props
         self.appId = appId
-        self.tasksCSVInfo = []
-        self.stagesCSVInfo = []
-        self.jobsCSVInfo = []
-        self.appCSVInfo = []
-        self.executorsCSVInfo = []
+        self.member = member
+        self.jobs = jobs
+        self.formats = formats
+        self.stream = stream
+        self.clearRecords()
 
         self.stageHeaders = {
             "Stage Info" : [
@@ -89,7 +234,7 @@ class SparkParser:
                 "Memory Bytes Spilled",
                 "Disk Bytes Spilled",
             ],
-            "Shuffle Write Metrics": [
+            "Task Metrics/Shuffle Write Metrics": [
                 "Shuffle Bytes Written",
                 "Shuffle Write Time",
                 "Shuffle Records Written"
@@ -115,136 +260,521 @@ class SparkParser:
             ]
         }
 
+        self.fields = fields or {}
+        self.addFields(self.fields)
+        self.stagePlan = ExtractionPlan(self.stageHeaders)
+        self.jobPlan = ExtractionPlan(self.jobHeaders)
+        self.taskPlan = ExtractionPlan(self.tasksHeaders)
+        self.applicationPlan = ExtractionPlan(self.applicationHeaders)
+        self.executorPlan = ExtractionPlan(self.executorsHeaders)
+
+
+    def addFields(self, fields):
+        """Extend the header specs with more fields, given per table."""
+        tables = {
+            "tasks": self.tasksHeaders,
+            "stages": self.stageHeaders,
+            "jobs": self.jobHeaders,
+            "executors": self.executorsHeaders
+        }
+
+        for table, spec in fields.items():
+            if table not in tables:
+                print ("error: cannot add fields to the '{}' table".format(table),
+                       file = sys.stderr)
+                sys.exit(2)
+
+            headers = tables[table]
+            columns = set(self.normalizeHeaders(headers))
+
+            for path, entries in spec.items():
+                group = headers.setdefault(path, [])
+
+                for entry in entries:
+                    if fieldColumn(entry)[1] not in columns:
+                        group.append(entry)
+                        columns.add(fieldColumn(entry)[1])
+
+
+    def clearRecords(self):
+        self.tasksCSVInfo = []
+        self.stagesCSVInfo = []
+        self.jobsCSVInfo = []
+        self.appCSVInfo = []
+        self.executorsCSVInfo = []
+        self.jobData = {}
+        self.appData = None
+        self.deferred = None
+        self.taskWriters = None
+        self.taskBuffer = []
+
 
     def run(self):
-        self.parseSwitch()
+        self.parseLog()
         self.produceCSVs()
 
 
-    def parse(self, data, headers):
-        record = {}
+    def parseLog(self):
+        """Collect the records of the whole log, without writing them."""
+        if self.stream:
+            self.openTaskWriters()
+
+        if isRolling(self.filename):
+            self.parseParts()
+        elif self.jobs > 1 and isPlain(self.filename, self.member):
+            self.parseParallel()
+        else:
+            self.parseSwitch()
+
+
+    def outputs(self):
+        return [os.path.join(self.outputDir, "{table}_{app}{ext}".format(
+                    table = table, app = self.appId, ext = EXTENSIONS[fmt]))
+                for table in TABLES for fmt in self.formats]
+
+
+    def runCached(self, force = False):
+        """Run unless the tables are up to date with the log."""
+        key = {
+            "version": codeVersion(__name__, "eventlog", "tables"),
+            "appId": self.appId,
+            "member": self.member,
+            "formats": sorted(self.formats),
+            "fields": self.fields
+        }
+        return cachedRun(self.outputDir, "parser", self.run, self.logFiles(),
+                         self.outputs, key, force)
+
+
+    def logFiles(self):
+        if isRolling(self.filename):
+            return rollingParts(self.filename)
+        else:
+            return [self.filename]
 
-        for field, inner in headers.items ():
-            for subfield in inner:
-                try:
-                    if field == "_":
-                        value = data[subfield]
-                    elif field == "Shuffle Write Metrics":
-                        value = data["Task Metrics"][field][subfield]
-                    else:
-                        value = data[field][subfield]
 
-                    record[subfield] = value
-                except KeyError:
-                    pass
+    def openTaskWriters(self):
+        """Write tasks while parsing, rather than keeping them all in memory."""
+        basename = os.path.join(self.outputDir, "tasks_{}".format(self.appId))
+        self.taskFields = self.normalizeHeaders(self.tasksHeaders)
+        self.taskWriters = [openWriter(basename, self.taskFields, fmt)
+                            for fmt in self.formats]
 
-        return record
+
+    def addTask(self, record):
+        if self.taskWriters is None:
+            self.tasksCSVInfo.append (record)
+        else:
+            # Tuples are much smaller than dicts
+            self.taskBuffer.append(tuple(record.get(h) for h in self.taskFields))
+
+            if len(self.taskBuffer) >= STREAM_BATCH:
+                self.flushTasks()
+
+
+    def flushTasks(self):
+        for writer in self.taskWriters:
+            writer.write(self.taskBuffer)
+
+        self.taskBuffer = []
 
 
     def parseSwitch(self):
-        jobData = {}
+        with openEventLog(self.filename, self.member) as infile:
+            self.parseLines(infile)
+
+
+    def parseLines(self, lines):
+        for line in lines:
+            try:
+                event = eventType(line)
+
+                # Lines without a recognizable event go through the
+                # decoder anyway, so that malformed input is reported
+                if event is not None and event not in PARSED_EVENTS:
+                    continue
+
+                self.handleEvent(self.loads(line))
+            except Exception as e:
+                print ("warning: {}".format (e), file = sys.stderr)
+
+
+    def handleEvent(self, data):
+        event = data["Event"]
+
+        if event == "SparkListenerTaskEnd" and not data["Task Info"]["Failed"]:
+            record = self.taskPlan.extract(data)
+            self.addTask(record)
+        elif event == "SparkListenerStageCompleted":
+            if "Failure Reason" in data["Stage Info"]:
+                print ("error: stage {id} failed in '{name}'"
+                       .format (id = data["Stage Info"]["Stage ID"],
+                                name = self.filename),
+                       file = sys.stderr)
+                sys.exit (3)
+            else:
+                record = self.stagePlan.extract(data)
+                self.stagesCSVInfo.append (record)
+        elif event in ("SparkListenerJobStart", "SparkListenerJobEnd"):
+            record = self.jobPlan.extract(data)
+            self.sequence(event, record)
+        elif event in ("SparkListenerApplicationStart",
+                       "SparkListenerApplicationEnd"):
+            record = self.applicationPlan.extract(data)
+            self.sequence(event, record)
+        elif event == "SparkListenerExecutorAdded":
+            record = self.executorPlan.extract(data)
+            self.executorsCSVInfo.append (record)
+
+
+    def sequence(self, event, record):
+        """Handle the events whose outcome depends on the ones before them.
+
+        When parsing a chunk of the log they are only recorded, to be
+        replayed in order once all the chunks are merged.
+        """
+        if self.deferred is not None:
+            self.deferred.append ((event, record))
+        elif event == "SparkListenerJobStart":
+            self.jobData[record["Job ID"]] = record
+        elif event == "SparkListenerJobEnd":
+            jobId = record["Job ID"]
+
+            try:
+                previous = self.jobData.pop (jobId)
+            except KeyError:
+                print ("error: job {} ended without starting"
+                       .format (jobId), file = sys.stderr)
+                sys.exit (3)
+
+            record.update (previous)
+            self.jobsCSVInfo.append (record)
+        elif event == "SparkListenerApplicationStart":
+            self.appData = {"App ID": record["App ID"],
+                            "Submission Time": record["Timestamp"]}
+        elif event == "SparkListenerApplicationEnd":
+            self.appData["Completion Time"] = record["Timestamp"]
+            self.appCSVInfo.append (self.appData)
+
+
+    def parseParallel(self):
+        """Split the log in newline aligned chunks and parse them
+        in worker processes."""
+        if os.path.getsize(self.filename) == 0:
+            # An empty file cannot be mapped, and has nothing to split
+            self.parseSwitch()
+            return
+
+        with open(self.filename, "rb") as infile, \
+             mmap.mmap(infile.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            chunks = max(self.jobs * CHUNKS_PER_JOB, size // CHUNK_BYTES + 1)
+            bounds = [0]
+
+            for idx in range(1, chunks):
+                newline = mm.find(b"\n", max(bounds[-1], idx * size // chunks))
+
+                if newline < 0:
+                    break
+
+                bounds.append(newline + 1)
+
+            bounds.append(size)
+
+        self.parseInWorkers(parseChunk, [(start, end) for start, end
+                                         in zip(bounds, bounds[1:])
+                                         if start < end])
+
+
+    def parseParts(self):
+        """Parse the parts of a rolling log, each in a worker process
+        when more jobs are allowed."""
+        parts = rollingParts(self.filename)
+
+        if self.jobs > 1 and len(parts) > 1:
+            self.parseInWorkers(parsePart, [(part,) for part in parts])
+        else:
+            for part in parts:
+                with openEventLog(part) as infile:
+                    self.parseLines(infile)
 
-        with open(self.filename) as infile:
-            for line in infile:
-                try:
-                    data = json.loads(line)
-                    event = data["Event"]
-
-                    if event == "SparkListenerTaskEnd" and not data["Task Info"]["Failed"]:
-                        record = self.parse(data, self.tasksHeaders)
-                        self.tasksCSVInfo.append (record)
-                    elif event == "SparkListenerStageCompleted":
-                        if "Failure Reason" in data["Stage Info"]:
-                            print ("error: stage {id} failed in '{name}'"
-                                   .format (id = data["Stage Info"]["Stage ID"],
-                                            name = self.filename),
-                                   file = sys.stderr)
-                            sys.exit (3)
-                        else:
-                            record = self.parse(data, self.stageHeaders)
-                            self.stagesCSVInfo.append (record)
-                    elif event == "SparkListenerJobStart":
-                        record = self.parse(data, self.jobHeaders)
-                        jobData[record["Job ID"]] = record
-                    elif event == "SparkListenerJobEnd":
-                        record = self.parse(data, self.jobHeaders)
-                        jobId = record["Job ID"]
-
-                        try:
-                            previous = jobData.pop (jobId)
-                        except KeyError:
-                            print ("error: job {} ended without starting"
-                                   .format (jobId), file = sys.stderr)
-                            sys.exit (3)
-
-                        record.update (previous)
-                        self.jobsCSVInfo.append (record)
-                    elif event == "SparkListenerApplicationStart":
-                        record = self.parse(data, self.applicationHeaders)
-                        appData = {"App ID": record["App ID"],
-                                   "Submission Time": record["Timestamp"]}
-                    elif event == "SparkListenerApplicationEnd":
-                        record = self.parse(data, self.applicationHeaders)
-                        appData["Completion Time"] = record["Timestamp"]
-                        self.appCSVInfo.append (appData)
-                    elif event == "SparkListenerExecutorAdded":
-                        record = self.parse(data, self.executorsHeaders)
-                        self.executorsCSVInfo.append (record)
-
-                except Exception as e:
-                    print ("warning: {}".format (e), file = sys.stderr)
+
+    def parseInWorkers(self, function, pieces):
+        """Call function on every piece of the log in worker processes,
+        then merge the partial records in order."""
+        # Workers get a copy without records, which is cheap to send
+        # and does not change while merging
+        worker = copy.copy(self)
+        worker.clearRecords()
+        worker.deferred = []
+
+        # Only a few pieces at a time are submitted, so that parsed
+        # records do not pile up while waiting for the previous ones
+        with ProcessPoolExecutor(max_workers = self.jobs) as pool:
+            pending = deque()
+
+            for args in pieces:
+                pending.append(pool.submit(function, worker, *args))
+
+                if len(pending) > 2 * self.jobs:
+                    self.mergeChunk(*pending.popleft().result())
+
+            while pending:
+                self.mergeChunk(*pending.popleft().result())
+
+
+    def mergeChunk(self, tasks, stages, executors, deferred):
+        for record in tasks:
+            self.addTask(record)
+
+        self.stagesCSVInfo.extend(stages)
+        self.executorsCSVInfo.extend(executors)
+
+        for event, record in deferred:
+            try:
+                self.sequence(event, record)
+            except Exception as e:
+                print ("warning: {}".format (e), file = sys.stderr)
 
 
     def normalizeHeaders(self, headersDict):
-        return [subfield for inner in headersDict.values ()
-                for subfield in inner]
-
-
-    def produceCSVs(self):
-        csvTasks = [
-            {
-                "filename": os.path.join(self.outputDir, "tasks_{}.csv".format(self.appId)),
-                "records": self.tasksCSVInfo,
-                "headers": self.normalizeHeaders(self.tasksHeaders)
-            },
-            {
-                "filename": os.path.join(self.outputDir, "jobs_{}.csv".format(self.appId)),
-                "records": self.jobsCSVInfo,
-                "headers": self.normalizeHeaders(self.jobHeaders)
-            },
-            {
-                "filename": os.path.join(self.outputDir, "stages_{}.csv".format(self.appId)),
-                "records": self.stagesCSVInfo,
-                "headers": self.normalizeHeaders(self.stageHeaders)
-            },
-            {
-                "filename": os.path.join(self.outputDir, "app_{}.csv".format(self.appId)),
-                "records": self.appCSVInfo,
-                "headers": ["App ID", "Submission Time", "Completion Time"]
-            },
-            {
-                "filename": os.path.join(self.outputDir, "executors_{}.csv".format(self.appId)),
-                "records": self.executorsCSVInfo,
-                "headers": self.normalizeHeaders(self.executorsHeaders)
-            }
-        ]
-
-        for item in csvTasks:
-            with open (item["filename"], "w") as outfile:
-                writer = csv.DictWriter (outfile, fieldnames = item["headers"])
-                writer.writeheader ()
-                writer.writerows (item["records"])
+        return [fieldColumn(entry)[1] for inner in headersDict.values ()
+                for entry in inner]
+
+
+    def tableRecords(self):
+        """Map every table to its headers and records, in the order of TABLES."""
+        return {
+            "tasks": (self.normalizeHeaders(self.tasksHeaders), self.tasksCSVInfo),
+            "jobs": (self.normalizeHeaders(self.jobHeaders), self.jobsCSVInfo),
+            "stages": (self.normalizeHeaders(self.stageHeaders), self.stagesCSVInfo),
+            "app": (["App ID", "Submission Time", "Completion Time"], self.appCSVInfo),
+            "executors": (self.normalizeHeaders(self.executorsHeaders),
+                          self.executorsCSVInfo)
+        }
 
 
-def main():
-    args = sys.argv
+    def produceCSVs(self, append = False):
+        """Write the tables in every requested format."""
+        tables = self.tableRecords()
+
+        if self.taskWriters is not None:
+            self.flushTasks()
+
+            for writer in self.taskWriters:
+                writer.close()
+
+            del tables["tasks"]
+
+        for table, (headers, records) in tables.items():
+            basename = os.path.join(self.outputDir, "{table}_{app}".format(
+                table = table, app = self.appId))
+            rows = [[record.get(h) for h in headers] for record in records]
 
-    if len(args) != 4:
-        print ("Required args: [LOG_FILE_TO_PARSE] [ID_FOR_CSV_NAMING] [OUTPUTDIR]",
-               file = sys.stderr)
-        sys.exit(2)
+            for fmt in self.formats:
+                writer = openWriter(basename, headers, fmt, append)
+                writer.write(rows)
+                writer.close()
+
+
+    def currentLog(self):
+        """Spark drops the in-progress extension when the application ends."""
+        if not os.path.exists(self.filename) and self.filename.endswith(INPROGRESS):
+            final = self.filename[:-len(INPROGRESS)]
+
+            if os.path.exists(final):
+                return final
+
+        return self.filename
+
+
+    def csvTables(self):
+        return {table: os.path.join(self.outputDir, "{table}_{app}.csv".format(
+            table = table, app = self.appId)) for table in self.tableRecords()}
+
+
+    def truncateTables(self, lengths):
+        """Drop the rows appended after the lengths in the checkpoint were
+        recorded: they come from lines that are about to be parsed again."""
+        for table, path in self.csvTables().items():
+            if table in lengths and os.path.exists(path) and \
+               os.path.getsize(path) > lengths[table]:
+                os.truncate(path, lengths[table])
+
+
+    def loadCheckpoint(self, checkpoint):
+        if not os.path.exists(checkpoint):
+            return {"offset": 0, "jobs": [], "app": None, "finished": False}
+
+        with open(checkpoint) as infile:
+            state = json.load(infile)
+
+        self.jobData = {record["Job ID"]: record for record in state["jobs"]}
+        self.appData = state["app"]
+        return state
+
+
+    def saveCheckpoint(self, checkpoint, state):
+        state["jobs"] = list(self.jobData.values())
+        state["app"] = self.appData
+        temporary = checkpoint + ".tmp"
+
+        with open(temporary, "w") as outfile:
+            json.dump(state, outfile)
+
+        os.replace(temporary, checkpoint)
+
+
+    def poll(self, checkpoint):
+        """Parse the lines added since the last checkpoint and append
+        the new records to the CSV files.  Return whether the application
+        has ended."""
+        state = self.loadCheckpoint(checkpoint)
+
+        if state["finished"]:
+            return True
+
+        filename = self.currentLog()
+
+        if not isPlain(filename, self.member):
+            print ("error: only plain text logs can be followed, not '{}'"
+                   .format(filename), file = sys.stderr)
+            sys.exit(1)
+
+        start = state["offset"]
+        self.truncateTables(state.get("lengths", {}))
+
+        with open(filename, "rb") as infile:
+            infile.seek(start)
+            lines = []
+
+            # The last line might still be in the making
+            for line in infile:
+                if not line.endswith(b"\n"):
+                    break
+
+                lines.append(line)
+                state["offset"] += len(line)
+
+                if len(lines) >= STREAM_BATCH:
+                    self.parseLines(lines)
+                    lines = []
+
+            self.parseLines(lines)
+
+        # Start from scratch with the first poll, append afterwards
+        self.produceCSVs(append = start > 0)
+        state["finished"] = bool(self.appCSVInfo)
+        state["lengths"] = {table: os.path.getsize(path)
+                            for table, path in self.csvTables().items()}
+        self.saveCheckpoint(checkpoint, state)
+
+        jobData, appData = self.jobData, self.appData
+        self.clearRecords()
+        self.jobData, self.appData = jobData, appData
+        return state["finished"]
+
+
+    def follow(self, checkpoint, interval = 10, once = False):
+        """Keep parsing an in-progress log until the application ends."""
+        if list(self.formats) != ["csv"] or self.stream:
+            print ("error: only CSV tables without --stream can be produced "
+                   "incrementally", file = sys.stderr)
+            sys.exit(2)
+
+        while not self.poll(checkpoint) and not once:
+            time.sleep(interval)
+
+
+def chunkLines(mm, start, end):
+    """Iterate over the lines of a memory map between two offsets."""
+    while start < end:
+        stop = mm.find(b"\n", start, end)
+        stop = end if stop < 0 else stop + 1
+        yield mm[start:stop]
+        start = stop
+
+
+def partialRecords(parser):
+    return (parser.tasksCSVInfo, parser.stagesCSVInfo,
+            parser.executorsCSVInfo, parser.deferred)
+
+
+def parseChunk(parser, start, end):
+    """Parse a newline aligned portion of the log in a worker process."""
+    with open(parser.filename, "rb") as infile, \
+         mmap.mmap(infile.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+        parser.parseLines(chunkLines(mm, start, end))
+
+    return partialRecords(parser)
+
+
+def parsePart(parser, part):
+    """Parse a part of a rolling log in a worker process."""
+    with openEventLog(part) as infile:
+        parser.parseLines(infile)
+
+    return partialRecords(parser)
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "extract CSV tables from a Spark event log")
+    parser.add_argument("filename", metavar = "LOG_FILE_TO_PARSE")
+    parser.add_argument("appId", metavar = "ID_FOR_CSV_NAMING")
+    parser.add_argument("outputDir", metavar = "OUTPUTDIR")
+    parser.add_argument("-d", "--decoder", choices = sorted(DECODERS),
+                        help = "JSON decoder, by default the fastest available")
+    parser.add_argument("-j", "--jobs", type = int, default = 1,
+                        help = "parse a plain text log in chunks, or the parts of "
+                        "a rolling log, with this many processes")
+    parser.add_argument("-m", "--member",
+                        help = "log to read inside a zip archive")
+    parser.add_argument("-s", "--stream", action = "store_true",
+                        help = "write tasks while parsing to bound memory usage")
+    parser.add_argument("-e", "--fields", metavar = "JSON_FILE",
+                        help = "more fields to extract, as a JSON object mapping "
+                        "table names to header specs")
+    parser.add_argument("-C", "--cache", action = "store_true",
+                        help = "skip parsing if the tables are up to date with the log")
+    parser.add_argument("--force", action = "store_true",
+                        help = "parse anyway, but record the tables with --cache")
+    parser.add_argument("-F", "--follow", action = "store_true",
+                        help = "tail an in-progress log, appending new records")
+    parser.add_argument("-c", "--checkpoint",
+                        help = "state file for --follow, by default in OUTPUTDIR")
+    parser.add_argument("-i", "--interval", type = float, default = 10,
+                        help = "seconds between polls with --follow")
+    parser.add_argument("-1", "--once", action = "store_true",
+                        help = "poll only once with --follow")
+    parser.add_argument("-f", "--format", action = "append", dest = "formats",
+                        choices = sorted(EXTENSIONS) + ["columnar"],
+                        help = "output format, can be repeated: 'columnar' is "
+                        "Parquet if available, otherwise npz (default: csv)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    formats = [columnarFormat() if f == "columnar" else f
+               for f in args.formats or ["csv"]]
+    fields = None
+
+    if args.fields:
+        with open(args.fields) as infile:
+            fields = json.load(infile)
+
+    parser = SparkParser(args.filename, args.appId, args.outputDir,
+                         decoder = args.decoder, jobs = args.jobs,
+                         member = args.member, formats = formats,
+                         stream = args.stream, fields = fields)
+
+    if args.follow:
+        checkpoint = args.checkpoint or os.path.join(
+            args.outputDir, "checkpoint_{}.json".format(args.appId))
+        parser.follow(checkpoint, args.interval, args.once)
+    elif args.cache:
+        parser.runCached(args.force)
     else:
-        parser = SparkParser(str(args[1]), str(args[2]), str(args[3]))
         parser.run()
 
 
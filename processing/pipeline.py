@@ -0,0 +1,205 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Process an application in a single pass.
+
+The records parsed from the event log go straight to the gaps, the DAG
+model with its Lua template and, if asked, the summary row, as the rows
+these steps would read back from the CSV tables.  The tables are written
+only in the requested formats.
+"""
+
+
+import json
+import os
+import sys
+
+from argparse import ArgumentParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             os.pardir, "summary"))
+
+import gaps
+
+from automate import Parser
+from cache import cachedRun, codeVersion
+from extractor import Extractor
+from lua_file_builder import buildLuaFile
+from parser import DECODERS, SparkParser
+from tables import EXTENSIONS, columnarFormat, recordRows
+
+
+# Tables are named as the ones of process_logs.sh
+TABLE_ID = "1"
+GAPS = ("stages", "jobs")
+# Read by lua_file_builder
+LUA_SETTINGS = ("DAGSIM_USERS", "DAGSIM_UTHINKTIMEDISTR_TYPE",
+                "DAGSIM_UTHINKTIMEDISTR_PARAMS")
+
+
+class Pipeline:
+    def __init__(self, filename, appId, cores, outputDir, formats = (),
+                 packed = False, decoder = None, jobs = 1, member = None,
+                 fields = None, summary = None):
+        """summary is None, or the directory of summary.csv together with
+        the users and data size to report."""
+        self.appId = appId
+        self.cores = str(cores)
+        self.outputDir = outputDir
+        self.formats = formats
+        self.packed = packed
+        self.summary = summary
+        self.parser = SparkParser(filename, TABLE_ID, outputDir,
+                                  decoder = decoder, jobs = jobs,
+                                  member = member, formats = formats,
+                                  fields = fields)
+        self.model = None
+
+
+    def tablePath(self, table):
+        return os.path.join(os.path.realpath(self.outputDir),
+                            "{}_{}.csv".format(table, TABLE_ID))
+
+
+    def run(self):
+        self.parser.parseLog()
+
+        if self.formats:
+            self.parser.produceCSVs()
+
+        rows = {table: recordRows(records, headers) for table, (headers, records)
+                in self.parser.tableRecords().items()}
+        self.findGaps(rows)
+
+        self.model = Parser(self.tablePath("jobs"), self.tablePath("tasks"),
+                            self.tablePath("stages"),
+                            os.path.realpath(self.outputDir), self.packed,
+                            {self.tablePath(t): r for t, r in rows.items()})
+        stages = self.model.run()
+        buildLuaFile(self.outputDir, self.appId, self.cores, stages)
+
+        if self.summary is not None:
+            self.summarize(rows)
+
+
+    def findGaps(self, rows):
+        tables = self.parser.tableRecords()
+
+        for table in GAPS:
+            headers, _ = tables[table]
+            data = gaps.extractData(rows[table], headers)
+            outfile = os.path.join(self.outputDir, "{}_gaps_{}.csv"
+                                   .format(table, TABLE_ID))
+
+            with open(outfile, "w") as out:
+                gaps.produceCSV(*gaps.processData(data), out)
+
+
+    def summarize(self, rows):
+        directory, users, datasize = self.summary
+        headerFlag = not os.path.exists(os.path.join(directory, "summary.csv"))
+        Extractor(directory, self.outputDir, users, datasize, headerFlag,
+                  rows).run()
+
+
+    def outputs(self):
+        names = ["{}_gaps_{}.csv".format(table, TABLE_ID) for table in GAPS]
+        names.append("{}.lua.template".format(self.appId))
+        return (self.parser.outputs() + self.model.outputs() +
+                [os.path.join(self.outputDir, name) for name in names])
+
+
+    def runCached(self, force = False):
+        """Run unless every output is up to date with the log."""
+        key = {
+            "version": codeVersion(__name__, "parser", "eventlog", "tables",
+                                   "gaps", "automate", "stagedag", "samples",
+                                   "lua_file_builder"),
+            "appId": self.appId,
+            "cores": self.cores,
+            "member": self.parser.member,
+            "formats": sorted(self.formats),
+            "fields": self.parser.fields,
+            "packed": self.packed,
+            "settings": {name: os.environ.get(name) for name in LUA_SETTINGS}
+        }
+        return cachedRun(self.outputDir, "pipeline", self.run,
+                         self.parser.logFiles(), self.outputs, key, force)
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "process the event log of an "
+                            "application in a single pass")
+    parser.add_argument("filename", metavar = "LOG_FILE_TO_PARSE")
+    parser.add_argument("appId", metavar = "APP_ID")
+    parser.add_argument("cores", metavar = "TOTAL_CORES")
+    parser.add_argument("outputDir", metavar = "OUTPUTDIR")
+    parser.add_argument("-f", "--format", action = "append", dest = "formats",
+                        choices = sorted(EXTENSIONS) + ["columnar"],
+                        help = "write the tables in this format, can be "
+                        "repeated: by default they are not written")
+    parser.add_argument("-p", "--packed", action = "store_true",
+                        help = "keep the task times in a single store")
+    parser.add_argument("-d", "--decoder", choices = sorted(DECODERS),
+                        help = "JSON decoder, by default the fastest available")
+    parser.add_argument("-j", "--jobs", type = int, default = 1,
+                        help = "parse the log with this many processes")
+    parser.add_argument("-m", "--member",
+                        help = "log to read inside a zip archive")
+    parser.add_argument("-e", "--fields", metavar = "JSON_FILE",
+                        help = "more fields to extract, as with 'parser.py'")
+    parser.add_argument("-S", "--summary", nargs = 3,
+                        metavar = ("DIRECTORY", "USERS", "DATASIZE"),
+                        help = "append the summary row of the application "
+                        "to DIRECTORY/summary.csv")
+    parser.add_argument("-C", "--cache", action = "store_true",
+                        help = "skip the application if it is up to date "
+                        "with the log")
+    parser.add_argument("--force", action = "store_true",
+                        help = "process anyway, but record the outputs with --cache")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    if args.cache and args.summary:
+        print("error: a cached run cannot append the summary row",
+              file = sys.stderr)
+        sys.exit(2)
+
+    formats = [columnarFormat() if f == "columnar" else f
+               for f in args.formats or []]
+    fields = None
+
+    if args.fields:
+        with open(args.fields) as infile:
+            fields = json.load(infile)
+
+    pipeline = Pipeline(args.filename, args.appId, args.cores, args.outputDir,
+                        formats = formats, packed = args.packed,
+                        decoder = args.decoder, jobs = args.jobs,
+                        member = args.member, fields = fields,
+                        summary = args.summary)
+
+    if args.cache:
+        pipeline.runCached(args.force)
+    else:
+        pipeline.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Keep the task times of all the stages in a single file.
+
+A store replaces the S<id>.txt files of a directory with 'samples.bin':
+a magic string, the length of a JSON index mapping every stage name to
+the offset and count of its samples, the index, and then all the samples
+as a packed array of 64 bit integers.  Lua models keep referring to the
+text files, and readers fall back on the store in the same directory
+when these do not exist.
+"""
+
+
+import array
+import json
+import os
+import re
+import struct
+import sys
+
+from argparse import ArgumentParser
+from functools import lru_cache
+
+
+STORE_NAME = "samples.bin"
+MAGIC = b"SAMPLES1"
+LENGTH = struct.Struct("<Q")
+ITEM_SIZE = 8
+TEXT_RX = re.compile(r"^(S[0-9]+)\.txt$")
+
+
+def writeStore(filename, stages):
+    """Write a store from a mapping of stage names to their samples."""
+    index = {}
+    data = array.array("q")
+
+    for name, values in stages.items():
+        index[name] = [len(data), len(values)]
+        data.extend(int(v) for v in values)
+
+    header = json.dumps(index, separators = (",", ":")).encode()
+    # Align the samples, so that they can be mapped as an array
+    padding = -(len(MAGIC) + LENGTH.size + len(header)) % ITEM_SIZE
+    header += b" " * padding
+
+    if sys.byteorder != "little":
+        data.byteswap()
+
+    with open(filename, "wb") as outfile:
+        outfile.write(MAGIC)
+        outfile.write(LENGTH.pack(len(header)))
+        outfile.write(header)
+        data.tofile(outfile)
+
+
+class SampleStore:
+    def __init__(self, filename):
+        self.filename = filename
+
+        with open(filename, "rb") as infile:
+            if infile.read(len(MAGIC)) != MAGIC:
+                raise ValueError("'{}' is not a sample store".format(filename))
+
+            length, = LENGTH.unpack(infile.read(LENGTH.size))
+            self.index = json.loads(infile.read(length).decode())
+            self.data = array.array("q")
+            self.data.frombytes(infile.read())
+
+        if sys.byteorder != "little":
+            self.data.byteswap()
+
+
+    def __contains__(self, name):
+        return name in self.index
+
+
+    def __getitem__(self, name):
+        offset, count = self.index[name]
+        return self.data[offset:offset + count]
+
+
+    def items(self):
+        return ((name, self[name]) for name in self.index)
+
+
+def readTextSamples(filename):
+    with open(filename) as infile:
+        return [int(line) for line in infile if line.strip()]
+
+
+def loadSamples(path):
+    """Read the samples of a stage given the path of its text file,
+    from the store in the same directory if the file does not exist."""
+    if os.path.exists(path):
+        return readTextSamples(path)
+
+    directory, base = os.path.split(path)
+    match = TEXT_RX.match(base)
+    store = os.path.join(directory, STORE_NAME)
+
+    if match is None or not os.path.exists(store):
+        raise FileNotFoundError("no samples for '{}'".format(path))
+
+    return openStore(store)[match.group(1)]
+
+
+@lru_cache(maxsize = None)
+def openStore(filename):
+    """Read each store once, however many stages refer to it."""
+    return SampleStore(filename)
+
+
+def mergeStores(filename, inputs):
+    """Append the samples of each stage across stores, in order, as
+    concatenating the text files would."""
+    stages = {}
+
+    for store in inputs:
+        for name, values in SampleStore(store).items():
+            stages.setdefault(name, array.array("q")).extend(values)
+
+    writeStore(filename, dict(sorted(stages.items())))
+
+
+def packDirectory(directory, remove = False):
+    """Gather the text files of a directory in a store."""
+    files = sorted(name for name in os.listdir(directory) if TEXT_RX.match(name))
+    writeStore(os.path.join(directory, STORE_NAME),
+               {TEXT_RX.match(name).group(1):
+                readTextSamples(os.path.join(directory, name))
+                for name in files})
+
+    if remove:
+        for name in files:
+            os.remove(os.path.join(directory, name))
+
+
+def unpackStore(filename, directory):
+    """Write the text files of a store, for DagSim."""
+    for name, values in SampleStore(filename).items():
+        with open(os.path.join(directory, name + ".txt"), "w") as outfile:
+            for value in values:
+                print(value, file = outfile)
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "manage stores of task times")
+    commands = parser.add_subparsers(dest = "command")
+    commands.required = True
+
+    merge = commands.add_parser("merge", help = "concatenate stores")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs = "*",
+                       help = "by default read from standard input, one per line")
+
+    pack = commands.add_parser("pack", help = "pack the S<id>.txt files")
+    pack.add_argument("directory")
+    pack.add_argument("-r", "--remove", action = "store_true",
+                      help = "remove the text files once packed")
+
+    unpack = commands.add_parser("unpack", help = "write S<id>.txt files")
+    unpack.add_argument("store")
+    unpack.add_argument("directory", nargs = "?",
+                        help = "by default the directory of the store")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    if args.command == "merge":
+        inputs = args.inputs or [line.rstrip("\n") for line in sys.stdin
+                                 if line.strip()]
+
+        # Without stores nothing is written, as with no text files
+        if inputs:
+            mergeStores(args.output, inputs)
+    elif args.command == "pack":
+        packDirectory(args.directory, args.remove)
+    else:
+        unpackStore(args.store, args.directory or
+                    os.path.dirname(os.path.abspath(args.store)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Simulate the Lua models built for DagSim, in place of it.
+
+Users submit jobs in a closed loop, waiting a think time after each one
+ends.  A stage of a job is ready when all its predecessors end, then its
+tasks take the first free cores in order.  Several independent streams
+of jobs are simulated at once, as rows of NumPy arrays, and together
+they run maxJobs jobs.  The output is the line DagSim prints for the
+whole job: two zeros, then the mean response time, its standard
+deviation, the bounds of its confidence interval and the relative
+accuracy.
+"""
+
+
+import math
+import re
+import sys
+
+from argparse import ArgumentParser
+
+import numpy
+
+from samples import loadSamples
+from stagedag import StageDAG
+
+
+STAGE_RX = re.compile(
+    r'\{\s*name\s*=\s*"(?P<name>[^"]*)"\s*,\s*tasks\s*=\s*"?(?P<tasks>[0-9]+)"?'
+    r'\s*,\s*distr\s*=\s*\{\s*type\s*=\s*"(?P<type>\w+)"\s*,\s*params\s*=\s*'
+    r'\{\s*samples\s*=\s*solver\.fileToArray\s*\(\s*"(?P<file>[^"]*)"\s*\)'
+    r'\s*\}\s*\}\s*,\s*pre\s*=\s*\{(?P<pre>[^}]*)\}')
+NAME_RX = re.compile(r'"([^"]*)"')
+SETTING_RX = r"^\s*{}\s*=\s*(?P<value>[^;]+);"
+THINK_RX = re.compile(r'type\s*=\s*"(?P<type>\w+)"\s*,\s*params\s*=\s*'
+                      r'\{(?P<params>[^}]*)\}')
+PARAM_RX = re.compile(r"(\w+)\s*=\s*([-+.0-9eE]+)")
+
+SAMPLED = ("replay", "empirical")
+
+
+class Model:
+    """The parts of a DagSim Lua model the simulation needs."""
+
+    def __init__(self, filename):
+        with open(filename) as infile:
+            text = infile.read()
+
+        stages = []
+        self.kinds = {}
+        self.samples = {}
+
+        for match in STAGE_RX.finditer(text):
+            name = match.group("name")
+            kind = match.group("type")
+
+            if kind not in SAMPLED:
+                raise ValueError("stage {} has an unsupported distribution "
+                                 "'{}'".format(name, kind))
+
+            stages.append((name, int(match.group("tasks")),
+                           NAME_RX.findall(match.group("pre"))))
+            self.kinds[name] = kind
+            self.samples[name] = numpy.array(loadSamples(match.group("file")),
+                                             dtype = float)
+
+        if not stages:
+            raise ValueError("no stages found in '{}'".format(filename))
+
+        self.dag = StageDAG.fromStages(stages)
+        self.nodes = int(self.setting(text, "Nodes"))
+        self.users = int(self.setting(text, "Users"))
+        self.maxJobs = int(self.setting(text, "maxJobs"))
+        self.confIntCoeff = float(self.setting(text, "confIntCoeff"))
+        self.think = self.thinkTime(self.setting(text, "UThinkTimeDistr"))
+
+
+    @staticmethod
+    def setting(text, name):
+        match = re.search(SETTING_RX.format(name), text, re.MULTILINE)
+
+        if match is None:
+            raise ValueError("missing '{}' in the model".format(name))
+
+        return match.group("value").strip()
+
+
+    @staticmethod
+    def thinkTime(text):
+        match = THINK_RX.search(text)
+
+        if match is None:
+            raise ValueError("cannot read the think time '{}'".format(text))
+
+        kind = match.group("type")
+        params = {k: float(v) for k, v in PARAM_RX.findall(match.group("params"))}
+
+        if kind == "exp":
+            return lambda rng, size: rng.exponential(1 / params["rate"], size)
+        elif kind == "const":
+            return lambda rng, size: numpy.full(size, params["value"])
+        else:
+            raise ValueError("unsupported think time distribution '{}'"
+                             .format(kind))
+
+
+def stageOrder(model):
+    """Order the stages by their expected start, so that tasks queue up
+    as they would in time.  Parents always come before their children."""
+    dag = model.dag
+    means = [model.samples[name].mean() for name in dag.ids]
+    starts = [0.] * len(dag)
+    topological = dag.topologicalOrder()
+
+    if len(topological) != len(dag):
+        raise ValueError("the stage dependencies contain a cycle")
+
+    for idx in topological:
+        waves = math.ceil(dag.tasks[idx] / model.nodes)
+        end = starts[idx] + waves * means[idx]
+
+        for child in dag.children[idx]:
+            starts[child] = max(starts[child], end)
+
+    position = {idx: pos for pos, idx in enumerate(topological)}
+    return sorted(topological, key = lambda idx: (starts[idx], position[idx]))
+
+
+def taskTimes(model, idx, jobs, rng):
+    """Draw the task times of a stage for a batch of jobs."""
+    name = model.dag.ids[idx]
+    samples = model.samples[name]
+    tasks = model.dag.tasks[idx]
+
+    if model.kinds[name] == "empirical":
+        return rng.choice(samples, size = (len(jobs), tasks))
+    else:
+        # Replay the samples in order, job after job
+        offsets = jobs[:, None] * tasks + numpy.arange(tasks)[None, :]
+        return samples[offsets % len(samples)]
+
+
+def simulate(model, streams, rng):
+    """Return the response times of maxJobs jobs."""
+    dag = model.dag
+    order = stageOrder(model)
+    streams = max(1, min(streams, model.maxJobs))
+    rows = numpy.arange(streams)
+    free = numpy.zeros((streams, model.nodes))
+    submission = numpy.zeros((streams, model.users))
+    responses = []
+
+    for batch in range(math.ceil(model.maxJobs / streams)):
+        jobs = batch * streams + rows
+        user = submission.argmin(axis = 1)
+        submitted = submission[rows, user]
+        finish = numpy.empty((len(dag), streams))
+
+        for idx in order:
+            parents = dag.parents[idx]
+            ready = finish[parents].max(axis = 0) if parents else submitted
+            end = ready.copy()
+
+            for times in taskTimes(model, idx, jobs, rng).T:
+                core = free.argmin(axis = 1)
+                done = numpy.maximum(free[rows, core], ready) + times
+                free[rows, core] = done
+                numpy.maximum(end, done, out = end)
+
+            finish[idx] = end
+
+        completed = finish.max(axis = 0)
+        responses.append(completed - submitted)
+        submission[rows, user] = completed + model.think(rng, streams)
+
+    return numpy.concatenate(responses)[:model.maxJobs]
+
+
+def summarize(model, responses):
+    average = responses.mean()
+    deviation = responses.std(ddof = 1) if len(responses) > 1 else 0.
+    halfWidth = model.confIntCoeff * deviation / math.sqrt(len(responses))
+    accuracy = halfWidth / average if average else 0.
+    return [0., 0., average, deviation, average - halfWidth,
+            average + halfWidth, accuracy]
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "simulate a DagSim Lua model")
+    parser.add_argument("model", metavar = "LUA_FILE")
+    parser.add_argument("-s", "--seed", type = int,
+                        help = "seed of the random number generator")
+    parser.add_argument("-b", "--streams", type = int,
+                        help = "independent streams of jobs simulated together, "
+                        "by default one per job with a single user")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    try:
+        model = Model(args.model)
+    except (OSError, ValueError) as e:
+        print("error: {}".format(e), file = sys.stderr)
+        sys.exit(1)
+
+    # With more users, jobs of the same stream interact, so streams
+    # should be long enough to reach the steady state
+    streams = args.streams or (model.maxJobs if model.users == 1
+                               else max(1, model.maxJobs // (10 * model.users)))
+    rng = numpy.random.default_rng(args.seed)
+    responses = simulate(model, streams, rng)
+    print("\t".join(map(str, summarize(model, responses))))
+
+
+if __name__ == "__main__":
+    main()
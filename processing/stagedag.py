@@ -0,0 +1,107 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""The DAG of the stages of an application, built once from the stages
+table.
+
+Stages are numbered in the order of their IDs, compared as strings the
+way every script has always sorted them, and edges are kept as lists of
+these indices.
+"""
+
+
+from collections import deque
+
+
+def parseIds(text):
+    """Split a list of IDs as printed in the tables, e.g. '[1, 2]'."""
+    return [s for s in text[1:-1].split(", ") if s != ""]
+
+
+class StageDAG:
+    def __init__(self, rows):
+        """Build the DAG from the rows of a stages table, ignoring the
+        parents that do not appear in it."""
+        self.build([(row["Stage ID"], row["Number of Tasks"],
+                     parseIds(row["Parent IDs"])) for row in rows])
+
+
+    @classmethod
+    def fromStages(cls, stages):
+        """Build the DAG from (ID, tasks, parent IDs) triplets."""
+        dag = cls.__new__(cls)
+        dag.build(stages)
+        return dag
+
+
+    def build(self, stages):
+        stages = sorted(stages, key = lambda stage: stage[0])
+        self.ids = [stageId for stageId, _, _ in stages]
+        self.index = {stageId: idx for idx, stageId in enumerate(self.ids)}
+        self.tasks = [tasks for _, tasks, _ in stages]
+        self.parents = []
+        self.children = [[] for _ in stages]
+
+        for idx, (_, _, parentIds) in enumerate(stages):
+            parents = sorted(self.index[p] for p in parentIds
+                             if p in self.index)
+            self.parents.append(parents)
+
+            for parent in parents:
+                self.children[parent].append(idx)
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def __contains__(self, stageId):
+        return stageId in self.index
+
+
+    def addEdge(self, parent, child):
+        self.parents[child].append(parent)
+        self.children[parent].append(child)
+
+
+    def sources(self, indices = None):
+        """Return the stages without parents, among indices if given."""
+        indices = range(len(self)) if indices is None else indices
+        return [idx for idx in indices if not self.parents[idx]]
+
+
+    def sinks(self, indices = None):
+        """Return the stages without children, among indices if given."""
+        indices = range(len(self)) if indices is None else indices
+        return [idx for idx in indices if not self.children[idx]]
+
+
+    def topologicalOrder(self):
+        """Return the stage indices with parents before children.
+        Stages in a cycle are left out."""
+        missing = [len(set(parents)) for parents in self.parents]
+        ready = deque(idx for idx, count in enumerate(missing) if count == 0)
+        order = []
+
+        while ready:
+            idx = ready.popleft()
+            order.append(idx)
+
+            for child in sorted(set(self.children[idx])):
+                missing[child] -= 1
+
+                if missing[child] == 0:
+                    ready.append(child)
+
+        return order
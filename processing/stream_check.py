@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Check that parsing a synthetic log with --stream writes the same tables
+as parsing it at once, in any of the formats that can be written.  The
+log has a sparse string field that first appears after the first batch
+of streamed tasks, and the .npz writer gets also a column of integers
+that turns into strings."""
+
+
+import os
+import random
+import sys
+import tempfile
+
+from argparse import ArgumentParser
+
+from parser import STREAM_BATCH, SparkParser
+from synthetic import writeLog
+from tables import NpzWriter, columnarFormat, loadColumnar, readRows
+
+
+FIELDS = {"tasks": {"Task End Reason": ["Kill Reason"]}}
+
+
+def readTable(filename, fmt):
+    if fmt == "csv":
+        return list(readRows(filename))
+    else:
+        return loadColumnar(filename)
+
+
+def parseTables(filename, fmt, outputDir, stream):
+    os.makedirs(outputDir)
+    SparkParser(filename, "1", outputDir, formats = (fmt,), stream = stream,
+                fields = FIELDS).run()
+    return {name: readTable(os.path.join(outputDir, name), fmt)
+            for name in sorted(os.listdir(outputDir))}
+
+
+def writeNpz(filename, batches):
+    writer = NpzWriter(filename, ["Value"])
+
+    for rows in batches:
+        writer.write(rows)
+
+    writer.close()
+    return loadColumnar(filename)
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = __doc__)
+    parser.add_argument("-s", "--stages", type = int, default = 5,
+                        help = "stages of the log")
+    parser.add_argument("-t", "--tasks", type = int, default = 3000,
+                        help = "tasks per stage of the log")
+    parser.add_argument("--seed", type = int, default = 0)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+    total = args.stages * args.tasks
+    formats = ["csv", "npz"]
+
+    if columnarFormat() == "parquet":
+        formats.append("parquet")
+
+    if total <= STREAM_BATCH:
+        print("error: the log needs more than {} tasks".format(STREAM_BATCH),
+              file = sys.stderr)
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    killed = set(rng.sample(range(STREAM_BATCH, total), 3))
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "eventlog")
+
+        with open(filename, "w") as outfile:
+            writeLog(outfile, args.stages, args.tasks, rng, killed = killed)
+
+        for fmt in formats:
+            tables = [parseTables(filename, fmt,
+                                  os.path.join(directory, fmt + label), stream)
+                      for label, stream in (("-whole", False),
+                                            ("-stream", True))]
+
+            if tables[0] != tables[1]:
+                failures.append(fmt)
+
+        rows = [[None], [0], [1], [None], [2], ["a"], [None]]
+        batched = writeNpz(os.path.join(directory, "batched.npz"),
+                           [rows[:2], rows[2:5], rows[5:]])
+        whole = writeNpz(os.path.join(directory, "whole.npz"), [rows])
+
+        if batched != whole:
+            failures.append("npz with a column widened to strings")
+
+    if failures:
+        print("error: streaming writes different tables in {}"
+              .format(", ".join(failures)), file = sys.stderr)
+        sys.exit(1)
+
+    print("{} tasks, {} killed after the first batch: the same tables "
+          "in {}".format(total, len(killed), ", ".join(formats)))
+
+
+if __name__ == "__main__":
+    main()
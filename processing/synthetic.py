@@ -0,0 +1,130 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Synthetic Spark event logs for the benchmarks."""
+
+
+import json
+
+
+STAGES_PER_JOB = 5
+EXECUTORS = 4
+
+
+def noiseEvents(taskId, rng):
+    """Events of the kinds the parser discards, as frequent in real logs."""
+    return [
+        {"Event": "SparkListenerTaskStart", "Stage ID": 0,
+         "Task Info": {"Task ID": taskId}},
+        {"Event": "SparkListenerBlockUpdated",
+         "Block Updated Info": {"Block Manager ID": {"Executor ID": "1"},
+                                "Block ID": "rdd_{}".format(taskId),
+                                "Memory Size": rng.randrange(10 ** 6)}},
+        {"Event": "SparkListenerExecutorMetricsUpdate", "Executor ID": "1",
+         "Metrics Updated": []}
+    ]
+
+
+def taskEvent(stageId, taskId, now, rng, killed = False):
+    """A task that succeeds or, when killed, ends with a reason that has
+    one more field, as the speculative copies of tasks do."""
+    launch = now + rng.randrange(20)
+    finish = launch + rng.randrange(1, 100)
+    reason = {"Reason": "Success"}
+
+    if killed:
+        reason = {"Reason": "TaskKilled",
+                  "Kill Reason": "another attempt succeeded"}
+
+    return {
+        "Event": "SparkListenerTaskEnd", "Stage ID": stageId,
+        "Stage Attempt ID": 0, "Task Type": "ShuffleMapTask",
+        "Task End Reason": reason,
+        "Task Info": {
+            "Task ID": taskId, "Attempt": 0, "Launch Time": launch,
+            "Executor ID": str(rng.randrange(1, EXECUTORS + 1)),
+            "Host": "host{}".format(rng.randrange(EXECUTORS)),
+            "Locality": "PROCESS_LOCAL", "Getting Result Time": 0,
+            "Finish Time": finish, "Failed": False, "Killed": killed,
+            "Accumulables": []
+        },
+        "Task Metrics": {
+            "Executor Deserialize Time": rng.randrange(10),
+            "Executor Run Time": finish - launch, "Result Size": 1000,
+            "JVM GC Time": rng.randrange(5), "Memory Bytes Spilled": 0,
+            "Disk Bytes Spilled": 0,
+            "Shuffle Write Metrics": {
+                "Shuffle Bytes Written": rng.randrange(10 ** 5),
+                "Shuffle Write Time": rng.randrange(10 ** 6),
+                "Shuffle Records Written": rng.randrange(100)
+            }
+        }
+    }
+
+
+def writeLog(outfile, stages, tasks, rng, noise = 0, killed = ()):
+    """Write the log of an application with jobs of a few stages in
+    sequence, each with the given number of tasks.  Every task comes
+    with noise rounds of events that do not reach the tables, and the
+    tasks with an ID in killed end as killed."""
+    now = 1000
+    taskId = 0
+
+    def write(event):
+        outfile.write(json.dumps(event, separators = (",", ":")))
+        outfile.write("\n")
+
+    write({"Event": "SparkListenerLogStart", "Spark Version": "2.2.0"})
+    write({"Event": "SparkListenerApplicationStart", "App Name": "synthetic",
+           "App ID": "app-20180101000000-0001", "Timestamp": now,
+           "User": "spark"})
+
+    for idx in range(EXECUTORS):
+        write({"Event": "SparkListenerExecutorAdded", "Timestamp": now,
+               "Executor ID": str(idx + 1),
+               "Executor Info": {"Host": "host{}".format(idx),
+                                 "Total Cores": 4}})
+
+    for first in range(0, stages, STAGES_PER_JOB):
+        stageIds = list(range(first, min(first + STAGES_PER_JOB, stages)))
+        jobId = first // STAGES_PER_JOB
+        write({"Event": "SparkListenerJobStart", "Job ID": jobId,
+               "Submission Time": now, "Stage IDs": stageIds,
+               "Properties": {}})
+
+        for stageId in stageIds:
+            submission = now
+
+            for _ in range(tasks):
+                for _ in range(noise):
+                    for event in noiseEvents(taskId, rng):
+                        write(event)
+
+                write(taskEvent(stageId, taskId, now, rng,
+                                taskId in killed))
+                taskId += 1
+
+            now += 200
+            parents = [stageId - 1] if stageId > first else []
+            write({"Event": "SparkListenerStageCompleted", "Stage Info": {
+                "Stage ID": stageId, "Stage Attempt ID": 0,
+                "Stage Name": "map at Synthetic.scala:{}".format(stageId),
+                "Number of Tasks": tasks, "Parent IDs": parents,
+                "Submission Time": submission, "Completion Time": now}})
+
+        write({"Event": "SparkListenerJobEnd", "Job ID": jobId,
+               "Completion Time": now,
+               "Job Result": {"Result": "JobSucceeded"}})
+
+    write({"Event": "SparkListenerApplicationEnd", "Timestamp": now + 10})
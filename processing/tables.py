@@ -0,0 +1,513 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Write and read the tables extracted from event logs.
+
+Besides CSV, tables can be stored with typed columns, either as Parquet
+when pyarrow is available or as NumPy .npz archives.  Readers accept the
+name of any of these files and fall back on the siblings with the same
+stem, so 'tasks_1.csv' also finds 'tasks_1.parquet'.  Rows are returned
+with the same strings csv.DictReader would give, while columns keep
+their types.
+"""
+
+
+import csv
+import os
+import tempfile
+import warnings
+import zipfile
+
+from collections.abc import Mapping
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "npz": ".npz"
+}
+
+# Columns holding integers, any other column is a string unless all
+# of its values turn out to be integers
+INTEGER_FIELDS = frozenset([
+    "Stage ID",
+    "Task ID",
+    "Job ID",
+    "Launch Time",
+    "Finish Time",
+    "Getting Result Time",
+    "Executor Run Time",
+    "Executor Deserialize Time",
+    "JVM GC Time",
+    "Result Size",
+    "Memory Bytes Spilled",
+    "Disk Bytes Spilled",
+    "Shuffle Bytes Written",
+    "Shuffle Write Time",
+    "Shuffle Records Written",
+    "Number of Tasks",
+    "Submission Time",
+    "Completion Time",
+    "Timestamp",
+    "Total Cores"
+])
+
+
+def columnarFormat():
+    """Return the best typed format available."""
+    return "parquet" if pyarrow is not None else "npz"
+
+
+def requireModule(module, name, purpose):
+    if module is None:
+        raise ImportError("{purpose} requires the '{name}' module"
+                          .format(purpose = purpose, name = name))
+
+
+def isInteger(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def columnType(name, values, missing = str):
+    """Integers for the integer fields and for columns whose values are
+    all integers, strings otherwise.  Columns without any value get the
+    missing type: strings by default, as they can hold whatever comes."""
+    if name in INTEGER_FIELDS:
+        return int
+
+    present = [v for v in values if v is not None]
+
+    if not present:
+        return missing
+    elif all(isInteger(v) for v in present):
+        return int
+    else:
+        return str
+
+
+def typedColumn(values, kind):
+    """Convert values as the CSV writer would print them, None if missing."""
+    return [None if v is None else kind(v) for v in values]
+
+
+class CsvWriter:
+    def __init__(self, filename, headers, append = False):
+        exists = append and os.path.exists(filename)
+        self.outfile = open(filename, "a" if exists else "w")
+        self.writer = csv.writer(self.outfile)
+
+        if not exists:
+            self.writer.writerow(headers)
+
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+
+    def close(self):
+        self.outfile.close()
+
+
+class ParquetWriter:
+    def __init__(self, filename, headers):
+        requireModule(pyarrow, "pyarrow", "writing Parquet files")
+        self.filename = filename
+        self.headers = headers
+        self.kinds = None
+        self.writer = None
+
+
+    def write(self, rows):
+        columns = list(zip(*rows)) or [()] * len(self.headers)
+
+        # The first batch fixes the schema
+        if self.kinds is None:
+            self.kinds = [columnType(name, values)
+                          for name, values in zip(self.headers, columns)]
+            schema = pyarrow.schema(
+                (name, pyarrow.int64() if kind is int else pyarrow.string())
+                for name, kind in zip(self.headers, self.kinds))
+            self.writer = pyarrow.parquet.ParquetWriter(self.filename, schema)
+
+        # Columns without values in the first batch are strings, but an
+        # integer column cannot widen once the file holds some rows
+        for name, kind, values in zip(self.headers, self.kinds, columns):
+            if kind is int and columnType(name, values, missing = int) is str:
+                raise ValueError("column '{}' of {} holds integers in the first "
+                                 "batch and strings later"
+                                 .format(name, self.filename))
+
+        arrays = [typedColumn(values, kind)
+                  for values, kind in zip(columns, self.kinds)]
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(a, type = field.type)
+             for a, field in zip(arrays, self.writer.schema)],
+            schema = self.writer.schema)
+        self.writer.write_table(table)
+
+
+    def close(self):
+        if self.writer is None:
+            self.write([])
+
+        self.writer.close()
+
+
+class NpzWriter:
+    """Spool the rows in batches and save them as structured arrays on close.
+
+    Every batch goes to a temporary file as soon as it is written, and the
+    archive is assembled one batch at a time, so that memory usage does
+    not grow with the table.  The 'table' array holds the values, with
+    zeros or empty strings where they are missing, while 'valid' flags
+    the values that are present.
+
+    Each batch is typed on its own and a column takes its type on close:
+    strings if any batch holds strings, integers if the others hold
+    integers, strings as well if no batch holds any value.  Thus a sparse
+    column gets the same type whether the rows come in batches or not.
+    """
+    def __init__(self, filename, headers):
+        requireModule(numpy, "numpy", "writing .npz files")
+        self.filename = filename
+        self.headers = headers
+        self.kinds = [None] * len(headers)
+        self.widths = [1] * len(headers)
+        self.size = 0
+        self.batches = 0
+        directory = os.path.dirname(os.path.abspath(filename))
+        self.tables = tempfile.TemporaryFile(dir = directory)
+        self.valid = tempfile.TemporaryFile(dir = directory)
+
+
+    def write(self, rows):
+        columns = list(zip(*rows)) or [()] * len(self.headers)
+        arrays = []
+
+        for idx, (name, values) in enumerate(zip(self.headers, columns)):
+            kind = columnType(name, values, missing = None)
+
+            if kind is str:
+                converted = ["" if v is None else str(v) for v in values]
+                self.kinds[idx] = str
+            else:
+                # Batches without values hold zeros until some other batch
+                # decides the type of the column
+                converted = [0 if v is None else int(v) for v in values]
+
+                if kind is int and self.kinds[idx] is None:
+                    self.kinds[idx] = int
+
+            # Also the integers may turn into strings on close
+            width = max(map(len, map(str, converted)), default = 0)
+            self.widths[idx] = max(self.widths[idx], width)
+
+            if kind is str:
+                arrays.append(numpy.array(converted,
+                                          dtype = "U{}".format(max(width, 1))))
+            else:
+                arrays.append(numpy.array(converted, dtype = numpy.int64))
+
+        table = numpy.zeros(len(rows), dtype = [
+            (name, values.dtype) for name, values in zip(self.headers, arrays)])
+        valid = numpy.zeros(len(rows),
+                            dtype = [(name, bool) for name in self.headers])
+
+        for name, values, present in zip(self.headers, arrays, columns):
+            table[name] = values
+            valid[name] = [v is not None for v in present]
+
+        numpy.save(self.tables, table)
+        numpy.save(self.valid, valid)
+        self.size += len(rows)
+        self.batches += 1
+
+
+    def assemble(self, dtype):
+        """Yield the spooled batches converted to the final dtype."""
+        self.tables.seek(0)
+        self.valid.seek(0)
+
+        for _ in range(self.batches):
+            table = numpy.load(self.tables)
+            valid = numpy.load(self.valid)
+            batch = numpy.zeros(len(table), dtype = dtype)
+
+            for name in self.headers:
+                present = valid[name]
+
+                if not present.any():
+                    continue
+                elif dtype[name].kind == "U" and table.dtype[name].kind != "U":
+                    batch[name] = numpy.where(present,
+                                              table[name].astype(str), "")
+                else:
+                    batch[name] = table[name]
+
+            yield batch
+
+
+    def close(self):
+        if not self.batches:
+            self.write([])
+
+        dtype = numpy.dtype([
+            (name, numpy.int64 if kind is int else "U{}".format(width))
+            for name, kind, width in zip(self.headers, self.kinds, self.widths)])
+        valid = numpy.dtype([(name, bool) for name in self.headers])
+
+        def spooled():
+            self.valid.seek(0)
+
+            for _ in range(self.batches):
+                yield numpy.load(self.valid)
+
+        with zipfile.ZipFile(self.filename, "w") as archive:
+            for name, kind, batches in (("table", dtype, self.assemble(dtype)),
+                                        ("valid", valid, spooled())):
+                with archive.open(name + ".npy", "w",
+                                  force_zip64 = True) as outfile:
+                    numpy.lib.format.write_array_header_1_0(outfile, {
+                        "descr": numpy.lib.format.dtype_to_descr(kind),
+                        "fortran_order": False,
+                        "shape": (self.size,)
+                    })
+
+                    for batch in batches:
+                        outfile.write(batch.tobytes())
+
+        self.tables.close()
+        self.valid.close()
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+    "npz": NpzWriter
+}
+
+
+def openWriter(basename, headers, fmt, append = False):
+    """Open a writer for the table basename.<extension>.
+
+    Writers take rows as sequences in the order of headers, with None
+    marking missing values.  Only CSV tables can be appended to.
+    """
+    filename = basename + EXTENSIONS[fmt]
+
+    if append:
+        if fmt != "csv":
+            raise ValueError("cannot append to {} tables".format(fmt))
+
+        return CsvWriter(filename, headers, append = True)
+    else:
+        return WRITERS[fmt](filename, headers)
+
+
+def findTable(filename):
+    """Return the path of the table, or of a sibling in another format."""
+    if os.path.exists(filename):
+        return filename
+
+    stem, _ = os.path.splitext(filename)
+
+    for extension in EXTENSIONS.values():
+        if os.path.exists(stem + extension):
+            return stem + extension
+
+    return None
+
+
+def tableFormat(filename):
+    extension = os.path.splitext(filename)[1]
+    return next((fmt for fmt, ext in EXTENSIONS.items() if ext == extension),
+                "csv")
+
+
+def loadColumnar(filename, names = None):
+    """Load typed columns as lists, with None for missing values."""
+    if tableFormat(filename) == "parquet":
+        requireModule(pyarrow, "pyarrow", "reading Parquet files")
+        table = pyarrow.parquet.read_table(filename, columns = names)
+        return table.column_names, table.to_pydict()
+    else:
+        requireModule(numpy, "numpy", "reading .npz files")
+
+        with numpy.load(filename) as archive:
+            table = archive["table"]
+            valid = archive["valid"]
+
+        fields = list(table.dtype.names)
+        columns = {}
+
+        for name in names or fields:
+            values = table[name].tolist()
+            present = valid[name].tolist()
+            columns[name] = [v if ok else None
+                             for v, ok in zip(values, present)]
+
+        return fields, columns
+
+
+def readFields(filename):
+    """Return the column names of a table."""
+    path = findTable(filename) or filename
+
+    fmt = tableFormat(path)
+
+    if fmt == "csv":
+        with open(path, "r") as infile:
+            return next(csv.reader(infile), [])
+    elif fmt == "parquet":
+        requireModule(pyarrow, "pyarrow", "reading Parquet files")
+        return pyarrow.parquet.read_schema(path).names
+    else:
+        return loadColumnar(path, [])[0]
+
+
+def readRows(filename):
+    """Iterate over the rows of a table as csv.DictReader would."""
+    path = findTable(filename) or filename
+
+    if tableFormat(path) == "csv":
+        with open(path, "r") as infile:
+            yield from csv.DictReader(infile)
+    else:
+        fields, columns = loadColumnar(path)
+        strings = [["" if v is None else str(v) for v in columns[name]]
+                   for name in fields]
+
+        for values in zip(*strings):
+            yield dict(zip(fields, values))
+
+
+class RecordRow(Mapping):
+    """A record kept in memory seen as the row readRows would return
+    after writing it to CSV.  Values are formatted only when read."""
+    __slots__ = ("record", "headers")
+
+    def __init__(self, record, headers):
+        self.record = record
+        self.headers = headers
+
+
+    def __getitem__(self, name):
+        if name not in self.headers:
+            raise KeyError(name)
+
+        value = self.record.get(name)
+        return "" if value is None else str(value)
+
+
+    def __iter__(self):
+        return iter(self.headers)
+
+
+    def __len__(self):
+        return len(self.headers)
+
+
+def recordRows(records, headers):
+    """Let records kept in memory take the place of the rows of a table."""
+    headers = dict.fromkeys(headers)
+    return [RecordRow(record, headers) for record in records]
+
+
+def readColumns(filename, names):
+    """Load some columns of a table as lists of typed values.
+
+    Integer columns hold ints and missing values are None, whatever the
+    format of the table.
+    """
+    path = findTable(filename) or filename
+
+    if tableFormat(path) != "csv":
+        return loadColumnar(path, names)[1]
+
+    columns = {name: [] for name in names}
+
+    with open(path, "r") as infile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        indices = [header.index(name) for name in names]
+
+        for row in reader:
+            for name, idx in zip(names, indices):
+                columns[name].append(row[idx])
+
+    for name in names:
+        if name in INTEGER_FIELDS:
+            columns[name] = [int(v) if v != "" else None
+                             for v in columns[name]]
+
+    return columns
+
+
+def readArrays(filename, names, converters = None):
+    """Load some columns of a table as NumPy arrays, integers as int64
+    and anything else as objects.
+
+    converters maps column names to functions parsing their values from
+    the strings of the CSV file, where missing values are empty: without
+    one, an integer column raises ValueError on anything else.
+    """
+    requireModule(numpy, "numpy", "reading tables as arrays")
+    converters = converters or {}
+    path = findTable(filename) or filename
+
+    if tableFormat(path) != "csv":
+        columns = loadColumnar(path, names)[1]
+        arrays = {}
+
+        for name in names:
+            values = columns[name]
+
+            if name in converters:
+                values = [converters[name]("" if v is None else str(v))
+                          for v in values]
+            elif name in INTEGER_FIELDS and None in values:
+                raise ValueError("missing values in column '{}'".format(name))
+
+            arrays[name] = numpy.array(values, dtype = numpy.int64
+                                       if name in INTEGER_FIELDS else object)
+
+        return arrays
+
+    header = readFields(path)
+    columns = sorted(header.index(name) for name in names)
+    dtype = [(header[c], numpy.int64 if header[c] in INTEGER_FIELDS else object)
+             for c in columns]
+
+    with warnings.catch_warnings():
+        # A table with no rows is fine
+        warnings.simplefilter("ignore", UserWarning)
+        table = numpy.loadtxt(path, delimiter = ",", quotechar = '"',
+                              skiprows = 1, usecols = columns, dtype = dtype,
+                              ndmin = 1,
+                              converters = {header.index(name): function
+                                            for name, function
+                                            in converters.items()})
+
+    return {name: numpy.ascontiguousarray(table[name]) for name in names}
@@ -0,0 +1,342 @@
+#! /usr/bin/env python3
+
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Measure how an application used the cores of its executors.
+
+Tasks keep a core busy from their launch to their finish, and executors
+offer their cores from when they are added until the application ends.
+From these intervals come:
+  - the slot utilization of every stage, that is the time of its tasks
+    over the core time available while it ran, along with the
+    utilization of the whole cluster in the same window;
+  - the periods when cores were idle while tasks were pending, having
+    their stage submitted but not being launched yet;
+  - busy and available core time per executor in fixed time buckets,
+    saved with NumPy for plotting.
+Times are shifted to the first event, so that sums of many timestamps
+do not overflow.
+"""
+
+
+import csv
+import os
+import sys
+
+from argparse import ArgumentParser
+
+import numpy
+
+from tables import findTable, readColumns
+
+
+TABLES = ("tasks", "executors", "stages", "app")
+# Buckets of the timeline when their width is not given
+BUCKETS = 1000
+
+
+def loadApplication(directory):
+    """Read the columns needed from the tables of an application."""
+    paths = {}
+
+    for table in TABLES:
+        paths[table] = findTable(os.path.join(directory, "{}_1.csv".format(table)))
+
+        if paths[table] is None and table != "app":
+            print("error: the {} table is missing in '{}'".format(table, directory),
+                  file = sys.stderr)
+            sys.exit(1)
+
+    tasks = readColumns(paths["tasks"], ["Stage ID", "Executor ID",
+                                         "Launch Time", "Finish Time"])
+    executors = readColumns(paths["executors"], ["Executor ID", "Timestamp",
+                                                 "Total Cores"])
+    stages = readColumns(paths["stages"], ["Stage ID", "Submission Time",
+                                           "Completion Time"])
+    end = None
+
+    if paths["app"] is not None:
+        end = next(iter(readColumns(paths["app"], ["Completion Time"])
+                        ["Completion Time"]), None)
+
+    return tasks, executors, stages, end
+
+
+class Utilization:
+    def __init__(self, tasks, executors, stages, end = None):
+        """Take the columns of the tables as returned by readColumns,
+        with end the completion of the application, if known."""
+        launch = numpy.array(tasks["Launch Time"], dtype = numpy.int64)
+        finish = numpy.array(tasks["Finish Time"], dtype = numpy.int64)
+        added = numpy.array(executors["Timestamp"], dtype = numpy.int64)
+        cores = numpy.array(executors["Total Cores"], dtype = numpy.int64)
+        submission = numpy.array(stages["Submission Time"], dtype = numpy.int64)
+        completion = numpy.array(stages["Completion Time"], dtype = numpy.int64)
+
+        self.origin = min((a.min() for a in (launch, added, submission)
+                           if a.size), default = 0)
+        self.launch = launch - self.origin
+        self.finish = finish - self.origin
+        self.added = added - self.origin
+        self.cores = cores
+        self.stageIds = numpy.array(stages["Stage ID"], dtype = numpy.int64)
+        self.submission = submission - self.origin
+        self.completion = completion - self.origin
+
+        last = [a.max() for a in (self.finish, self.completion) if a.size]
+        self.end = max(last, default = 0) if end is None else end - self.origin
+
+        # Executors missing from their table, e.g. the driver, have no cores
+        self.executorIds = list(dict.fromkeys(executors["Executor ID"]))
+        known = {e: idx for idx, e in enumerate(self.executorIds)}
+        self.executorIds += sorted(set(tasks["Executor ID"]) - set(known))
+        known = {e: idx for idx, e in enumerate(self.executorIds)}
+        self.executor = numpy.array([known[e] for e in tasks["Executor ID"]],
+                                    dtype = numpy.int64)
+        self.executorCores = numpy.zeros(len(self.executorIds), dtype = numpy.int64)
+        self.executorAdded = numpy.full(len(self.executorIds), self.end,
+                                        dtype = numpy.int64)
+        rows = numpy.array([known[e] for e in executors["Executor ID"]],
+                           dtype = numpy.int64)
+        numpy.add.at(self.executorCores, rows, cores)
+        numpy.minimum.at(self.executorAdded, rows, self.added)
+
+        # Tasks wait from the submission of their stage until their launch
+        self.stage = numpy.array(tasks["Stage ID"], dtype = numpy.int64)
+        self.stageRow = lookup(self.stageIds, self.stage)
+        known = self.stageRow >= 0
+        self.pendingFrom = self.launch.copy()
+        self.pendingFrom[known] = numpy.minimum(
+            self.submission[self.stageRow[known]], self.launch[known])
+
+
+    def capacityIntegral(self, points):
+        """Core time offered by the executors before each point."""
+        return integral(self.added, numpy.full_like(self.added, self.end),
+                        points, self.cores)
+
+
+    def busyIntegral(self, points):
+        """Core time taken by the tasks before each point."""
+        return integral(self.launch, self.finish, points)
+
+
+    def stageUtilization(self):
+        """Return a row per stage with its task time, the core time
+        available while it ran and the resulting utilizations."""
+        rows = self.stageRow
+        known = rows >= 0
+        taskTime = numpy.bincount(rows[known],
+                                  weights = (self.finish - self.launch)[known],
+                                  minlength = len(self.stageIds))
+        counts = numpy.bincount(rows[known], minlength = len(self.stageIds))
+
+        bounds = numpy.concatenate((self.submission, self.completion))
+        capacity = numpy.diff(self.capacityIntegral(bounds)
+                              .reshape(2, -1), axis = 0)[0]
+        busy = numpy.diff(self.busyIntegral(bounds).reshape(2, -1), axis = 0)[0]
+
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            slots = numpy.where(capacity > 0, taskTime / capacity, 0.)
+            cluster = numpy.where(capacity > 0, busy / capacity, 0.)
+
+        return [{"Stage ID": stageId,
+                 "Submission Time": int(s + self.origin),
+                 "Completion Time": int(c + self.origin),
+                 "Tasks": int(n),
+                 "Task Time": int(t),
+                 "Core Time": int(a),
+                 "Slot Utilization": u,
+                 "Cluster Utilization": v}
+                for stageId, s, c, n, t, a, u, v in
+                zip(self.stageIds.tolist(), self.submission, self.completion,
+                    counts, taskTime, capacity, slots.tolist(),
+                    cluster.tolist())]
+
+
+    def sweep(self):
+        """Return the instants where the state of the cluster changes,
+        with the cores available, the busy ones and the pending tasks
+        from each instant to the next one."""
+        times = numpy.concatenate((self.added, self.pendingFrom,
+                                   self.launch, self.finish))
+        capacity = numpy.concatenate((self.cores,
+                                      numpy.zeros(3 * len(self.launch),
+                                                  dtype = numpy.int64)))
+        ones = numpy.ones_like(self.launch)
+        zeros = numpy.zeros_like(self.launch)
+        busy = numpy.concatenate((numpy.zeros_like(self.cores),
+                                  zeros, ones, -ones))
+        pending = numpy.concatenate((numpy.zeros_like(self.cores),
+                                     ones, -ones, zeros))
+
+        order = numpy.argsort(times, kind = "stable")
+        times = times[order]
+        # The state after the last event at each instant holds until the next
+        last = numpy.ones(len(times), dtype = bool)
+        last[:-1] = times[1:] != times[:-1]
+
+        return (times[last], numpy.cumsum(capacity[order])[last],
+                numpy.cumsum(busy[order])[last],
+                numpy.cumsum(pending[order])[last])
+
+
+    def idlePeriods(self, minimum = 0):
+        """Return the periods of at least minimum milliseconds when cores
+        were idle while tasks were pending, with the core time that the
+        pending tasks could have used."""
+        times, capacity, busy, pending = self.sweep()
+        durations = numpy.diff(times)
+        idle = capacity[:-1] - busy[:-1]
+        waiting = pending[:-1]
+        flagged = (idle > 0) & (waiting > 0)
+
+        # Join consecutive flagged segments into periods
+        edges = numpy.diff(numpy.concatenate(([0], flagged.astype(numpy.int8), [0])))
+        starts = numpy.flatnonzero(edges == 1)
+        stops = numpy.flatnonzero(edges == -1)
+        wasted = numpy.concatenate(([0], numpy.cumsum(
+            numpy.where(flagged, numpy.minimum(idle, waiting) * durations, 0))))
+        periods = []
+
+        for first, stop in zip(starts.tolist(), stops.tolist()):
+            start, end = int(times[first]), int(times[stop])
+
+            if end - start >= minimum:
+                periods.append({
+                    "Start": start + int(self.origin),
+                    "End": end + int(self.origin),
+                    "Duration": end - start,
+                    "Max Idle Cores": int(idle[first:stop].max()),
+                    "Max Pending Tasks": int(waiting[first:stop].max()),
+                    "Wasted Core Time": int(wasted[stop] - wasted[first])
+                })
+
+        return periods
+
+
+    def timeline(self, width = None):
+        """Return the edges of the buckets with the busy and available
+        core time of every executor in each of them."""
+        width = width or max(1, -(-int(self.end) // BUCKETS))
+        edges = numpy.arange(0, int(self.end) + width, width, dtype = numpy.int64)
+        busy = numpy.zeros((len(self.executorIds), len(edges) - 1))
+        capacity = numpy.zeros_like(busy)
+
+        # One slice of tasks per executor
+        order = numpy.argsort(self.executor, kind = "stable")
+        bounds = numpy.searchsorted(self.executor[order],
+                                    numpy.arange(len(self.executorIds) + 1))
+
+        for idx in range(len(self.executorIds)):
+            tasks = order[bounds[idx]:bounds[idx + 1]]
+            busy[idx] = numpy.diff(integral(self.launch[tasks],
+                                            self.finish[tasks], edges))
+            start = numpy.minimum(self.executorAdded[idx:idx + 1], self.end)
+            capacity[idx] = numpy.diff(integral(
+                start, numpy.full_like(start, self.end), edges,
+                self.executorCores[idx:idx + 1]))
+
+        return edges + self.origin, busy, capacity
+
+
+def lookup(keys, values):
+    """Return the position of each value among keys, -1 if missing.
+    Repeated keys resolve to their first position."""
+    if not len(keys):
+        return numpy.full(len(values), -1, dtype = numpy.int64)
+
+    order = numpy.argsort(keys, kind = "stable")
+    positions = numpy.searchsorted(keys[order], values).clip(max = len(keys) - 1)
+    found = order[positions]
+    return numpy.where(keys[found] == values, found, -1)
+
+
+def integral(starts, ends, points, weights = None):
+    """Sum the overlaps of the intervals [start, end) with the half-line
+    before each point, weighted if given, sorting only once."""
+    weights = numpy.ones_like(starts) if weights is None else weights
+    points = numpy.asarray(points, dtype = numpy.int64)
+
+    def before(times):
+        order = numpy.argsort(times, kind = "stable")
+        sortedTimes = times[order]
+        sortedWeights = weights[order]
+        count = numpy.concatenate(([0], numpy.cumsum(sortedWeights)))
+        total = numpy.concatenate(([0], numpy.cumsum(sortedWeights * sortedTimes)))
+        idx = numpy.searchsorted(sortedTimes, points, side = "right")
+        return count[idx] * points - total[idx]
+
+    return before(starts) - before(ends)
+
+
+def writeCSV(rows, headers, outfile):
+    writer = csv.DictWriter(outfile, headers, lineterminator = "\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "measure the utilization of the "
+                            "cores of an application")
+    parser.add_argument("directory", metavar = "CSV_DIRECTORY",
+                        help = "directory with the tables of the application")
+    parser.add_argument("-p", "--periods", metavar = "CSV_FILE",
+                        help = "write the periods with idle cores and "
+                        "pending tasks")
+    parser.add_argument("-m", "--minimum", type = int, default = 1000,
+                        help = "shortest period reported, in milliseconds "
+                        "(default: 1000)")
+    parser.add_argument("-t", "--timeline", metavar = "NPZ_FILE",
+                        help = "save the busy and available core time per "
+                        "executor and bucket")
+    parser.add_argument("-b", "--bucket", type = int,
+                        help = "width of the buckets in milliseconds, by "
+                        "default {} buckets in all".format(BUCKETS))
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs()
+
+    if not os.path.isdir(args.directory):
+        print("error: the inserted directory does not exist", file = sys.stderr)
+        sys.exit(1)
+
+    utilization = Utilization(*loadApplication(args.directory))
+    writeCSV(utilization.stageUtilization(),
+             ["Stage ID", "Submission Time", "Completion Time", "Tasks",
+              "Task Time", "Core Time", "Slot Utilization",
+              "Cluster Utilization"], sys.stdout)
+
+    if args.periods:
+        with open(args.periods, "w") as outfile:
+            writeCSV(utilization.idlePeriods(args.minimum),
+                     ["Start", "End", "Duration", "Max Idle Cores",
+                      "Max Pending Tasks", "Wasted Core Time"], outfile)
+
+    if args.timeline:
+        edges, busy, capacity = utilization.timeline(args.bucket)
+
+        with open(args.timeline, "wb") as outfile:
+            numpy.savez_compressed(outfile, edges = edges,
+                                   executors = numpy.array(utilization.executorIds),
+                                   busy = busy, capacity = capacity,
+                                   clusterBusy = busy.sum(axis = 0),
+                                   clusterCapacity = capacity.sum(axis = 0))
+
+
+if __name__ == "__main__":
+    main()
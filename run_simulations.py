@@ -15,14 +15,34 @@
 ## limitations under the License.
 
 import csv
+import json
+import os
 import re
+import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
 
 from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
 from pathlib import Path
 
 
+# Seconds a simulation has to stop after SIGTERM before SIGKILL
+GRACE_PERIOD = 10
+
+OUTPUT_LOCK = threading.Lock ()
+
+
+def report (message):
+    """Print a line without mixing it with those of other threads."""
+    with OUTPUT_LOCK:
+        print (message, flush = True)
+
+
 def parse_arguments (argv = None):
     parser = ArgumentParser (description = "run a set of dagSim simulations")
     parser.add_argument ("query", help = "query of interest")
@@ -33,6 +53,15 @@ def parse_arguments (argv = None):
                          help = "results directory passed down to simulate.py")
     parser.add_argument ("--models", "-m",
                          help = "models directory passed down to simulate.py")
+    parser.add_argument ("--jobs", "-j", type = int, default = os.cpu_count (),
+                         help = "number of simulations run at once")
+    parser.add_argument ("--timeout", "-t", type = float,
+                         help = "seconds after which a simulation is stopped")
+    parser.add_argument ("--retries", "-r", type = int, default = 1,
+                         help = "attempts after the first for each simulation")
+    parser.add_argument ("--journal", "-J",
+                         help = "JSON lines file recording the simulations, "
+                         "by default journal.jsonl in the results directory")
     return parser.parse_args (argv)
 
 
@@ -82,7 +111,100 @@ def arrange_cases (filename):
     return pairings
 
 
+def result_name (args, cores, model):
+    return "{query}_C{cores}_M{model}_D{dataset}".format (
+        query = args.query, cores = cores, model = model,
+        dataset = args.dataset)
+
+
+def read_result (filename):
+    """The values on the summary line of a DagSim output, None if the
+    file is missing or incomplete."""
+    try:
+        with filename.open () as infile:
+            for line in infile:
+                pieces = line.split ()
+
+                if pieces[:2] == ["0.0", "0.0"] and len (pieces) >= 7:
+                    return pieces[2:]
+    except FileNotFoundError:
+        pass
+
+    return None
+
+
+def read_journal (filename):
+    """The names of the simulations the journal records as done."""
+    done = set ()
+
+    try:
+        with filename.open () as infile:
+            for line in infile:
+                try:
+                    entry = json.loads (line)
+                except ValueError:
+                    # The last line of an interrupted run may be truncated
+                    continue
+
+                if entry.get ("status") == "done":
+                    done.add (entry["name"])
+    except FileNotFoundError:
+        pass
+
+    return done
+
+
+def record (journal, name, status, **fields):
+    journal.write (json.dumps (dict (name = name, status = status, **fields)))
+    journal.write ("\n")
+    journal.flush ()
+    os.fsync (journal.fileno ())
+
+
+def stop_process (process):
+    """Stop a simulation along with the DagSim process it started."""
+    try:
+        os.killpg (process.pid, signal.SIGTERM)
+        process.wait (timeout = GRACE_PERIOD)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg (process.pid, signal.SIGKILL)
+        process.wait ()
+
+
+def run_command (command, timeout, running):
+    """Run a command in its own process group, returning its exit code,
+    None on timeout, and the seconds it took."""
+    report (" ".join (command))
+    start = time.monotonic ()
+    process = subprocess.Popen (command, stdin = subprocess.DEVNULL,
+                                start_new_session = True)
+    running.add (process)
+
+    try:
+        returncode = process.wait (timeout = timeout)
+    except subprocess.TimeoutExpired:
+        stop_process (process)
+        returncode = None
+    finally:
+        running.discard (process)
+
+    return returncode, time.monotonic () - start
+
+
+def format_eta (durations, remaining, jobs):
+    if not durations:
+        return "unknown"
+
+    mean = sum (durations) / len (durations)
+    waves = -(-remaining // max (1, min (jobs, remaining)))
+    return str (timedelta (seconds = round (mean * waves)))
+
+
 def run_simulator (args, pairings):
+    """Run the simulations not done yet in a pool of args.jobs, recording
+    each attempt in the journal.  Return the names of those that failed."""
     base_command = ["simulate.py"]
 
     if args.results:
@@ -91,23 +213,111 @@ def run_simulator (args, pairings):
     if args.models:
         base_command.extend (["--models", args.models])
 
+    result_dir = Path (args.results or "results")
+    result_dir.mkdir (parents = True, exist_ok = True)
+    journal_file = Path (args.journal) if args.journal \
+        else result_dir / "journal.jsonl"
+    done = read_journal (journal_file)
+
     tuples = sorted (set (p for pairs in pairings.values ()
                           for p in pairs.items ()))
+    commands = dict ()
+
+    with journal_file.open ("a") as journal:
+        for core, closest in tuples:
+            name = result_name (args, core, closest)
+            output = result_dir / name / "{}.dagsim.txt".format (args.query)
+
+            if name in done:
+                continue
+            elif read_result (output) is not None:
+                # Completed before the journal was kept
+                record (journal, name, "done", attempt = 0)
+                continue
+
+            command = base_command[:]
+
+            if core != closest:
+                command.extend (["-c", str (closest)])
+
+            command.extend ([args.query, str (core), str (args.dataset)])
+            commands[name] = (command, output)
+
+        total = len (commands)
+        report ("{} simulations to run, {} already done"
+                .format (total, len (tuples) - total))
+
+        failures = list ()
+        durations = list ()
+        running = set ()
+        attempts = dict ()
+        finished = 0
+        executor = ThreadPoolExecutor (max_workers = max (1, args.jobs))
+
+        def submit (name, attempt):
+            command, output = commands[name]
+            # simulate.py refuses to overwrite the leftovers of a failed
+            # or interrupted attempt
+            shutil.rmtree (output.parent, ignore_errors = True)
+            future = executor.submit (run_command, command, args.timeout,
+                                      running)
+            attempts[future] = (name, attempt)
+            return future
+
+        pending = {submit (name, 1) for name in commands}
+
+        try:
+            while pending:
+                completed, pending = wait (pending, return_when = FIRST_COMPLETED)
 
-    for core, closest in tuples:
-        command = base_command[:]
+                for future in completed:
+                    name, attempt = attempts.pop (future)
+                    returncode, elapsed = future.result ()
+                    output = commands[name][1]
 
-        if core != closest:
-            command.extend (["-c", str (closest)])
+                    if returncode is None:
+                        status = "timeout"
+                    elif returncode != 0:
+                        status = "failed"
+                    elif read_result (output) is None:
+                        status = "incomplete"
+                    else:
+                        status = "done"
 
-        command.extend ([args.query, str (core), str (args.dataset)])
+                    record (journal, name, status, attempt = attempt,
+                            returncode = returncode,
+                            elapsed = round (elapsed, 3))
 
-        try:
-            print (" ".join (command))
-            subprocess.run (command, stdin = subprocess.DEVNULL,
-                            check = True)
-        except subprocess.CalledProcessError as e:
-            sys.exit (e.returncode)
+                    if status != "done" and attempt <= args.retries:
+                        report ("{} {} on attempt {}, retrying"
+                                .format (name, status, attempt))
+                        pending.add (submit (name, attempt + 1))
+                        continue
+
+                    finished += 1
+
+                    if status == "done":
+                        durations.append (elapsed)
+                    else:
+                        failures.append (name)
+
+                    report ("[{}/{}] {} {} in {:.1f} s, ETA {}"
+                            .format (finished, total, name, status, elapsed,
+                                     format_eta (durations, total - finished,
+                                                 args.jobs)))
+        except KeyboardInterrupt:
+            executor.shutdown (wait = False, cancel_futures = True)
+
+            for process in list (running):
+                stop_process (process)
+
+            print ("interrupted: run again to resume from the journal",
+                   file = sys.stderr)
+            sys.exit (130)
+
+        executor.shutdown ()
+
+    return failures
 
 
 def write_summary_table (args, pairings):
@@ -117,30 +327,36 @@ def write_summary_table (args, pairings):
         "(?P<query>\w+)_C(?P<cores>\d+)_M(?P<model>\d+)_D(?P<dataset>\d+)")
     simulations = list ()
 
-    for filename in result_dir.rglob (partial_filename):
-        with filename.open () as infile:
-            for line in infile:
-                pieces = line.split ()
-
-                if pieces[0] == "0.0" and pieces[1] == "0.0":
-                    values = pieces[2:]
-                    name = filename.parent.name
-                    match = result_re.fullmatch (name)
-                    simulations.append ({
-                        "Query": match["query"],
-                        "SimCores": match["cores"],
-                        "ModelCores": match["model"],
-                        "Datasize": match["dataset"],
-                        "SimAvg": values[0],
-                        "SimDev": values[1],
-                        "SimLower": values[2],
-                        "SimUpper": values[3],
-                        "SimAccuracy": values[4]
-                    })
-                    break
-
     table = result_dir / "simulations.csv"
     has_previous_results = table.exists ()
+    # Resumed sweeps find again the results already in the table
+    previous = set ()
+
+    if has_previous_results:
+        with table.open (newline = "") as infile:
+            previous = {(row["Query"], row["SimCores"], row["ModelCores"],
+                         row["Datasize"]) for row in csv.DictReader (infile)}
+
+    for filename in sorted (result_dir.rglob (partial_filename)):
+        values = read_result (filename)
+        match = result_re.fullmatch (filename.parent.name)
+
+        if values is None or not match or \
+           (match["query"], match["cores"], match["model"],
+            match["dataset"]) in previous:
+            continue
+
+        simulations.append ({
+            "Query": match["query"],
+            "SimCores": match["cores"],
+            "ModelCores": match["model"],
+            "Datasize": match["dataset"],
+            "SimAvg": values[0],
+            "SimDev": values[1],
+            "SimLower": values[2],
+            "SimUpper": values[3],
+            "SimAccuracy": values[4]
+        })
 
     with table.open ("a", newline = "") as outfile:
         header = ["Query", "Datasize", "ModelCores", "SimCores",
@@ -156,5 +372,11 @@ def write_summary_table (args, pairings):
 if __name__ == "__main__":
     args = parse_arguments ()
     pairings = arrange_cases (args.cases)
-    run_simulator (args, pairings)
+    failures = run_simulator (args, pairings)
     write_summary_table (args, pairings)
+
+    if failures:
+        print ("error: {} simulations failed: {}"
+               .format (len (failures), ", ".join (sorted (failures))),
+               file = sys.stderr)
+        sys.exit (1)
@@ -99,7 +99,8 @@ def prepare_model_files (args, options):
                file = sys.stderr)
         sys.exit (1)
 
-    for src in abs_model_dir.glob ("*.txt"):
+    # A sample store replaces all the text files, which then are missing
+    for src in [*abs_model_dir.glob ("*.txt"), *abs_model_dir.glob ("samples.bin")]:
         dest = result_dir / src.name
         shutil.copy (src, dest)
 
@@ -39,17 +39,26 @@ alias error='error_aux $LINENO '
 
 usage ()
 {
-    echo $(basename "$0") '[-u number]' directory >&2
+    echo $(basename "$0") '[-u number] [-j jobs] [-f]' directory >&2
     echo '    summarize the data in directory' >&2
     echo '    you can provide the number of users with -u, the default is 1' >&2
+    echo '    -j sets how many runs are summarized in parallel,' >&2
+    echo '        by default as many as the processors' >&2
+    echo '    -f to summarize again the runs that did not change' >&2
     exit 2
 }
 
-while getopts :u:h opt; do
+while getopts :u:j:fh opt; do
     case "$opt" in
         u)
             users="$OPTARG"
             ;;
+        j)
+            jobs="$OPTARG"
+            ;;
+        f)
+            FORCE=yes
+            ;;
         h)
             usage
             ;;
@@ -81,14 +90,17 @@ process_data ()
         | grep -v failed | sort | uniq | while IFS= read -r dir; do
 
         parse_configuration "$dir"
-        "$DIR/summary/extractor.py" "$APP_REGEX" "$dir" "$USERS" "$DATASIZE"
-
-        application="$(basename "$dir")"
-        {
-            echo Application class: $application
-            cat "$dir/summary.csv"
-        } > "$dir/aux.csv"
-        mv "$dir/aux.csv" "$dir/summary.csv"
+        "$DIR/summary/extractor.py" ${jobs:+-j "$jobs"} $CACHE \
+            "$APP_REGEX" "$dir" "$USERS" "$DATASIZE"
+
+        if [ -f "$dir/summary.csv" ]; then
+            application="$(basename "$dir")"
+            {
+                echo Application class: $application
+                cat "$dir/summary.csv"
+            } > "$dir/aux.csv"
+            mv "$dir/aux.csv" "$dir/summary.csv"
+        fi
     done
 }
 
@@ -111,4 +123,15 @@ if ! isnumber "$USERS"; then
     error the -u option requires a number as argument
 fi
 
+if [ -n "$jobs" ] && ! isnumber "$jobs"; then
+    error the -j option requires a number as argument
+fi
+
+# Unchanged runs are not summarized again, unless forced
+if [ "x$FORCE" = xyes ]; then
+    CACHE="--cache --force"
+else
+    CACHE=--cache
+fi
+
 process_data "$1"
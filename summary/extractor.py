@@ -16,21 +16,59 @@
 ## limitations under the License.
 
 
+from argparse import ArgumentParser
 from collections import OrderedDict
-from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import csv
+import json
 import os
 import re
 import sys
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+sys.path.append (os.path.join (os.path.dirname (os.path.realpath (__file__)),
+                               os.pardir, "processing"))
+
+from cache import cachedRun, codeVersion
+from sketch import StreamingStats, groupDigests
+from stagedag import StageDAG, parseIds
+from tables import findTable, readArrays, readRows
+
+
+# Columns of every stage, in the order of computeStagesTasksDetails
+QUANTILES = (50, 90, 99)
+STAGE_COLUMNS = (['nTask', 'maxTask', 'avgTask'] +
+                 ['p{}Task'.format(q) for q in QUANTILES])
+SHUFFLE_COLUMNS = (['SHmax', 'SHavg', 'Bmax', 'Bavg'] +
+                   ['SHp{}'.format(q) for q in QUANTILES])
+STAGES_SUMMARY = "stages_summary.csv"
+# Summary of a run kept in its directory, and the tables it comes from
+SUMMARY_CACHE = ".summary.json"
+TABLES = ("app", "executors", "stages", "tasks", "jobs")
+
+# Columns of the tasks table aggregated with NumPy
+TASK_FIELDS = ["Stage ID", "Reason", "Launch Time", "Executor Run Time",
+               "Shuffle Write Time", "Shuffle Bytes Written"]
+# Marks of the values that are not integers, should the fast read fail
+NOVAL_MARK = -2 ** 63
+INVALID_MARK = NOVAL_MARK + 1
+
 
 class Extractor:
-    def __init__(self, directory, filesDirectory, users, memory, headerFlag):
+    def __init__(self, directory, filesDirectory, users, memory, headerFlag,
+                 rows = None):
+        """rows maps the names of tables already in memory to their rows."""
+        self.rows = rows or {}
         self.cores = None
         self.appStartTime = None
         self.appEndTime = None
-        self.availableIDs = None
+        self.dag = None
         self.minTaskLaunchTime = 0
         self.users = users
         self.memory = memory
@@ -50,34 +88,17 @@ class Extractor:
         self.stageIDs = None
 
 
-    def writeHeader(self):
-        """Write the header of the CSV file this python script produces."""
-        applicationCsvHeaders = ['run', 'applicationCompletionTime',
-                                 'applicationDeltaBeforeComputing']
-        jobCsvHeaders = ['jobCompletionTime_J{job}']
-        stagesCsvHeaders = ['nTask_S{stage}', 'maxTask_S{stage}',
-                            'avgTask_S{stage}']
-        shuffleCsvHeaders = ['SHmax_S{stage}', 'SHavg_S{stage}',
-                             'Bmax_S{stage}', 'Bavg_S{stage}']
-        terminalCsvHeaders = ['users', 'dataSize', 'nCores']
-
-        targetHeaders = []
-        targetHeaders += applicationCsvHeaders
-
-        for jobID in self.jobIDs:
-            targetHeaders += [h.format(job = jobID) for h in jobCsvHeaders]
-
-        for stageID in self.stageIDs:
-            targetHeaders += [h.format(stage = stageID) for h in stagesCsvHeaders]
-
-            if "SHmax" in self.stagesTasksDict[stageID]:
-                targetHeaders += [h.format(stage = stageID) for h in shuffleCsvHeaders]
+    def headers(self):
+        stages = OrderedDict((stageID, "SHmax" in self.stagesTasksDict[stageID])
+                             for stageID in self.stageIDs)
+        return summaryHeaders(self.jobIDs, stages)
 
-        targetHeaders += terminalCsvHeaders
 
+    def writeHeader(self):
+        """Write the header of the CSV file this python script produces."""
         with open(os.path.join(self.summaryDirectory, "summary.csv"), "w") as f:
             writer = csv.writer(f, delimiter=',', lineterminator='\n')
-            writer.writerow(targetHeaders)
+            writer.writerow(self.headers())
 
 
     def produceFile(self, finalList):
@@ -86,30 +107,33 @@ class Extractor:
             writer.writerow(finalList)
 
 
-    def retrieveApplicationTime(self, filename):
-        with open (filename, "r") as infile:
-            appRows = csv.DictReader (infile)
-            for row in appRows:
-                self.appStartTime = int(row["Submission Time"])
-                self.appEndTime = int(row["Completion Time"])
+    def readTable(self, table):
+        """Read the rows of a table, unless they are already in memory."""
+        if table in self.rows:
+            return self.rows[table]
+        else:
+            return readRows (os.path.join (self.directory,
+                                           "{}_1.csv".format (table)))
 
 
-    def retrieveTotalCores(self, filename):
-        with open (filename, "r") as infile:
-            executorsRows = csv.DictReader (infile)
-            self.cores = sum (int (row["Total Cores"]) for row in executorsRows)
+    def retrieveApplicationTime(self, appRows):
+        for row in appRows:
+            self.appStartTime = int(row["Submission Time"])
+            self.appEndTime = int(row["Completion Time"])
 
 
-    def retrieveJobs(self, jobsFile):
-        self.jobsDict = {}
+    def retrieveTotalCores(self, executorsRows):
+        self.cores = sum (int (row["Total Cores"]) for row in executorsRows)
+
 
-        with open(jobsFile, "r") as f:
-            jobsRows = sorted(csv.DictReader(f), key=lambda x: x["Job ID"])
+    def retrieveJobs(self, jobsRows):
+        self.jobsDict = {}
+        jobsRows = sorted(jobsRows, key=lambda x: x["Job ID"])
 
         for row in jobsRows:
             executionTime = int(row["Completion Time"]) - int(row["Submission Time"])
-            dirtyStages = row["Stage IDs"][1:-1].split(", ")
-            stages = sorted (s for s in dirtyStages if s in self.availableIDs)
+            dirtyStages = parseIds(row["Stage IDs"])
+            stages = sorted (s for s in dirtyStages if s in self.dag)
 
             if self.stagesLen == 0:
                 self.stagesLen = len(stages)
@@ -144,31 +168,31 @@ class Extractor:
         return finalList
 
 
-    def run(self):
-        appFile = os.path.join (self.directory, "app_1.csv")
-        tasksFile = os.path.join (self.directory, "tasks_1.csv")
-        jobsFile = os.path.join (self.directory, "jobs_1.csv")
-        stagesFile = os.path.join (self.directory, "stages_1.csv")
-        executorsFile = os.path.join (self.directory, "executors_1.csv")
-
-        self.retrieveApplicationTime (appFile)
-        self.retrieveTotalCores (executorsFile)
+    def summaryRow(self):
+        """Map each header to its value for this application."""
+        return OrderedDict(zip(self.headers(), self.produceFinalList()))
 
-        with open(stagesFile, "r") as infile:
-            rows = self.orderStages(csv.DictReader(infile))
 
-        self.availableIDs = [r["Stage ID"] for r in rows]
+    def collect(self):
+        self.retrieveApplicationTime (self.readTable ("app"))
+        self.retrieveTotalCores (self.readTable ("executors"))
 
-        with open(tasksFile, "r") as f:
-            stagesRows = self.orderStages(csv.DictReader(f))
+        self.dag = StageDAG(self.readTable("stages"))
 
-        self.stagesRows = [r for r in stagesRows if r["Stage ID"] in self.availableIDs]
-        self.minTaskLaunchTime = min(int(x["Launch Time"]) for x in self.stagesRows)
+        if numpy is not None and "tasks" not in self.rows:
+            self.aggregateTaskArrays()
+        else:
+            self.stagesRows = [r for r in self.readTable("tasks")
+                               if r["Stage ID"] in self.dag]
+            self.minTaskLaunchTime = min(int(x["Launch Time"]) for x in self.stagesRows)
+            self.buildStagesTasksDict()
 
-        self.retrieveJobs(jobsFile)
+        self.retrieveJobs(self.readTable("jobs"))
         self.jobsCardinality = len(self.jobsDict)
 
-        self.buildStagesTasksDict()
+
+    def run(self):
+        self.collect()
 
         if self.headerFlag:
             self.writeHeader()
@@ -183,94 +207,387 @@ class Extractor:
             sys.exit(1)
 
 
-    def orderStages(self, stages):
-        """Order the stages dict by 'Stage Id'."""
-        return sorted (stages, key = itemgetter ("Stage ID"))
+    def buildStagesTasksDict(self):
+        """Aggregate the successful tasks of every stage in one pass."""
+        self.stageStats = {}
 
+        for row in self.stagesRows:
+            stageId = row["Stage ID"]
 
-    def computeStagesTasksDetails(self, stageId, batch):
-        shuffleBatch = []
-        normalBatch = []
-        bytesBatch = []
+            if stageId not in self.stageStats:
+                self.stageStats[stageId] = StageStats()
 
-        for item in batch:
-            normalBatch.append(item[0])
-            shuffleBatch.append(item[1])
-            bytesBatch.append(item[2])
+            if row["Reason"] == "Success":
+                if row["Shuffle Write Time"] == "NOVAL":
+                    self.stageStats[stageId].add(int(row["Executor Run Time"]), -1, -1)
+                else:
+                    self.stageStats[stageId].add(int(row["Executor Run Time"]),
+                                                 int(row["Shuffle Write Time"]),
+                                                 int(row["Shuffle Bytes Written"]))
 
-        maxTask = max(normalBatch)
-        maxShuffle = max(shuffleBatch)
-        avgTask = sum(normalBatch) / len(normalBatch)
-        avgShuffle = sum(shuffleBatch) / len(shuffleBatch)
-        maxBytes = max(bytesBatch)
-        avgBytes = sum(bytesBatch) / len(bytesBatch)
+        self.stagesTasksDict = {stageId: computeStagesTasksDetails(stageId, stats)
+                                for stageId, stats in self.stageStats.items()}
+        self.stageIDs = sorted (self.stagesTasksDict)
 
-        targetDict = OrderedDict({})
-        targetDict["stageId"] = stageId
-        targetDict["nTask"] = len(batch)
-        targetDict["maxTask"] = maxTask
-        targetDict["avgTask"] = avgTask
 
-        # If one is negative (because it was missing in the logs),
-        # all are negative.
-        if maxShuffle >= 0:
-            targetDict["SHmax"] = maxShuffle
-            targetDict["SHavg"] = avgShuffle
-            targetDict["Bmax"] = maxBytes
-            targetDict["Bavg"] = avgBytes
+    def aggregateTaskArrays(self):
+        """Aggregate the tasks table as NumPy arrays, with the results of
+        buildStagesTasksDict and its failures on malformed values."""
+        filename = os.path.join(self.directory, "tasks_1.csv")
+
+        try:
+            tasks = readArrays(filename, TASK_FIELDS)
+            checked = True
+        except ValueError:
+            # Failed tasks may lack their metrics, and older versions of
+            # the parser wrote NOVAL for missing shuffle metrics
+            tasks = readArrays(filename, TASK_FIELDS,
+                               dict.fromkeys(TASK_FIELDS[2:], markInteger))
+            checked = False
+
+        stage = tasks["Stage ID"]
+        dagIds = numpy.array([int(s) for s in self.dag.ids], dtype = numpy.int64)
+        inDag = numpy.isin(stage, dagIds)
+        success = inDag & (tasks["Reason"] == "Success")
+
+        launch = tasks["Launch Time"][inDag]
+        runTime = tasks["Executor Run Time"][success]
+        shuffleTime = tasks["Shuffle Write Time"][success]
+        shuffleBytes = tasks["Shuffle Bytes Written"][success]
+
+        if not checked:
+            noval = shuffleTime == NOVAL_MARK
+            shuffleBytes = numpy.where(noval, -1, shuffleBytes)
+            shuffleTime = numpy.where(noval, -1, shuffleTime)
+
+            if (launch <= INVALID_MARK).any() or \
+               (runTime <= INVALID_MARK).any() or \
+               (shuffleTime <= INVALID_MARK).any() or \
+               (shuffleBytes <= INVALID_MARK).any():
+                raise ValueError("tasks with malformed values in '{}'"
+                                 .format(filename))
+
+        self.minTaskLaunchTime = int(launch.min())
+        successful = stage[success]
+        runStats = stageStatistics(successful, runTime)
+        shuffleStats = stageStatistics(successful, shuffleTime)
+        bytesStats = stageStatistics(successful, shuffleBytes, quantiles = False)
+        self.stageStats = {}
+
+        for stageId in numpy.unique(stage[inDag]).tolist():
+            stats = StageStats()
+
+            if stageId in runStats:
+                stats.tasks = runStats[stageId]
+                stats.shuffle = shuffleStats[stageId]
+                stats.bytes = bytesStats[stageId]
+
+            self.stageStats[str(stageId)] = stats
+
+        self.stagesTasksDict = {stageId: computeStagesTasksDetails(stageId, stats)
+                                for stageId, stats in self.stageStats.items()}
+        self.stageIDs = sorted (self.stagesTasksDict)
 
-        return targetDict
 
+def markInteger(value):
+    if value == "NOVAL":
+        return NOVAL_MARK
 
-    def buildStagesTasksDict(self):
-        batch = []
-        lastRow = None
+    try:
+        return int(value)
+    except ValueError:
+        return INVALID_MARK
 
-        for row in self.stagesRows:
-            if lastRow != None and lastRow["Stage ID"] != row["Stage ID"]:
-                stageId = lastRow["Stage ID"]
-                self.stagesTasksDict[stageId] = self.computeStagesTasksDetails(stageId, batch)
-                batch = []
 
-            if row["Reason"] == "Success":
-                if row["Shuffle Write Time"] == "NOVAL":
-                    batch.append([int(row["Executor Run Time"]), -1, -1])
-                else:
-                    batch.append([int(row["Executor Run Time"]),
-                                  int(row["Shuffle Write Time"]),
-                                  int(row["Shuffle Bytes Written"])])
+def sortByStage(stage, values):
+    """Sort the values by stage and then by value, in a single integer
+    key when both fit in one."""
+    stages, ranks = numpy.unique(stage, return_inverse = True)
+    low = int(values.min())
+    span = int(values.max()) - low + 1
 
-            lastRow = row
+    if len(stages) * span < 2 ** 63:
+        keys = numpy.sort(ranks.astype(numpy.int64) * span + (values - low))
+        return stages[keys // span], keys % span + low
+    else:
+        order = numpy.lexsort((values, stage))
+        return stage[order], values[order]
+
+
+def stageStatistics(stage, values, quantiles = True):
+    """Map each stage to the StreamingStats of its values, sorting them
+    once and reducing the runs of every stage."""
+    if len(stage) == 0:
+        return {}
+
+    stage, values = sortByStage(stage, values)
+    starts = numpy.flatnonzero(numpy.diff(stage, prepend = stage[0] - 1))
+    ends = numpy.append(starts[1:], len(stage))
+    totals = numpy.add.reduceat(values, starts).tolist()
+    maxima = values[ends - 1].tolist()
+    digests = groupDigests(stage, values, starts) if quantiles else {}
+    statistics = {}
+
+    for stageId, count, total, maximum in zip(stage[starts].tolist(),
+                                              (ends - starts).tolist(),
+                                              totals, maxima):
+        statistics[stageId] = StreamingStats.fromTotals(
+            count, total, maximum, digests.get(stageId))
+
+    return statistics
+
+
+class StageStats:
+    """Running statistics of the successful tasks of a stage, with
+    quantile sketches of their run and shuffle write times."""
+    def __init__(self):
+        self.tasks = StreamingStats()
+        self.shuffle = StreamingStats()
+        self.bytes = StreamingStats(quantiles = False)
+
+
+    def add(self, runTime, shuffleTime, shuffleBytes):
+        self.tasks.add(runTime)
+        self.shuffle.add(shuffleTime)
+        self.bytes.add(shuffleBytes)
+
+
+    def merge(self, other):
+        self.tasks.merge(other.tasks)
+        self.shuffle.merge(other.shuffle)
+        self.bytes.merge(other.bytes)
 
-        stageId = lastRow["Stage ID"]
-        self.stagesTasksDict[stageId] = self.computeStagesTasksDetails(stageId, batch)
-        self.stageIDs = sorted (self.stagesTasksDict)
 
+    @classmethod
+    def fromState(cls, state):
+        stats = cls()
+        stats.tasks = StreamingStats.fromState(state["tasks"])
+        stats.shuffle = StreamingStats.fromState(state["shuffle"])
+        stats.bytes = StreamingStats.fromState(state["bytes"])
+        return stats
 
-def directoryScan(regex, directory, users, datasize):
-    headerCond = True
+
+    def state(self):
+        return {"tasks": self.tasks.state(), "shuffle": self.shuffle.state(),
+                "bytes": self.bytes.state()}
+
+
+def computeStagesTasksDetails(stageId, stats):
+    targetDict = OrderedDict({})
+    targetDict["stageId"] = stageId
+    targetDict["nTask"] = stats.tasks.count
+    targetDict["maxTask"] = stats.tasks.maximum
+    targetDict["avgTask"] = stats.tasks.mean()
+
+    for q in QUANTILES:
+        targetDict["p{}Task".format(q)] = stats.tasks.quantile(q / 100)
+
+    # If one is negative (because it was missing in the logs),
+    # all are negative.
+    if stats.shuffle.maximum >= 0:
+        targetDict["SHmax"] = stats.shuffle.maximum
+        targetDict["SHavg"] = stats.shuffle.mean()
+        targetDict["Bmax"] = stats.bytes.maximum
+        targetDict["Bavg"] = stats.bytes.mean()
+
+        for q in QUANTILES:
+            targetDict["SHp{}".format(q)] = stats.shuffle.quantile(q / 100)
+
+    return targetDict
+
+
+def summaryHeaders(jobIDs, stages):
+    """Columns of summary.csv, given the job IDs and a mapping of the stage
+    IDs to whether they have shuffle metrics, both in order."""
+    applicationCsvHeaders = ['run', 'applicationCompletionTime',
+                             'applicationDeltaBeforeComputing']
+    jobCsvHeaders = ['jobCompletionTime_J{job}']
+    stagesCsvHeaders = [h + '_S{stage}' for h in STAGE_COLUMNS]
+    shuffleCsvHeaders = [h + '_S{stage}' for h in SHUFFLE_COLUMNS]
+    terminalCsvHeaders = ['users', 'dataSize', 'nCores']
+
+    targetHeaders = []
+    targetHeaders += applicationCsvHeaders
+
+    for jobID in jobIDs:
+        targetHeaders += [h.format(job = jobID) for h in jobCsvHeaders]
+
+    for stageID, shuffle in stages.items():
+        targetHeaders += [h.format(stage = stageID) for h in stagesCsvHeaders]
+
+        if shuffle:
+            targetHeaders += [h.format(stage = stageID) for h in shuffleCsvHeaders]
+
+    targetHeaders += terminalCsvHeaders
+    return targetHeaders
+
+
+def summarizeRun(directory, users, datasize, path):
+    """Return the job IDs of a run, its stages as in summaryHeaders, its
+    row and the statistics of its stages."""
+    extractor = Extractor(directory, path, users, datasize, False)
+    extractor.collect()
+    stages = {stageID: "SHmax" in extractor.stagesTasksDict[stageID]
+              for stageID in extractor.stageIDs}
+    return (extractor.jobIDs, stages, extractor.summaryRow(),
+            extractor.stageStats)
+
+
+def saveSummary(filename, summary):
+    jobIDs, stages, row, stageStats = summary
+    temporary = filename + ".tmp"
+
+    with open(temporary, "w") as outfile:
+        json.dump({"jobIDs": jobIDs, "stages": stages,
+                   "row": list(row.items()),
+                   "stageStats": {stageID: stats.state()
+                                  for stageID, stats in stageStats.items()}},
+                  outfile)
+
+    os.replace(temporary, filename)
+
+
+def loadSummary(filename):
+    with open(filename) as infile:
+        summary = json.load(infile)
+
+    return (summary["jobIDs"], summary["stages"], OrderedDict(summary["row"]),
+            {stageID: StageStats.fromState(state)
+             for stageID, state in summary["stageStats"].items()})
+
+
+def cachedSummary(directory, users, datasize, path, force = False):
+    """Summarize a run, unless its tables did not change since its
+    summary was kept in its directory."""
+    inputs = [findTable(os.path.join(path, "{}_1.csv".format(table)))
+              for table in TABLES]
+
+    if None in inputs:
+        return summarizeRun(directory, users, datasize, path)
+
+    filename = os.path.join(path, SUMMARY_CACHE)
+    key = {
+        "version": codeVersion(__name__, "sketch", "stagedag", "tables"),
+        "numpy": numpy is not None,
+        "users": users,
+        "datasize": datasize
+    }
+    summaries = []
+
+    def run():
+        summary = summarizeRun(directory, users, datasize, path)
+        saveSummary(filename, summary)
+        summaries.append(summary)
+
+    cachedRun(path, "summary", run, inputs, lambda: [filename], key, force)
+    return summaries[0] if summaries else loadSummary(filename)
+
+
+def extractRun(directory, users, datasize, cache, force, path):
+    """Summarize a run as summarizeRun, None on failure."""
+    try:
+        if cache:
+            return cachedSummary(directory, users, datasize, path, force)
+        else:
+            return summarizeRun(directory, users, datasize, path)
+    except Exception:
+        print("error: issue in directory '{}'".format (path), file=sys.stderr)
+        return None
+
+
+def writeSummary(directory, results):
+    """Write the rows of all the runs under the union of their columns,
+    leaving empty the ones a run does not have."""
+    jobIDs = set()
+    stages = {}
+
+    for runJobs, runStages, _, _ in results:
+        jobIDs.update(runJobs)
+
+        for stageID, shuffle in runStages.items():
+            stages[stageID] = stages.get(stageID, False) or shuffle
+
+    headers = summaryHeaders(sorted(jobIDs),
+                             OrderedDict(sorted(stages.items())))
+
+    with open(os.path.join(directory, "summary.csv"), "w") as f:
+        writer = csv.DictWriter(f, headers, restval='', delimiter=',',
+                                lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(row for _, _, row, _ in results)
+
+
+def writeStagesSummary(directory, results):
+    """Write the statistics of every stage over all the runs, merging
+    their sketches."""
+    stages = {}
+
+    for _, _, _, stageStats in results:
+        for stageID, stats in stageStats.items():
+            stages.setdefault(stageID, StageStats()).merge(stats)
+
+    headers = ['stageId'] + STAGE_COLUMNS + SHUFFLE_COLUMNS
+
+    with open(os.path.join(directory, STAGES_SUMMARY), "w") as f:
+        writer = csv.DictWriter(f, headers, restval='', delimiter=',',
+                                lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(computeStagesTasksDetails(stageID, stages[stageID])
+                         for stageID in sorted(stages))
+
+
+def directoryScan(regex, directory, users, datasize, jobs = None,
+                  cache = False, force = False):
+    """Summarize the runs of a query, with cache reusing the summaries of
+    the ones that did not change.  Runs no longer there leave no rows."""
     rx = re.compile(regex)
     logDir = os.path.join(directory, "logs")
+    paths = [os.path.join(logDir, fileName)
+             for fileName in sorted(os.listdir(logDir))
+             if rx.match(fileName)]
+    paths = [path for path in paths if os.path.isdir(path)]
+    extract = partial(extractRun, directory, users, datasize, cache, force)
+
+    if jobs == 1 or len(paths) < 2:
+        results = list(map(extract, paths))
+    else:
+        with ProcessPoolExecutor(max_workers = jobs) as pool:
+            results = list(pool.map(extract, paths))
 
-    for fileName in os.listdir(logDir):
-        path = os.path.join(logDir, fileName)
+    results = [r for r in results if r is not None]
 
-        if os.path.isdir(path) and rx.match(fileName):
-            try:
-                Extractor (directory, path, users, datasize, headerCond).run ()
-                headerCond = False
-            except:
-                print("error: issue in directory '{}'".format (path), file=sys.stderr)
+    if results:
+        writeSummary(directory, results)
+        writeStagesSummary(directory, results)
+    else:
+        for name in ("summary.csv", STAGES_SUMMARY):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+
+def parseArgs(argv = None):
+    parser = ArgumentParser(description = "summarize the runs of a query "
+                            "in QUERY_DIRECTORY/summary.csv")
+    parser.add_argument("regex", metavar = "REGEX",
+                        help = "pattern of the run directories under 'logs'")
+    parser.add_argument("directory", metavar = "QUERY_DIRECTORY")
+    parser.add_argument("users", metavar = "USERS")
+    parser.add_argument("datasize", metavar = "DATASIZE")
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count(),
+                        help = "summarize the runs with this many processes")
+    parser.add_argument("-C", "--cache", action = "store_true",
+                        help = "reuse the summaries of the runs whose tables "
+                        "did not change")
+    parser.add_argument("--force", action = "store_true",
+                        help = "summarize every run, but keep the summaries "
+                        "with --cache")
+    return parser.parse_args(argv)
 
 
 def main():
-    args = sys.argv
-
-    if len(args) != 5:
-        print("Required args: [REGEX] [QUERY DIRECTORY] [USERS] [DATASIZE]", file=sys.stderr)
-        sys.exit(2)
-    else:
-        directoryScan(str(args[1]), str(args[2]), str(args[3]), str(args[4]))
+    args = parseArgs()
+    directoryScan(args.regex, args.directory, args.users, args.datasize,
+                  args.jobs, args.cache, args.force)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,298 @@
+## Copyright 2018 Eugenio Gianniti <eugenio.gianniti@polimi.it>
+##
+## Licensed under the Apache License, Version 2.0 (the "License");
+## you may not use this file except in compliance with the License.
+## You may obtain a copy of the License at
+##
+##     http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing, software
+## distributed under the License is distributed on an "AS IS" BASIS,
+## WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+## See the License for the specific language governing permissions and
+## limitations under the License.
+
+"""Statistics of a stream of values in constant memory.
+
+TDigest is a merging t-digest: values are buffered and, once the buffer
+is full, sorted together with the centroids and merged into as many new
+centroids as the scale function allows, which keeps them small near the
+tails, where the quantiles must be most accurate.  Digests of different
+streams merge into the digest of their union.  Up to BUFFER_FACTOR times
+the compression values, every value is a centroid of its own and the
+quantiles are exact.
+"""
+
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+COMPRESSION = 100
+BUFFER_FACTOR = 5
+
+
+class TDigest:
+    def __init__(self, compression = COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.buffer = []
+        self.weight = 0
+        self.minimum = None
+        self.maximum = None
+
+
+    @classmethod
+    def fromCentroids(cls, means, weights, minimum, maximum,
+                      compression = COMPRESSION):
+        digest = cls(compression)
+        digest.means = means
+        digest.weights = weights
+        digest.weight = sum(weights)
+        digest.minimum = minimum
+        digest.maximum = maximum
+        return digest
+
+
+    @classmethod
+    def fromState(cls, state):
+        return cls.fromCentroids(state["means"], state["weights"],
+                                 state["minimum"], state["maximum"],
+                                 state["compression"])
+
+
+    def state(self):
+        """The digest as plain lists and numbers, for JSON."""
+        self.compress()
+        return {"compression": self.compression, "means": self.means,
+                "weights": self.weights, "minimum": self.minimum,
+                "maximum": self.maximum}
+
+
+    @property
+    def count(self):
+        return self.weight + len(self.buffer)
+
+
+    def add(self, value):
+        self.buffer.append(value)
+
+        if len(self.buffer) >= BUFFER_FACTOR * self.compression:
+            self.compress()
+
+
+    def merge(self, other):
+        """Add the values of another digest to this one."""
+        other.compress()
+
+        if not self.count:
+            self.means = list(other.means)
+            self.weights = list(other.weights)
+            self.weight = other.weight
+            self.minimum = other.minimum
+            self.maximum = other.maximum
+        elif other.weight:
+            self.compress(zip(other.means, other.weights))
+            self.minimum = other.minimum if self.minimum is None \
+                else min(self.minimum, other.minimum)
+            self.maximum = other.maximum if self.maximum is None \
+                else max(self.maximum, other.maximum)
+
+
+    def scale(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+    def inverseScale(self, k):
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+
+    def compress(self, centroids = ()):
+        """Merge the buffer and the given centroids into these ones."""
+        if not self.buffer and not centroids:
+            return
+
+        items = list(zip(self.means, self.weights))
+        items.extend(centroids)
+
+        if self.buffer:
+            low = min(self.buffer)
+            high = max(self.buffer)
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+            items.extend((value, 1) for value in self.buffer)
+            self.buffer = []
+
+        items.sort()
+        self.weight = sum(weight for _, weight in items)
+
+        if self.weight <= BUFFER_FACTOR * self.compression and \
+           all(weight == 1 for _, weight in items):
+            self.means = [value for value, _ in items]
+            self.weights = [1] * len(items)
+            return
+
+        self.means = []
+        self.weights = []
+
+        mean, weight = items[0]
+        cumulative = 0
+        limit = self.weight * self.inverseScale(self.scale(0) + 1)
+
+        for value, increment in items[1:]:
+            if cumulative + weight + increment <= limit:
+                weight += increment
+                mean += (value - mean) * increment / weight
+            else:
+                self.means.append(mean)
+                self.weights.append(weight)
+                cumulative += weight
+                q = min(cumulative / self.weight, 1)
+                limit = self.weight * self.inverseScale(self.scale(q) + 1)
+                mean, weight = value, increment
+
+        self.means.append(mean)
+        self.weights.append(weight)
+
+
+    def quantile(self, q):
+        """Interpolate linearly between the ranks of the centroids, as
+        NumPy does between the sorted values: while every centroid holds
+        a single value, the result is exact."""
+        self.compress()
+
+        if not self.count:
+            raise ValueError("quantile of an empty digest")
+
+        rank = q * (self.count - 1)
+        previousRank = 0
+        previousMean = self.minimum
+        cumulative = 0
+
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + (weight - 1) / 2
+
+            if rank <= center:
+                if center == previousRank:
+                    return float(mean)
+
+                return previousMean + (mean - previousMean) * \
+                    (rank - previousRank) / (center - previousRank)
+
+            previousRank = center
+            previousMean = mean
+            cumulative += weight
+
+        lastRank = self.count - 1
+
+        if lastRank == previousRank:
+            return float(self.maximum)
+
+        return previousMean + (self.maximum - previousMean) * \
+            (rank - previousRank) / (lastRank - previousRank)
+
+
+def groupDigests(groups, values, starts, compression = COMPRESSION):
+    """Build the digests of many groups at once with NumPy, given the
+    values sorted by group and then by value, and where each group
+    starts: a centroid gathers the values of a group within one unit of
+    the scale function, or just one value in groups small enough to be
+    kept exactly, as TDigest does."""
+    counts = numpy.diff(numpy.append(starts, len(values)))
+    ranks = numpy.arange(len(values)) - numpy.repeat(starts, counts)
+    sizes = numpy.repeat(counts, counts)
+    q = ranks / sizes
+    k = compression / (2 * math.pi) * numpy.arcsin(2 * q - 1)
+    buckets = numpy.floor(k + compression / 4).astype(numpy.int64)
+    buckets = numpy.where(sizes <= BUFFER_FACTOR * compression, ranks, buckets)
+
+    bounds = numpy.diff(buckets, prepend = buckets[:1] - 1) != 0
+    bounds[starts] = True
+    bounds = numpy.flatnonzero(bounds)
+    weights = numpy.diff(numpy.append(bounds, len(values)))
+    means = (numpy.add.reduceat(values, bounds) / weights).tolist()
+    weights = weights.tolist()
+
+    first = numpy.searchsorted(bounds, starts).tolist()
+    last = first[1:] + [len(means)]
+    ends = numpy.append(starts[1:], len(values)) - 1
+    digests = {}
+
+    for group, begin, end, low, high in zip(groups[starts].tolist(), first, last,
+                                            values[starts].tolist(),
+                                            values[ends].tolist()):
+        digests[group] = TDigest.fromCentroids(means[begin:end],
+                                               weights[begin:end], low, high,
+                                               compression)
+
+    return digests
+
+
+class StreamingStats:
+    def __init__(self, quantiles = True):
+        """Without quantiles, keep only the count, sum and maximum."""
+        self.count = 0
+        self.total = 0
+        self.maximum = None
+        self.digest = TDigest() if quantiles else None
+
+
+    @classmethod
+    def fromTotals(cls, count, total, maximum, digest = None):
+        """Statistics computed elsewhere, with the digest of the values
+        if quantiles are needed."""
+        stats = cls(quantiles = False)
+        stats.count = count
+        stats.total = total
+        stats.maximum = maximum
+        stats.digest = digest
+        return stats
+
+
+    @classmethod
+    def fromState(cls, state):
+        digest = state["digest"]
+        return cls.fromTotals(state["count"], state["total"], state["maximum"],
+                              None if digest is None else TDigest.fromState(digest))
+
+
+    def state(self):
+        return {"count": self.count, "total": self.total,
+                "maximum": self.maximum,
+                "digest": None if self.digest is None else self.digest.state()}
+
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        if self.digest is not None:
+            self.digest.add(value)
+
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+
+        if other.maximum is not None and \
+           (self.maximum is None or other.maximum > self.maximum):
+            self.maximum = other.maximum
+
+        if self.digest is not None:
+            self.digest.merge(other.digest)
+
+
+    def mean(self):
+        return self.total / self.count
+
+
+    def quantile(self, q):
+        return self.digest.quantile(q)